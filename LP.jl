@@ -10,13 +10,14 @@ MAX_RANKING = true
 gendersProvided = false
 
 # cd("/Users/arthurdelarue/Documents/MIT/President/algorithm")
-ENTRIES = ["A","B","C","D","E","F","G","H","J"]
-ENTRY_TOTAL_ROOMS = [32,32,32,32,30,42,40,48,30]
 
 FILENAME = "output100_quad.csv"
 FRESHMEN_WEIGHT = 1.0
 # end of default parameters
 
+# Max ranking bounds already computed in this run, keyed by input file contents and freshman weight
+MAXIMUM_RANKING_CACHE = Dict()
+
 function run_LP(;outputFileName::String = FILENAME, freshmenWeight = FRESHMEN_WEIGHT, costFunction = COST_FUNCTION, maxRanking = MAX_RANKING)
 	"""
 	Run LP formulation for matching.
@@ -33,6 +34,7 @@ function run_LP(;outputFileName::String = FILENAME, freshmenWeight = FRESHMEN_WE
 	entryprefs = readcsv("entryprefs_anon.csv")
 	# Read in number of vacancies
 	rooms = readcsv("entryVacancies.csv")
+	inputHash = hash(string(readall("finalfroshprefsGen_anon.csv"), readall("entryprefs_anon.csv"), readall("entryVacancies.csv")))
 	names = freshmenPrefs[:,1]
 	entries = rooms[:,1]
 
@@ -48,17 +50,17 @@ function run_LP(;outputFileName::String = FILENAME, freshmenWeight = FRESHMEN_WE
 	costMatrix = zeros(length(names), length(entries))
 	costMatrix2 = zeros(length(names), length(entries))
 	for i=1:length(names), j=1:length(entries)
-		costMatrix[i,j] = freshmenWeight * (freshmenCosts[i,j]-1)/8 + (1 - freshmenWeight) * (6 - entryCosts[i,j])/6
-		costMatrix2[i,j] = freshmenWeight * (freshmenCosts[i,j]-1)/8 * (freshmenCosts[i,j]-1)/8 + (1 - freshmenWeight) * (6 - entryCosts[i,j])/6 * (6 - entryCosts[i,j])/6
+		costMatrix[i,j] = freshmenWeight * (freshmenCosts[i,j]-1)/(length(entries)-1) + (1 - freshmenWeight) * (6 - entryCosts[i,j])/6
+		costMatrix2[i,j] = freshmenWeight * (freshmenCosts[i,j]-1)/(length(entries)-1) * (freshmenCosts[i,j]-1)/(length(entries)-1) + (1 - freshmenWeight) * (6 - entryCosts[i,j])/6 * (6 - entryCosts[i,j])/6
 	end
 
 	# Create arrays of boys and girls
 	boys = Int[]
 	girls = Int[]
 	for i=1:length(names)
-		if freshmenPrefs[i,11] == 0
+		if freshmenPrefs[i,length(entries)+2] == 0
 			push!(boys, i)
-		elseif freshmenPrefs[i,11] == 1
+		elseif freshmenPrefs[i,length(entries)+2] == 1
 			push!(girls, i)
 		end
 	end
@@ -81,7 +83,7 @@ function run_LP(;outputFileName::String = FILENAME, freshmenWeight = FRESHMEN_WE
 	if numEmptyRooms < 0
 		println("!!!! WARNING : more freshmen than rooms !!!!")
 	end
-	numEmptyRoomsPerEntry = int(ceil(numEmptyRooms/sum(ENTRY_TOTAL_ROOMS) .* ENTRY_TOTAL_ROOMS))
+	numEmptyRoomsPerEntry = int(ceil(numEmptyRooms/sum(totalRoomsPerEntry) .* totalRoomsPerEntry))
 
 	# Create JuMP model (linear program)
 	m = Model(solver=GurobiSolver(TimeLimit=200, OutputFlag=0))
@@ -107,8 +109,12 @@ function run_LP(;outputFileName::String = FILENAME, freshmenWeight = FRESHMEN_WE
 	@addConstraint(m, girlLimit[j=1:length(entries)], sum{x[i,j], i=girls} <= maxGirlsPerEntry[j])
 
 	# Max Ranking
+	cacheKey = (inputHash, freshmenWeight)
 	if maxRanking
-		maximumRanking = run_LP(outputFileName="tmp.csv", freshmenWeight=freshmenWeight, costFunction="minimax", maxRanking=false)
+		if !haskey(MAXIMUM_RANKING_CACHE, cacheKey)
+			run_LP(outputFileName="tmp.csv", freshmenWeight=freshmenWeight, costFunction="minimax", maxRanking=false)
+		end
+		maximumRanking = MAXIMUM_RANKING_CACHE[cacheKey]
 		@addConstraint(m, maxRanking[i=1:length(names)], sum{x[i,j] * freshmenCosts[i,j], j = 1:length(entries)} <= int(maximumRanking) + 0.001)
 	end
 
@@ -143,7 +149,7 @@ function run_LP(;outputFileName::String = FILENAME, freshmenWeight = FRESHMEN_WE
 		outputFile = open(string("Outputs/",outputFileName), "w")
 		for i=1:length(names)
 			entry = indmax(x_opt[i,:])
-			write(outputFile, string(names[i],",",ENTRIES[entry],"\n"))
+			write(outputFile, string(names[i],",",entries[entry],"\n"))
 		end
 		close(outputFile)
 		# Special case for minimax cost function (because this is used for maxRanking variation)
@@ -155,6 +161,10 @@ function run_LP(;outputFileName::String = FILENAME, freshmenWeight = FRESHMEN_WE
 					maximumRanking = freshmenCosts[i,entry]
 				end
 			end
+			# Only the plain minimax bound is cached (it is computed before any maxRanking minimax at this weight)
+			if !haskey(MAXIMUM_RANKING_CACHE, cacheKey)
+				MAXIMUM_RANKING_CACHE[cacheKey] = maximumRanking
+			end
 			return maximumRanking
 		end
 	end
@@ -228,5 +238,5 @@ function print_iis_gurobi(m::Model)
     println("End of IIS")
 end
 
-# Run all algorithms and save their outputs
-@time run_all_LP_solutions("outputFiles.txt")
\ No newline at end of file
+# Run all algorithms and save their outputs (list of algorithms can be given on the command line)
+@time run_all_LP_solutions(length(ARGS) > 0 ? ARGS[1] : "outputFiles.txt")
\ No newline at end of file
@@ -0,0 +1,92 @@
+# benchmarks/gender_capacity.py
+# Regression benchmark for the running gendered-room totals used by Entry.can_take
+# Run from the repository root with: python -m benchmarks.gender_capacity
+
+import random
+import time
+from marriage_algorithm import Entry, Freshman, OPPOSITE_GENDER, count_gendered_rooms
+
+NUM_FRESHMEN = 20000
+NUM_ENTRIES = 200
+
+class ScanningEntry(Entry):
+	"""
+	Entry with the previous can_take, which sums the rooms of every entry for each candidate.
+	"""
+	def can_take(self, freshman):
+		return self.rooms[freshman.gender] > 0 or (sum([entry.rooms[freshman.gender] for entry in self.pool]) == 0 and sum([entry.rooms[OPPOSITE_GENDER[freshman.gender]] for entry in self.pool]) == 0 and self.rooms['U'] > 0)
+
+def build_instance(entryClass, seed):
+	"""
+	Build a synthetic instance of NUM_FRESHMEN freshmen and NUM_ENTRIES entries, with a few more rooms than freshmen.
+
+	Args:
+		entryClass : class used for the entries
+		seed       : int, seed of the random generator
+	Returns:
+		Entries    : list of entries
+		Frosh      : list of freshmen
+	"""
+	rng = random.Random(seed)
+	names = ['E%d' % j for j in xrange(NUM_ENTRIES)]
+	roomsPerEntry = NUM_FRESHMEN / NUM_ENTRIES + 2
+	roomsLeft = {'M': 0, 'F': 0}
+	Entries = []
+	for name in names:
+		gendered = roomsPerEntry / 4
+		Entries.append(entryClass(name, {'M': gendered, 'F': gendered, 'U': roomsPerEntry - 2 * gendered}, roomsLeft))
+	for entry in Entries:
+		entry.pool = Entries
+	count_gendered_rooms(dict((entry.name, entry) for entry in Entries), roomsLeft)
+	Frosh = []
+	for i in xrange(NUM_FRESHMEN):
+		order = range(1, NUM_ENTRIES + 1)
+		rng.shuffle(order)
+		freshman = Freshman('f%d' % i, rng.choice(['M', 'F']), dict(zip([entry.name for entry in Entries], order)))
+		Frosh.append(freshman)
+		for entry in Entries:
+			entry.add_rating(freshman, rng.randint(1, 6))
+	return Entries, Frosh
+
+def time_rounds(Entries, Frosh):
+	"""
+	Play the marriage rounds of getMarried until every freshman is placed.
+
+	Returns:
+		time spent in process_round (seconds), number of rounds played
+	"""
+	entriesByName = dict((entry.name, entry) for entry in Entries)
+	unplaced = list(Frosh)
+	elapsed = 0.
+	rounds = 0
+	while len(unplaced) > 0:
+		for entry in Entries:
+			entry.current_round = set()
+		for freshman in unplaced:
+			entriesByName[freshman.favorite_entry()].add_to_round(freshman)
+		start = time.time()
+		results = [entry.process_round() for entry in Entries]
+		elapsed += time.time() - start
+		rounds += 1
+		placed = set()
+		for entry, (taken, dropped) in zip(Entries, results):
+			placed.update(taken)
+			for freshman in dropped:
+				freshman.rejected_by(entry)
+		unplaced = [freshman for freshman in unplaced if freshman not in placed]
+	return elapsed, rounds
+
+def run_benchmark(seed=0):
+	"""
+	Time the rounds with running totals and with the previous scan on the same synthetic instance, and print the speedup.
+	"""
+	timings = {}
+	for label, entryClass in [("running totals", Entry), ("scan over entries", ScanningEntry)]:
+		Entries, Frosh = build_instance(entryClass, seed)
+		timings[label], rounds = time_rounds(Entries, Frosh)
+		print "%-20s: %.3f s in process_round over %d rounds" % (label, timings[label], rounds)
+	print "speedup: %.1fx" % (timings["scan over entries"] / timings["running totals"])
+	return timings
+
+if __name__ == "__main__":
+	run_benchmark()
@@ -0,0 +1,216 @@
+# benchmarks/suite.py
+# Timing suite for the marriage algorithm, the LP solvers, the cost functions, the metrics and the whole pipeline,
+# on synthetic instances of several sizes. Results are saved as JSON so that runs of different commits can be compared.
+# Run from the repository root with: python -m benchmarks.suite [--sizes 300x9,3000x100] [--output results.json]
+# Compare two runs with: python -m benchmarks.suite --compare old.json new.json
+
+import argparse
+import datetime
+import distutils.spawn
+import glob
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import numpy as np
+import flow_solver
+import incremental_score
+import lagrangian_solver
+import marriage_algorithm as marriage
+import master_algorithm
+import relaxation_solver
+import vectorized_metrics
+from benchmarks import synthetic_instance
+
+# (freshmen, entries) of the synthetic instances
+SIZES = [(300, 9), (3000, 9), (3000, 100), (30000, 9), (30000, 500)]
+# The solvers and the pipeline are only timed up to these many freshmen x entries (the Python min-cost flow needs
+# about 20 s per minimax solve at 3000 x 9 already, and several minutes at 3000 x 100)
+MAX_SOLVER_SIZE = 30000
+MAX_END_TO_END_SIZE = 3000
+FRESHMEN_WEIGHT = 0.7
+CORRELATION = 0.5
+REPEAT = 3
+INCREMENTAL_MOVES = 10000
+SCORE_CANDIDATES = 50
+
+def time_call(function, repeat, setup=None):
+	"""
+	Time function() repeat times, calling setup() (untimed) before each call.
+
+	Returns:
+		list of times in seconds
+	"""
+	times = []
+	for k in xrange(repeat):
+		if setup is not None:
+			setup()
+		start = time.time()
+		function()
+		times.append(time.time() - start)
+	return times
+
+def clear_caches(directory):
+	"""
+	Remove the caches a run leaves in its directory (parsed inputs and max ranking bounds), so every timed run is cold.
+	"""
+	shutil.rmtree(os.path.join(directory, flow_solver.preference_loader.PREFERENCE_CACHE_DIRECTORY), ignore_errors=True)
+	for fileName in glob.glob(os.path.join(directory, flow_solver.MAX_RANKING_CACHE_FILE)):
+		os.remove(fileName)
+
+def benchmark_instance(nFreshmen, nEntries, repeat):
+	"""
+	Run all benchmarks of one synthetic instance.
+
+	Returns:
+		list of results, dictionaries with the benchmark name, instance size and times (or the reason it was skipped)
+	"""
+	directory = tempfile.mkdtemp(prefix="benchmark_")
+	instance = synthetic_instance.generate_instance(nFreshmen, nEntries, CORRELATION)
+	synthetic_instance.write_instance(instance, directory)
+	names, entries, freshmenCosts, entryCosts, genders, rooms = instance
+	fileNames = [os.path.join(directory, fileName) for fileName in [synthetic_instance.FRESHMEN_PREFERENCES, synthetic_instance.ENTRY_PREFERENCES, synthetic_instance.ROOM_NUMBERS]]
+	size = nFreshmen * nEntries
+	results = []
+
+	def record(name, function, setup=None, skipped=None, number=1):
+		result = {"benchmark": name, "freshmen": nFreshmen, "entries": nEntries}
+		if skipped is not None:
+			result["skipped"] = skipped
+		else:
+			times = [t / number for t in time_call(function, repeat, setup)]
+			result.update({"times": times, "min": min(times), "mean": sum(times) / len(times)})
+		print "%-40s %6d x %-4d %s" % (name, nFreshmen, nEntries, "skipped (%s)" % skipped if skipped else "%.4f s" % result["min"])
+		results.append(result)
+
+	try:
+		# Input parsing, without and with the cache
+		record("load/parse", lambda: flow_solver.preference_loader.load_preferences(*fileNames, cacheDirectory=None))
+		cacheDirectory = os.path.join(directory, "preferenceCache")
+		flow_solver.preference_loader.load_preferences(*fileNames, cacheDirectory=cacheDirectory)
+		record("load/cached", lambda: flow_solver.preference_loader.load_preferences(*fileNames, cacheDirectory=cacheDirectory))
+		# Marriage algorithm, parsing the files every time like the other cold measurements
+		for allowGreasing in [False, True]:
+			name = "marriage/" + ("greasing" if allowGreasing else "noGreasing")
+			record(name, lambda: marriage.run_marriage_algorithm(fileNames[2], False, marriage.MAX_GENDER_PROPORTION, fileNames[0], fileNames[1], allowGreasing, None, cacheDirectory=None))
+		# Python solver, each cost function with and without the max ranking constraint
+		bounds = flow_solver.entry_bounds(rooms, genders)
+		for costFunction in flow_solver.COST_FUNCTIONS:
+			for maxRanking in [False, True]:
+				name = "solver/python/%s_%s" % (costFunction, "maxRank" if maxRanking else "noMaxRank")
+				skipped = "larger than %d" % MAX_SOLVER_SIZE if size > MAX_SOLVER_SIZE else None
+				record(name, lambda: flow_solver.solve(freshmenCosts, entryCosts, genders, bounds, FRESHMEN_WEIGHT, costFunction, maxRanking), skipped=skipped)
+		# LP relaxation and repair, the fast approximate mode
+		for costFunction in relaxation_solver.COST_FUNCTIONS:
+			name = "solver/relaxation/%s_noMaxRank" % costFunction
+			skipped = "larger than %d" % MAX_SOLVER_SIZE if size > MAX_SOLVER_SIZE else None
+			record(name, lambda: relaxation_solver.solve_relaxed(freshmenCosts, entryCosts, genders, bounds, FRESHMEN_WEIGHT, costFunction), skipped=skipped)
+		# Lagrangian decomposition, meant for instances larger than MAX_SOLVER_SIZE
+		for costFunction in lagrangian_solver.COST_FUNCTIONS:
+			name = "solver/lagrangian/%s_noMaxRank" % costFunction
+			record(name, lambda: lagrangian_solver.solve_lagrangian(freshmenCosts, entryCosts, genders, bounds, FRESHMEN_WEIGHT, costFunction))
+		# Julia solver (LP.jl reads its inputs from fixed file names in the working directory)
+		julia = distutils.spawn.find_executable("julia")
+		lpFile = os.path.join(os.path.dirname(os.path.abspath(flow_solver.__file__)), "LP.jl")
+		for costFunction in flow_solver.COST_FUNCTIONS:
+			name = "solver/julia/%s_noMaxRank" % costFunction
+			skipped = "julia not found" if julia is None else ("larger than %d" % MAX_SOLVER_SIZE if size > MAX_SOLVER_SIZE else None)
+			def runJulia():
+				with open(os.path.join(directory, "benchmarkFiles.txt"), "w") as f:
+					f.write("output_%d_%s_noMaxRank.csv\n" % (FRESHMEN_WEIGHT * 100, costFunction))
+				subprocess.check_call([julia, lpFile, "benchmarkFiles.txt"], cwd=directory)
+			def setupJulia():
+				for fileName, anonymousName in zip(fileNames[:2], ["finalfroshprefsGen_anon.csv", "entryprefs_anon.csv"]):
+					shutil.copy(fileName, os.path.join(directory, anonymousName))
+				if not os.path.exists(os.path.join(directory, "Outputs")):
+					os.makedirs(os.path.join(directory, "Outputs"))
+			record(name, runJulia, setup=setupJulia, skipped=skipped)
+		# Metrics, on the assignment of the marriage algorithm
+		pairing = marriage.run_marriage_algorithm(fileNames[2], False, marriage.MAX_GENDER_PROPORTION, fileNames[0], fileNames[1], False, None, seed=0, cacheDirectory=None)
+		assignment = np.array(master_algorithm.pairing_to_results(pairing, names.tolist(), entries.tolist()))
+		freshmenPrefs, entryPrefs = freshmenCosts.tolist(), entryCosts.tolist()
+		record("metrics/calculate_metrics", lambda: master_algorithm.score_assignment(freshmenPrefs, entryPrefs, assignment.tolist()))
+		record("metrics/vectorized", lambda: vectorized_metrics.getScores(freshmenCosts, entryCosts, assignment))
+		candidates = np.tile(assignment, (SCORE_CANDIDATES, 1))
+		record("metrics/vectorized_batch_%d" % SCORE_CANDIDATES, lambda: vectorized_metrics.getScores(freshmenCosts, entryCosts, candidates))
+		scorer = incremental_score.IncrementalScorer(freshmenCosts, entryCosts, assignment)
+		moves = zip(np.random.RandomState(0).randint(nFreshmen, size=INCREMENTAL_MOVES), np.random.RandomState(1).randint(nEntries, size=INCREMENTAL_MOVES))
+		record("metrics/incremental_move", lambda: [scorer.move_score(i, j) for (i, j) in moves], number=INCREMENTAL_MOVES)
+		# Whole pipeline, with the Python solver and no worker processes
+		def runPipeline():
+			cwd = os.getcwd()
+			os.chdir(directory)
+			try:
+				master_algorithm.assignFreshmenToEntries(1)
+			finally:
+				os.chdir(cwd)
+		def setupPipeline():
+			clear_caches(directory)
+			master_algorithm.LP_SOLVER = "python"
+			master_algorithm.FRESHMEN_PREFERENCES, master_algorithm.ENTRY_PREFERENCES, master_algorithm.ROOM_NUMBERS = [os.path.basename(fileName) for fileName in fileNames]
+		skipped = "larger than %d" % MAX_END_TO_END_SIZE if size > MAX_END_TO_END_SIZE else None
+		record("end_to_end/python", runPipeline, setup=setupPipeline, skipped=skipped)
+	finally:
+		shutil.rmtree(directory, ignore_errors=True)
+	return results
+
+def git_commit():
+	try:
+		return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=open(os.devnull, "w")).strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+def run_suite(sizes=SIZES, repeat=REPEAT, outputFileName=None):
+	"""
+	Run the benchmarks of every instance size and save them with the commit and machine they were run on.
+
+	Args:
+		sizes          : list of (freshmen, entries)
+		repeat         : int, number of timed runs of each benchmark
+		outputFileName : string, JSON file for the results (None: benchmark_<commit>.json)
+
+	Returns:
+		dictionary saved in outputFileName
+	"""
+	commit = git_commit()
+	report = {"commit": commit, "date": datetime.datetime.now().isoformat(), "python": platform.python_version(),
+		"numpy": np.__version__, "machine": platform.platform(), "repeat": repeat, "results": []}
+	for nFreshmen, nEntries in sizes:
+		report["results"].extend(benchmark_instance(nFreshmen, nEntries, repeat))
+	if outputFileName is None:
+		outputFileName = "benchmark_%s.json" % (commit[:7] if commit else "results")
+	with open(outputFileName, "w") as f:
+		json.dump(report, f, indent=1, sort_keys=True)
+	print "results saved in", outputFileName
+	return report
+
+def compare(oldFileName, newFileName):
+	"""
+	Print the ratio of the best times of two runs of the suite, benchmark by benchmark.
+	"""
+	with open(oldFileName) as f:
+		old = json.load(f)
+	with open(newFileName) as f:
+		new = json.load(f)
+	oldTimes = dict(((r["benchmark"], r["freshmen"], r["entries"]), r["min"]) for r in old["results"] if "min" in r)
+	print "%-40s %-12s %10s %10s %8s" % ("benchmark", "size", old["commit"] and old["commit"][:7], new["commit"] and new["commit"][:7], "ratio")
+	for r in new["results"]:
+		key = (r["benchmark"], r["freshmen"], r["entries"])
+		if "min" in r and key in oldTimes:
+			print "%-40s %-12s %10.4f %10.4f %7.2fx" % (key[0], "%dx%d" % key[1:], oldTimes[key], r["min"], r["min"] / oldTimes[key])
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Time the assignment algorithms on synthetic instances")
+	parser.add_argument("--sizes", help="comma separated freshmen x entries, e.g. 300x9,3000x100 (default: %s)" % ",".join(["%dx%d" % size for size in SIZES]))
+	parser.add_argument("--repeat", type=int, default=REPEAT, help="timed runs of each benchmark")
+	parser.add_argument("--output", help="JSON file for the results")
+	parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files instead of running the suite")
+	args = parser.parse_args()
+	if args.compare:
+		compare(*args.compare)
+	else:
+		sizes = [tuple(map(int, size.split("x"))) for size in args.sizes.split(",")] if args.sizes else SIZES
+		run_suite(sizes, args.repeat, args.output)
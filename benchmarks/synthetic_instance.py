@@ -0,0 +1,72 @@
+# benchmarks/synthetic_instance.py
+# Random instances of any size, in the format of the input files, to measure how the algorithms scale
+# Run from the repository root with: python -m benchmarks.synthetic_instance <nFreshmen> <nEntries> [correlation] [directory]
+
+import os
+import sys
+import numpy as np
+
+MAX_RATING = 6
+FRESHMEN_PREFERENCES = "finalfroshprefsGen.csv"
+ENTRY_PREFERENCES = "entryprefs.csv"
+ROOM_NUMBERS = "entryVacancies.csv"
+
+def generate_instance(nFreshmen, nEntries, correlation=0.5, slack=0.05, seed=0):
+	"""
+	Build a random instance. Freshmen rank entries by a shared popularity plus individual taste, and entries rate
+	freshmen by a shared quality plus individual taste; correlation is the weight of the shared part in both.
+
+	Args:
+		nFreshmen   : int, number of freshmen
+		nEntries    : int, number of entries
+		correlation : float between 0 (independent preferences) and 1 (everyone agrees)
+		slack       : float, proportion of rooms in excess of the number of freshmen
+		seed        : int, seed of the random generator
+
+	Returns:
+		tuple (names, entries, freshmenCosts, entryCosts, genders, rooms), as returned by preference_loader.load_preferences
+	"""
+	rng = np.random.RandomState(seed)
+	names = np.array(["f%d" % i for i in xrange(nFreshmen)])
+	entries = np.array(["E%d" % j for j in xrange(nEntries)])
+	popularity = rng.randn(nEntries)
+	utilities = np.sqrt(correlation) * popularity + np.sqrt(1 - correlation) * rng.randn(nFreshmen, nEntries)
+	freshmenCosts = np.argsort(np.argsort(-utilities, axis=1), axis=1) + 1
+	quality = rng.randn(nFreshmen, 1)
+	scores = np.sqrt(correlation) * quality + np.sqrt(1 - correlation) * rng.randn(nFreshmen, nEntries)
+	# Each entry gives every rating to the same number of freshmen, by quantile of its scores
+	percentiles = np.argsort(np.argsort(scores, axis=0), axis=0) / float(nFreshmen)
+	entryCosts = (percentiles * MAX_RATING).astype(int) + 1
+	genders = rng.randint(0, 2, nFreshmen)
+	# Entry sizes vary by +-25%, rooms are split by largest remainder
+	sizes = rng.uniform(0.75, 1.25, nEntries)
+	shares = sizes / sizes.sum() * int(np.ceil(nFreshmen * (1 + slack)))
+	totals = np.floor(shares).astype(int)
+	totals[np.argsort(totals - shares)[:int(round(shares.sum() - totals.sum()))]] += 1
+	rooms = np.column_stack([np.zeros((nEntries, 2), dtype=int), totals])
+	return names, entries, freshmenCosts, entryCosts, genders, rooms
+
+def write_instance(instance, directory="."):
+	"""
+	Write an instance in directory, with the default file names of master_algorithm.
+
+	Args:
+		instance  : tuple, as returned by generate_instance
+		directory : string, existing directory
+	"""
+	names, entries, freshmenCosts, entryCosts, genders, rooms = instance
+	with open(os.path.join(directory, FRESHMEN_PREFERENCES), "w") as f:
+		for name, rankings, gender in zip(names, freshmenCosts, genders):
+			f.write("%s,%s,%d\n" % (name, ",".join(map(str, rankings)), gender))
+	with open(os.path.join(directory, ENTRY_PREFERENCES), "w") as f:
+		for name, ratings in zip(names, entryCosts):
+			f.write("%s,%s\n" % (name, ",".join(map(str, ratings))))
+	with open(os.path.join(directory, ROOM_NUMBERS), "w") as f:
+		for entry, vacancies in zip(entries, rooms):
+			f.write("%s,%s\n" % (entry, ",".join(map(str, vacancies))))
+
+if __name__ == "__main__":
+	nFreshmen, nEntries = int(sys.argv[1]), int(sys.argv[2])
+	correlation = float(sys.argv[3]) if len(sys.argv) > 3 else 0.5
+	directory = sys.argv[4] if len(sys.argv) > 4 else "."
+	write_instance(generate_instance(nFreshmen, nEntries, correlation), directory)
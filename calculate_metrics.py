@@ -11,13 +11,17 @@ def getFreshmenAverageRankingScore(freshmenPrefs, results):
 		results: list of length nFreshmen, such that entry i is the entry that freshman i was assigned to (0:A, 1:B, etc.)
 
 	Returns:
-		(9 - average ranking given by freshmen to assigned entry)/8 * 100
+		(nEntries - average ranking given by freshmen to assigned entry)/(nEntries - 1) * 100
 	"""
+	nEntries = len(freshmenPrefs[0])
+	# With one entry every freshman gets their only (first) choice
+	if nEntries == 1:
+		return 100.
 	total_rankings = 0
 	for (i,result) in enumerate(results):
 		total_rankings += freshmenPrefs[i][result]
 	average_ranking = float(total_rankings)/len(results)
-	return (9-average_ranking)/8 * 100
+	return (nEntries-average_ranking)/(nEntries-1) * 100
 
 def getPercentageFreshmenInTopThree(freshmenPrefs, results):
 	"""
@@ -45,13 +49,17 @@ def getFreshmenMaxRankingScore(freshmenPrefs, results):
 		results: list of length nFreshmen, such that entry i is the entry that freshman i was assigned to (0:A, 1:B, etc.)
 
 	Returns:
-		(9 - maximum ranking given by a freshman to their assigned entry)/8 * 100
+		(nEntries - maximum ranking given by a freshman to their assigned entry)/(nEntries - 1) * 100
 	"""
+	nEntries = len(freshmenPrefs[0])
+	# With one entry every freshman gets their only (first) choice
+	if nEntries == 1:
+		return 100.
 	max_ranking = 0
 	for (i,result) in enumerate(results):
 		if freshmenPrefs[i][result] > max_ranking:
 			max_ranking = freshmenPrefs[i][result]
-	return float(9-max_ranking)/8 * 100
+	return float(nEntries-max_ranking)/(nEntries-1) * 100
 
 def getEntryAverageRanking(entryPrefs, results):
 	"""
@@ -95,8 +103,9 @@ def getEntryAverageRankingPerEntry(entryPrefs, results):
 	Returns:
 		list of length nEntries with element i being the average rating given by entry i to their assigned freshmen
 	"""
-	average_rankings = [0. for i in xrange(9)]
-	numFreshmenPerEntry = [0 for i in xrange(9)]
+	nEntries = len(entryPrefs[0])
+	average_rankings = [0. for i in xrange(nEntries)]
+	numFreshmenPerEntry = [0 for i in xrange(nEntries)]
 	for (i,result) in enumerate(results):
 		average_rankings[result] = float(numFreshmenPerEntry[result] * average_rankings[result] + entryPrefs[i][result])/(numFreshmenPerEntry[result] + 1)
 		numFreshmenPerEntry[result] += 1
@@ -147,8 +156,9 @@ def getPercentageTopRankedFreshmenPerEntry(entryPrefs, results):
 	Returns:
 		list of length nEntries where element i is the percentage of freshmen in entry i that got a 4, 5 or 6	
 	"""
-	percentage_topranked = [0. for i in xrange(9)]
-	total_freshmen = [0 for i in xrange(9)]
+	nEntries = len(entryPrefs[0])
+	percentage_topranked = [0. for i in xrange(nEntries)]
+	total_freshmen = [0 for i in xrange(nEntries)]
 	for (i,result) in enumerate(results):
 		if entryPrefs[i][result] > 3:
 			percentage_topranked[result] += 1
@@ -0,0 +1,104 @@
+# feasibility.py
+# Pre-flight check of the capacities of LP.jl (freshmenPerEntryMax, freshmenPerEntryMin, boyLimit and girlLimit)
+# against the number of freshmen of each gender, run before any solver so an infeasible instance is reported at once
+# instead of after a full solve and IIS computation.
+# Run from the repository root with: python feasibility.py
+
+import itertools
+import numpy as np
+import flow_solver
+
+GENDER_NAMES = ["boys", "girls", "others"]
+GENDER_LIMITS = ["boyLimit", "girlLimit"]
+
+def capacity_problems(bounds, genders):
+	"""
+	Find the violated conditions of the capacity network: freshmen of each gender flow to the entries through the
+	gender limits, and each entry takes between minPerEntry and maxPerEntry of them. By Hoffman's circulation theorem
+	an assignment exists (when every freshman accepts every entry) if and only if, for every set T of genders:
+		- the freshmen of T fit: nT <= sum over entries of min(maxPerEntry, limit of T)
+		- the minimums can be met: sum over entries of max(0, minPerEntry - limit of T) <= freshmen not in T
+	where the limit of T in an entry is the sum of the gender limits of T (no limit for others).
+
+	Args:
+		bounds  : tuple (maxPerEntry, minPerEntry, maxPerGender), as returned by flow_solver.entry_bounds
+		genders : int array (nFreshmen,), 0 for boys, 1 for girls, 2 for anything else
+
+	Returns:
+		list of problems (empty if the capacities are feasible), dictionaries with keys
+			"constraint" : "rooms" (the freshmen of T do not fit) or "minimum" (the minimums cannot be met)
+			"genders"    : list of genders in T
+			"needed"     : int, freshmen to place ("rooms") or freshmen not in T needed to meet the minimums ("minimum")
+			"available"  : int, places for them ("rooms") or freshmen not in T ("minimum")
+			"entries"    : int array, entries whose bounds make up the shortfall (gender limits below maxPerEntry for
+			               "rooms", minimums above the limit of T for "minimum")
+	"""
+	maxPerEntry, minPerEntry, maxPerGender = bounds
+	counts = np.bincount(np.asarray(genders), minlength=3)
+	problems = []
+	for size in xrange(4):
+		for subset in itertools.combinations(xrange(3), size):
+			limit = maxPerGender[:, list(subset)].sum(axis=1)
+			inside = int(counts[list(subset)].sum())
+			if size > 0:
+				places = int(np.minimum(maxPerEntry, limit).sum())
+				if inside > places:
+					problems.append({"constraint": "rooms", "genders": list(subset), "needed": inside, "available": places, "entries": np.flatnonzero(limit < maxPerEntry)})
+			missing = int(np.maximum(minPerEntry - limit, 0).sum())
+			if missing > len(genders) - inside:
+				problems.append({"constraint": "minimum", "genders": list(subset), "needed": missing, "available": len(genders) - inside, "entries": np.flatnonzero(minPerEntry > limit)})
+	return problems
+
+def describe(problem, entries):
+	"""
+	Args:
+		problem : dictionary, as returned by capacity_problems
+		entries : list of entry names
+
+	Returns:
+		string explaining the problem and the bounds involved
+	"""
+	names = ", ".join([entries[j] for j in problem["entries"]])
+	genders = " and ".join([GENDER_NAMES[g] for g in problem["genders"]])
+	if problem["constraint"] == "rooms":
+		if 2 in problem["genders"]:
+			return "only {0} rooms (freshmenPerEntryMax) for {1} freshmen".format(problem["available"], problem["needed"])
+		if len(problem["entries"]) == 0:
+			return "only {0} rooms (freshmenPerEntryMax) for {1} {2}".format(problem["available"], problem["needed"], genders)
+		limits = "/".join([GENDER_LIMITS[g] for g in problem["genders"]])
+		return "only {0} places for {1} {2}: {3} of {4}".format(problem["available"], problem["needed"], genders, limits, names)
+	if len(problem["genders"]) == 0:
+		return "freshmenPerEntryMin adds up to {0} freshmen, there are only {1}".format(problem["needed"], problem["available"])
+	return "freshmenPerEntryMin of {0} needs {1} freshmen who are not {2}, there are only {3}".format(names, problem["needed"], genders, problem["available"])
+
+def check_capacities(entries, genders, rooms):
+	"""
+	Check the capacities of inputs already parsed and print the problems found.
+
+	Args:
+		entries : list of entry names
+		genders : int array (nFreshmen,), 0 for boys, 1 for girls, 2 for anything else
+		rooms   : int array (nEntries, 3), M, F and U vacancies of each entry
+
+	Returns:
+		list of problems, as returned by capacity_problems
+	"""
+	problems = capacity_problems(flow_solver.entry_bounds(rooms, genders), genders)
+	for problem in problems:
+		print "!!!! INFEASIBLE : " + describe(problem, entries) + " !!!!"
+	return problems
+
+def check_inputs(froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName):
+	"""
+	Check the capacities of the input files and print the problems found.
+
+	Returns:
+		list of problems, as returned by capacity_problems
+	"""
+	names, entries, freshmenCosts, entryCosts, genders, rooms = flow_solver.read_LP_inputs(froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName)
+	return check_capacities(entries, genders, rooms)
+
+if __name__ == "__main__":
+	import master_algorithm
+	if len(check_inputs(master_algorithm.FRESHMEN_PREFERENCES, master_algorithm.ENTRY_PREFERENCES, master_algorithm.ROOM_NUMBERS)) == 0:
+		print "capacities are feasible"
@@ -0,0 +1,635 @@
+# flow_solver.py
+# Python replacement for the cost functions of LP.jl, without Julia or Gurobi. Linear cost functions are solved exactly
+# as a min-cost flow (successive shortest paths), quad by a sequence of such flows (see quad_assignment)
+
+import json
+import os
+import time
+import numpy as np
+import preference_loader
+import instrumentation
+
+# Cost functions of LP.jl
+COST_FUNCTIONS = ["simple", "quad", "simplequad", "simplerquad", "minimax"]
+GENDERS_PROVIDED = False
+EPSILON = 1e-9
+# Cost functions solved approximately (Gurobi solves them exactly in LP.jl): their gap to a lower bound is reported
+APPROXIMATE_COST_FUNCTIONS = ["quad"]
+# quad solves stop once the best assignment is within QUAD_TOLERANCE (relative) of the lower bound, or after QUAD_MAX_ITERATIONS flows
+QUAD_TOLERANCE = 1e-4
+QUAD_MAX_ITERATIONS = 200
+# File where the max ranking bounds of the maxRank variants are kept between runs
+MAX_RANKING_CACHE_FILE = "maxRankingCache.json"
+
+def read_LP_inputs(froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName):
+	"""
+	Read the three input files the way LP.jl does (parsed, validated and cached by preference_loader).
+
+	Args:
+		froshPreferenceFileName : string, name of file with freshmen preferences and genders
+		entryPreferenceFileName : string, name of file with entry preferences
+		entryVacancyFileName    : string, name of file where entry vacancies are listed
+
+	Returns:
+		names          : list of freshman names
+		entries        : list of entry names
+		freshmenCosts  : int array (nFreshmen, nEntries), ranking given by freshman i to entry j
+		entryCosts     : int array (nFreshmen, nEntries), rating given by entry j to freshman i
+		genders        : int array (nFreshmen,), 0 for boys, 1 for girls, 2 for anything else
+		rooms          : int array (nEntries, 3), M, F and U vacancies of each entry
+	"""
+	names, entries, freshmenCosts, entryCosts, genders, rooms = preference_loader.load_preferences(froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName)
+	names, entries = names.tolist(), entries.tolist()
+	return names, entries, freshmenCosts, entryCosts, genders, rooms
+
+def cost_matrix(freshmenCosts, entryCosts, freshmenWeight, costFunction):
+	"""
+	Build the cost of assigning freshman i to entry j, as in LP.jl (quad squares the per entry sums of the simple costs).
+
+	Args:
+		freshmenCosts  : int array (nFreshmen, nEntries), rankings given by freshmen (1 to nEntries)
+		entryCosts     : int array (nFreshmen, nEntries), ratings given by entries (1 to 6)
+		freshmenWeight : float between 0 and 1, relative importance of freshman and entry preferences
+		costFunction   : string, one of COST_FUNCTIONS
+
+	Returns:
+		float array (nFreshmen, nEntries)
+	"""
+	freshmenPart = (freshmenCosts - 1) / max(freshmenCosts.shape[1] - 1., 1.)
+	entryPart = (6 - entryCosts) / 6.
+	if costFunction == "simplerquad":
+		return freshmenWeight * freshmenPart * freshmenPart + (1 - freshmenWeight) * entryPart * entryPart
+	costs = freshmenWeight * freshmenPart + (1 - freshmenWeight) * entryPart
+	if costFunction == "simplequad":
+		return costs * costs
+	return costs
+
+def entry_bounds(rooms, genders, maxGenderProportion=None):
+	"""
+	Per entry capacities of LP.jl: freshmenPerEntryMax, freshmenPerEntryMin, boyLimit and girlLimit.
+
+	The empty rooms (rooms minus freshmen) are spread over the entries in proportion to their vacancies. The original
+	LP.jl spread them in proportion to ENTRY_TOTAL_ROOMS instead, the hard-coded sizes of the nine original entries,
+	which gives minimums a room or two apart when vacancies are not proportional to entry sizes. Those sizes do not
+	exist for other sets of entries, and LP.jl now uses the vacancies as well.
+
+	Args:
+		rooms               : int array (nEntries, 3), M, F and U vacancies of each entry
+		genders             : int array (nFreshmen,), 0 for boys, 1 for girls, 2 for anything else
+		maxGenderProportion : float, proportion used for the gender limits instead of that of the most prevalent gender (None: as LP.jl)
+
+	Returns:
+		maxPerEntry  : int array (nEntries,)
+		minPerEntry  : int array (nEntries,)
+		maxPerGender : float array (nEntries, 3), caps for boys, girls and others (no cap)
+	"""
+	nFreshmen = len(genders)
+	maxPerEntry = rooms.sum(axis=1)
+	if GENDERS_PROVIDED:
+		maxBoys = rooms[:, 0] + rooms[:, 2]
+		maxGirls = rooms[:, 1] + rooms[:, 2]
+	else:
+		maxGender = max((genders == 0).sum(), (genders == 1).sum()) / float(nFreshmen) if maxGenderProportion is None else maxGenderProportion
+		maxBoys = np.floor(4 / 3. * maxGender * maxPerEntry + EPSILON)
+		maxGirls = maxBoys
+	numEmptyRooms = maxPerEntry.sum() - nFreshmen
+	if numEmptyRooms < 0:
+		print "!!!! WARNING : more freshmen than rooms !!!!"
+	minPerEntry = maxPerEntry - np.ceil(float(numEmptyRooms) / maxPerEntry.sum() * maxPerEntry - EPSILON).astype(int)
+	maxPerGender = np.column_stack([maxBoys, maxGirls, np.inf * np.ones(len(maxPerEntry))])
+	return maxPerEntry, minPerEntry, maxPerGender
+
+def exchange_costs(costs, assignment, members, nEntries):
+	"""
+	Cheapest way of moving one freshman out of each entry into each other entry.
+
+	Args:
+		costs      : float array (nFreshmen, nEntries), np.inf where an assignment is not allowed
+		assignment : int array (nFreshmen,), current entry of each freshman
+		members    : int array, freshmen that may be moved (all of the same gender)
+		nEntries   : int, number of entries
+
+	Returns:
+		exchange   : float array (nEntries, nEntries), element (a,b) is the smallest cost change of moving a freshman from a to b
+		mover      : int array (nEntries, nEntries), freshman achieving it
+	"""
+	exchange = np.inf * np.ones((nEntries, nEntries))
+	mover = -np.ones((nEntries, nEntries), dtype=int)
+	if len(members) == 0:
+		return exchange, mover
+	members = members[np.argsort(assignment[members], kind='mergesort')]
+	current = assignment[members]
+	delta = costs[members] - costs[members, current][:, np.newaxis]
+	starts = np.flatnonzero(np.r_[True, current[1:] != current[:-1]])
+	groups = current[starts]
+	best = np.minimum.reduceat(delta, starts, axis=0)
+	rows = np.where(delta == np.repeat(best, np.diff(np.r_[starts, len(members)]), axis=0), np.arange(len(members))[:, np.newaxis], len(members))
+	exchange[groups] = best
+	mover[groups] = members[np.minimum.reduceat(rows, starts, axis=0)]
+	exchange[np.arange(nEntries), np.arange(nEntries)] = np.inf
+	return exchange, mover
+
+def shortest_augmenting_path(freshman, costs, genders, load, maxPerGender, exchanges):
+	"""
+	Bellman-Ford over the residual graph collapsed to (entry, gender) groups and entries. A path starts by placing
+	the freshman in some entry, may push other freshmen of the same gender from entry to entry and ends in an entry
+	with a free room.
+
+	Returns:
+		distGroups : float array (3, nEntries), distance to each (gender, entry) group
+		distEntry  : float array (nEntries,), distance to each entry
+		predGroups : int array (3, nEntries), predecessor of each group (-1 new freshman, -2 entry, >= 0 group of the same gender in that entry)
+		predEntry  : int array (nEntries,), gender group through which each entry is reached
+	"""
+	nEntries = costs.shape[1]
+	distGroups = np.inf * np.ones((3, nEntries))
+	predGroups = -np.ones((3, nEntries), dtype=int)
+	distEntry = np.inf * np.ones(nEntries)
+	predEntry = -np.ones(nEntries, dtype=int)
+	distGroups[genders[freshman]] = costs[freshman]
+	hasRoom = load < maxPerGender
+	occupied = load > 0
+	for iteration in xrange(4 * nEntries + 1):
+		changed = False
+		for gender in xrange(3):
+			candidates = distGroups[gender][:, np.newaxis] + exchanges[gender][0]
+			source = candidates.argmin(axis=0)
+			value = candidates[source, np.arange(nEntries)]
+			better = value < distGroups[gender] - EPSILON
+			if better.any():
+				distGroups[gender][better] = value[better]
+				predGroups[gender][better] = source[better]
+				changed = True
+		for gender in xrange(3):
+			value = np.where(hasRoom[:, gender], distGroups[gender], np.inf)
+			better = value < distEntry - EPSILON
+			if better.any():
+				distEntry[better] = value[better]
+				predEntry[better] = gender
+				changed = True
+		for gender in xrange(3):
+			value = np.where(occupied[:, gender], distEntry, np.inf)
+			better = value < distGroups[gender] - EPSILON
+			if better.any():
+				distGroups[gender][better] = value[better]
+				predGroups[gender][better] = -2
+				changed = True
+		if not changed:
+			break
+	return distGroups, distEntry, predGroups, predEntry
+
+def residual_graph(costs, genders, assignment, maxPerEntry, minPerEntry, maxPerGender):
+	"""
+	Residual graph of a complete assignment, collapsed to (gender, entry) groups, entries and a sink. Nodes are
+	numbered gender * nEntries + entry for the groups, 3 * nEntries + entry for the entries and 4 * nEntries for the sink.
+
+	Returns:
+		weights : float array (nNodes, nNodes), cost of each arc (np.inf if there is none)
+		movers  : int array (nNodes, nNodes), freshman moved along each arc between groups (-1 otherwise)
+	"""
+	nEntries = costs.shape[1]
+	nNodes = 4 * nEntries + 1
+	weights = np.inf * np.ones((nNodes, nNodes))
+	movers = -np.ones((nNodes, nNodes), dtype=int)
+	load = np.zeros((nEntries, 3), dtype=int)
+	np.add.at(load, (assignment, genders), 1)
+	count = load.sum(axis=1)
+	entries = np.arange(nEntries)
+	for gender in xrange(3):
+		group = slice(gender * nEntries, (gender + 1) * nEntries)
+		weights[group, group], movers[group, group] = exchange_costs(costs, assignment, np.flatnonzero(genders == gender), nEntries)
+		weights[gender * nEntries + entries, 3 * nEntries + entries] = np.where(load[:, gender] < maxPerGender[:, gender], 0., np.inf)
+		weights[3 * nEntries + entries, gender * nEntries + entries] = np.where(load[:, gender] > 0, 0., np.inf)
+	weights[3 * nEntries + entries, 4 * nEntries] = np.where(count < maxPerEntry, 0., np.inf)
+	weights[4 * nEntries, 3 * nEntries + entries] = np.where(count > minPerEntry, 0., np.inf)
+	return weights, movers
+
+def find_negative_cycle(weights):
+	"""
+	Bellman-Ford from all nodes at once.
+
+	Args:
+		weights : float array (nNodes, nNodes), cost of each arc (np.inf if there is none)
+
+	Returns:
+		list of nodes forming a cycle of negative cost (in arc order), or None if there is none
+	"""
+	nNodes = len(weights)
+	dist = np.zeros(nNodes)
+	pred = -np.ones(nNodes, dtype=int)
+	for iteration in xrange(nNodes):
+		candidates = dist[:, np.newaxis] + weights
+		source = candidates.argmin(axis=0)
+		value = candidates[source, np.arange(nNodes)]
+		better = value < dist - EPSILON
+		if not better.any():
+			return None
+		dist[better] = value[better]
+		pred[better] = source[better]
+	node = np.flatnonzero(better)[0]
+	for step in xrange(nNodes):
+		node = pred[node]
+	cycle = [node]
+	while pred[cycle[-1]] != node:
+		cycle.append(pred[cycle[-1]])
+	cycle.reverse()
+	if sum([weights[cycle[k - 1], cycle[k]] for k in xrange(len(cycle))]) >= -EPSILON:
+		return None
+	return cycle
+
+def is_feasible(costs, genders, assignment, maxPerEntry, minPerEntry, maxPerGender):
+	"""
+	Check that a complete assignment only uses allowed arcs and respects every capacity.
+	"""
+	nFreshmen, nEntries = costs.shape
+	if len(assignment) != nFreshmen or (assignment < 0).any() or not np.isfinite(costs[np.arange(nFreshmen), assignment]).all():
+		return False
+	load = np.zeros((nEntries, 3), dtype=int)
+	np.add.at(load, (assignment, genders), 1)
+	count = load.sum(axis=1)
+	return (count <= maxPerEntry).all() and (count >= minPerEntry).all() and (load <= maxPerGender).all()
+
+def improve_assignment(costs, genders, assignment, maxPerEntry, minPerEntry, maxPerGender):
+	"""
+	Make a feasible assignment optimal by cancelling negative cycles of its residual graph. Used to warm start a
+	solve from the solution of a nearby problem, which only needs a few cycles.
+
+	Returns:
+		int array (nFreshmen,), optimal assignment
+	"""
+	assignment = assignment.copy()
+	nEntries = costs.shape[1]
+	while True:
+		weights, movers = residual_graph(costs, genders, assignment, maxPerEntry, minPerEntry, maxPerGender)
+		cycle = find_negative_cycle(weights)
+		if cycle is None:
+			return assignment
+		moves = [(movers[cycle[k - 1], cycle[k]], cycle[k] % nEntries) for k in xrange(len(cycle)) if movers[cycle[k - 1], cycle[k]] >= 0]
+		for freshman, entry in moves:
+			assignment[freshman] = entry
+
+def min_cost_assignment(costs, genders, maxPerEntry, minPerEntry, maxPerGender, start=None):
+	"""
+	Solve the transportation problem of LP.jl exactly: each freshman in exactly one entry, between minPerEntry and
+	maxPerEntry freshmen per entry, at most maxPerGender freshmen of each gender per entry, minimal total cost.
+	Freshmen are added one at a time along shortest augmenting paths, which keeps the partial assignment optimal.
+	Lower bounds are enforced with a large negative cost on the first minPerEntry places of each entry.
+
+	Args:
+		costs        : float array (nFreshmen, nEntries), np.inf where an assignment is forbidden
+		genders      : int array (nFreshmen,), 0, 1 or 2
+		maxPerEntry  : int array (nEntries,)
+		minPerEntry  : int array (nEntries,)
+		maxPerGender : float array (nEntries, 3)
+		start        : int array (nFreshmen,), optional assignment to warm start from (ignored if not feasible)
+
+	Returns:
+		int array (nFreshmen,) with the entry of each freshman, or None if the problem is infeasible
+	"""
+	if start is not None and is_feasible(costs, genders, start, maxPerEntry, minPerEntry, maxPerGender):
+		return improve_assignment(costs, genders, start, maxPerEntry, minPerEntry, maxPerGender)
+	nFreshmen, nEntries = costs.shape
+	finite = costs[np.isfinite(costs)]
+	bigM = 1. + nFreshmen * (finite.max() - finite.min() if len(finite) > 0 else 0.)
+	assignment = -np.ones(nFreshmen, dtype=int)
+	for freshman in xrange(nFreshmen):
+		placed = assignment >= 0
+		load = np.zeros((nEntries, 3), dtype=int)
+		np.add.at(load, (assignment[placed], genders[placed]), 1)
+		count = load.sum(axis=1)
+		exchanges = [exchange_costs(costs, assignment, np.flatnonzero(placed & (genders == gender)), nEntries) for gender in xrange(3)]
+		distGroups, distEntry, predGroups, predEntry = shortest_augmenting_path(freshman, costs, genders, load, maxPerGender, exchanges)
+		# maxPerEntry first: with more freshmen than rooms, minPerEntry is above it
+		sinkCosts = np.where(count >= maxPerEntry, np.inf, np.where(count < minPerEntry, -bigM, 0.))
+		total = distEntry + sinkCosts
+		entry = total.argmin()
+		if not np.isfinite(total[entry]):
+			return None
+		# Walk the path back to the new freshman, moving freshmen along the way
+		gender = predEntry[entry]
+		for step in xrange(4 * nEntries + 1):
+			previous = predGroups[gender][entry]
+			if previous == -1:
+				assignment[freshman] = entry
+				break
+			elif previous == -2:
+				gender = predEntry[entry]
+			else:
+				assignment[exchanges[gender][1][previous, entry]] = entry
+				entry = previous
+	count = np.bincount(assignment, minlength=nEntries)
+	if (count < minPerEntry).any():
+		return None
+	return assignment
+
+def minimax_assignment(costs, genders, maxPerEntry, minPerEntry, maxPerGender, start=None):
+	"""
+	Minimize the largest cost of an assignment (minimax cost function of LP.jl), by bisection on the cost values.
+	Among optimal assignments, the one with smallest total cost is returned.
+
+	Returns:
+		int array (nFreshmen,) with the entry of each freshman, or None if the problem is infeasible
+	"""
+	values = np.unique(costs[np.isfinite(costs)])
+	best = None
+	low, high = 0, len(values) - 1
+	while low <= high:
+		middle = (low + high) / 2
+		assignment = min_cost_assignment(np.where(costs <= values[middle], costs, np.inf), genders, maxPerEntry, minPerEntry, maxPerGender, start)
+		if instrumentation.ENABLED:
+			instrumentation.event("bisection", bound=float(values[middle]), feasible=assignment is not None)
+		if assignment is None:
+			low = middle + 1
+		else:
+			best = assignment
+			high = middle - 1
+	return best
+
+def entry_sums(costs, assignment):
+	"""
+	Returns:
+		float array (nEntries,), total cost of the freshmen of each entry
+	"""
+	return np.bincount(assignment, weights=costs[np.arange(len(assignment)), assignment], minlength=costs.shape[1])
+
+def quad_assignment(costs, genders, maxPerEntry, minPerEntry, maxPerGender, start=None):
+	"""
+	Minimize the sum over entries of the squared total cost of their freshmen (quad cost function of LP.jl), by
+	Frank-Wolfe on the convex relaxation. Each step linearizes the objective at the current per entry sums S: assigning
+	freshman i to entry j costs 2 S_j c_ij, an exact min_cost_assignment warm started from the previous step. Its
+	solution is an assignment, kept if it is the best one so far, and gives a lower bound on the optimum (convexity).
+	The relaxed sums then move towards it by exact line search. The assignment returned is within the final gap of
+	the relaxed optimum: about 1e-4 with tens of freshmen per entry, much more with a handful. This is a heuristic, not
+	an exact solve: the gap is returned so callers can report it.
+
+	Returns:
+		assignment : int array (nFreshmen,) with the entry of each freshman, or None if the problem is infeasible
+		gap        : float, (quad cost of assignment - lower bound) / quad cost of assignment (np.inf if infeasible)
+	"""
+	allowed = np.isfinite(costs)
+	vertex = min_cost_assignment(costs, genders, maxPerEntry, minPerEntry, maxPerGender, start)
+	if vertex is None:
+		return None, np.inf
+	sums = entry_sums(costs, vertex)
+	best, bestValue = vertex, (sums * sums).sum()
+	lowerBound = 0.
+	for iteration in xrange(QUAD_MAX_ITERATIONS):
+		vertex = min_cost_assignment(np.where(allowed, costs * sums, np.inf), genders, maxPerEntry, minPerEntry, maxPerGender, vertex)
+		vertexSums = entry_sums(costs, vertex)
+		vertexValue = (vertexSums * vertexSums).sum()
+		if vertexValue < bestValue:
+			best, bestValue = vertex, vertexValue
+		direction = vertexSums - sums
+		lowerBound = max(lowerBound, (sums * sums).sum() + 2 * (sums * direction).sum())
+		if instrumentation.ENABLED:
+			instrumentation.event("linearization", best=float(bestValue), lowerBound=float(lowerBound))
+		if bestValue - lowerBound <= QUAD_TOLERANCE * bestValue or not direction.any():
+			break
+		step = min(max(-(sums * direction).sum() / (direction * direction).sum(), 0.), 1.)
+		sums = sums + step * direction
+	return best, max(bestValue - lowerBound, 0.) / bestValue if bestValue > 0 else 0.
+
+def load_max_ranking_cache(cacheFileName=MAX_RANKING_CACHE_FILE):
+	"""
+	Read the max ranking bounds saved by previous runs.
+
+	Returns:
+		dictionary mapping "<input hash>:<freshman weight>" to the max ranking bound (empty if there is no cache file)
+	"""
+	if not os.path.exists(cacheFileName):
+		return {}
+	with open(cacheFileName) as f:
+		return json.load(f)
+
+def save_max_ranking_cache(cache, cacheFileName=MAX_RANKING_CACHE_FILE):
+	"""
+	Save the max ranking bounds for later runs. Several sweeps may run in parallel, so the bounds saved by the others
+	since this one started are read again and kept, and the file is replaced atomically. A sweep saving between that
+	read and the rename can still lose its new bounds; they are only recomputed by the next run that needs them.
+	"""
+	merged = load_max_ranking_cache(cacheFileName)
+	merged.update(cache)
+	temporaryFileName = "%s.%d" % (cacheFileName, os.getpid())
+	with open(temporaryFileName, "w") as f:
+		json.dump(merged, f, indent=1, sort_keys=True)
+	os.rename(temporaryFileName, cacheFileName)
+
+def max_ranking_key(inputHash, freshmenWeight):
+	return "%s:%r" % (inputHash, freshmenWeight)
+
+def fill_max_ranking_cache(inputs, freshmenWeights, inputHash):
+	"""
+	Compute the max ranking bounds missing from MAX_RANKING_CACHE_FILE for some weights (minimax solves in increasing
+	weight order, each warm started from the previous one) and save them, so that sweeps started afterwards, in
+	parallel, find them all instead of each solving the same minimax problems.
+
+	Args:
+		inputs          : tuple, the input files already parsed, as returned by read_LP_inputs
+		freshmenWeights : list of floats, weights of the maxRank variants
+		inputHash       : string, hash of the input files, as returned by preference_loader.input_hash
+
+	Returns:
+		int, number of bounds computed
+	"""
+	names, entries, freshmenCosts, entryCosts, genders, rooms = inputs
+	bounds = entry_bounds(rooms, genders)
+	maxRankingCache = load_max_ranking_cache()
+	missing = sorted(set([weight for weight in freshmenWeights if max_ranking_key(inputHash, weight) not in maxRankingCache]))
+	previous = None
+	for freshmenWeight in missing:
+		assignment = solve(freshmenCosts, entryCosts, genders, bounds, freshmenWeight, "minimax", False, previous, maxRankingCache, inputHash)
+		previous = assignment if assignment is not None else previous
+	if len(missing) > 0:
+		save_max_ranking_cache(maxRankingCache)
+	return len(missing)
+
+def solve(freshmenCosts, entryCosts, genders, bounds, freshmenWeight, costFunction, maxRanking, start=None, maxRankingCache=None, inputHash="", details=None):
+	"""
+	Solve one LP.jl variant.
+
+	Args:
+		freshmenCosts   : int array (nFreshmen, nEntries), rankings given by freshmen
+		entryCosts      : int array (nFreshmen, nEntries), ratings given by entries
+		genders         : int array (nFreshmen,), 0, 1 or 2
+		bounds          : tuple (maxPerEntry, minPerEntry, maxPerGender), as returned by entry_bounds
+		freshmenWeight  : float between 0 and 1, relative importance of freshman and entry preferences
+		costFunction    : string, one of COST_FUNCTIONS
+		maxRanking      : boolean, true if no freshman may get a worse ranking than in the minimax solution
+		start           : int array (nFreshmen,), optional assignment to warm start from, typically the solution for a nearby weight
+		maxRankingCache : dictionary, optional cache of max ranking bounds (see load_max_ranking_cache), read and updated
+		inputHash       : string, hash of the input files (see preference_loader.input_hash), part of the cache keys
+		details         : dictionary, optional, given the "gap" of the assignment to a lower bound for the cost functions
+		                  of APPROXIMATE_COST_FUNCTIONS (the others are solved exactly)
+
+	Returns:
+		int array (nFreshmen,) with the entry of each freshman, or None if the problem is infeasible
+	"""
+	maxPerEntry, minPerEntry, maxPerGender = bounds
+	costs = cost_matrix(freshmenCosts, entryCosts, freshmenWeight, costFunction)
+	cacheKey = max_ranking_key(inputHash, freshmenWeight)
+	if maxRanking:
+		if maxRankingCache is not None and cacheKey in maxRankingCache:
+			maximumRanking = maxRankingCache[cacheKey]
+		else:
+			minimax = solve(freshmenCosts, entryCosts, genders, bounds, freshmenWeight, "minimax", False, start, maxRankingCache, inputHash)
+			if minimax is None:
+				return None
+			maximumRanking = int(freshmenCosts[np.arange(len(minimax)), minimax].max())
+		costs = np.where(freshmenCosts <= maximumRanking, costs, np.inf)
+	if costFunction == "minimax":
+		assignment = minimax_assignment(costs, genders, maxPerEntry, minPerEntry, maxPerGender, start)
+		# The bound used by the maxRank variants comes from the plain minimax solution
+		if not maxRanking and assignment is not None and maxRankingCache is not None:
+			maxRankingCache[cacheKey] = int(freshmenCosts[np.arange(len(assignment)), assignment].max())
+		return assignment
+	if costFunction == "quad":
+		assignment, gap = quad_assignment(costs, genders, maxPerEntry, minPerEntry, maxPerGender, start)
+		if details is not None:
+			details["gap"] = gap
+		return assignment
+	return min_cost_assignment(costs, genders, maxPerEntry, minPerEntry, maxPerGender, start)
+
+def solution_status(costFunction, details):
+	"""
+	Returns:
+		string printed for a feasible variant, "optimal solution found" or "approximate solution found, gap x%"
+	"""
+	if costFunction in APPROXIMATE_COST_FUNCTIONS:
+		return "approximate solution found, gap %.4f%%" % (100 * details["gap"])
+	return "optimal solution found"
+
+def write_assignment(names, entries, assignment, fileName):
+	"""
+	Write an assignment in the format of the LP.jl output files (one "name,entry" line per freshman).
+	"""
+	outputFile = open(fileName, "w")
+	for name, entry in zip(names, assignment):
+		outputFile.write(name + "," + entries[entry] + "\n")
+	outputFile.close()
+
+def run_LP(outputFileName, freshmenWeight, costFunction, maxRanking, froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName):
+	"""
+	Run one LP formulation and save its output in Outputs/, like run_LP in LP.jl.
+
+	Args:
+		outputFileName          : string, name of file where output is saved
+		freshmenWeight          : float between 0 and 1, relative importance of freshman and entry preferences
+		costFunction            : string, one of COST_FUNCTIONS
+		maxRanking              : boolean, true if minimax algorithm is run first to try and enforce freshman fairness
+		froshPreferenceFileName : string, name of file with freshmen preferences and genders
+		entryPreferenceFileName : string, name of file with entry preferences
+		entryVacancyFileName    : string, name of file where entry vacancies are listed
+	"""
+	names, entries, freshmenCosts, entryCosts, genders, rooms = read_LP_inputs(froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName)
+	maxRankingCache = load_max_ranking_cache()
+	inputHash = preference_loader.input_hash(froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName)
+	details = {}
+	with instrumentation.phase("solve", variant=outputFileName, warmStart=False):
+		assignment = solve(freshmenCosts, entryCosts, genders, entry_bounds(rooms, genders), freshmenWeight, costFunction, maxRanking, maxRankingCache=maxRankingCache, inputHash=inputHash, details=details)
+	save_max_ranking_cache(maxRankingCache)
+	if assignment is None:
+		print outputFileName + "\t: infeasible"
+		return None
+	print outputFileName + "\t: " + solution_status(costFunction, details)
+	write_assignment(names, entries, assignment, "Outputs/" + outputFileName)
+	return assignment
+
+def parse_output_file_name(fileName):
+	"""
+	Extract the parameters of an LP variant from its output file name (output_<weight>_<costFunction>_<maxRank>.csv).
+
+	Returns:
+		freshmenWeight, costFunction, maxRanking, or None for the marriage outputs
+	"""
+	row = fileName.split(".")[0].split("_")
+	if row[1] == "marriage":
+		return None
+	return float(row[1]) / 100, row[2], row[3] != "noMaxRank"
+
+def run_all_LP_solutions(algorithmFileName, froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName):
+	"""
+	Run all LP solutions listed in the file provided, like run_all_LP_solutions in LP.jl.
+
+	Args:
+		algorithmFileName : string, name of file with listed algorithms to be used
+	"""
+	algorithmFile = open(algorithmFileName, "r")
+	for line in algorithmFile:
+		fileName = line.rstrip()
+		parameters = parse_output_file_name(fileName)
+		if parameters is not None:
+			freshmenWeight, costFunction, maxRanking = parameters
+			run_LP(fileName, freshmenWeight, costFunction, maxRanking, froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName)
+	algorithmFile.close()
+	return 0
+
+def sweep_LP_solutions(algorithmFileName, froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName):
+	"""
+	Run all LP solutions listed in the file provided as a sweep (see sweep_variants), and save their outputs in Outputs/.
+
+	Args:
+		algorithmFileName : string, name of file with listed algorithms to be used
+
+	Returns:
+		dictionary mapping output file names to solve times (seconds)
+	"""
+	algorithmFile = open(algorithmFileName, "r")
+	fileNames = [line.rstrip() for line in algorithmFile]
+	algorithmFile.close()
+	assignments, solveTimes = sweep_variants(fileNames, froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName, "Outputs/")
+	return solveTimes
+
+def sweep_variants(fileNames, froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName, outputDirectory=None, inputs=None, inputHash=None):
+	"""
+	Solve LP variants as a sweep: the inputs are read and the capacities built once, and for each cost function and
+	maxRank setting the weights are solved in increasing order, each one warm started from the solution of the
+	previous weight. Max ranking bounds are computed once per weight and saved in MAX_RANKING_CACHE_FILE. Prints the
+	solve time of each variant.
+
+	Args:
+		fileNames       : list of output file names of the variants (marriage outputs are ignored)
+		outputDirectory : string, directory where outputs are written (None to only return them)
+		inputs          : tuple, the input files already parsed, as returned by read_LP_inputs (None: read them)
+		inputHash       : string, hash of the input files, as returned by preference_loader.input_hash (None: compute it)
+
+	Returns:
+		assignments : dictionary mapping output file names to assignments (int arrays, rows in the order of the preference files), for feasible variants
+		solveTimes  : dictionary mapping output file names to solve times (seconds)
+	"""
+	with instrumentation.phase("read_inputs", parsed=inputs is not None):
+		if inputs is None:
+			inputs = read_LP_inputs(froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName)
+		names, entries, freshmenCosts, entryCosts, genders, rooms = inputs
+		bounds = entry_bounds(rooms, genders)
+	maxRankingCache = load_max_ranking_cache()
+	if inputHash is None:
+		inputHash = preference_loader.input_hash(froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName)
+	variants = {}
+	for fileName in fileNames:
+		parameters = parse_output_file_name(fileName)
+		if parameters is not None:
+			freshmenWeight, costFunction, maxRanking = parameters
+			variants.setdefault((costFunction, maxRanking), []).append((freshmenWeight, fileName))
+	assignments = {}
+	solveTimes = {}
+	sweepStart = time.time()
+	for (costFunction, maxRanking), runs in sorted(variants.items()):
+		previous = None
+		for freshmenWeight, fileName in sorted(runs):
+			start = time.time()
+			details = {}
+			with instrumentation.phase("solve", variant=fileName, warmStart=previous is not None) as solvePhase:
+				assignment = solve(freshmenCosts, entryCosts, genders, bounds, freshmenWeight, costFunction, maxRanking, previous, maxRankingCache, inputHash, details)
+				solvePhase.set(feasible=assignment is not None, **details)
+			solveTimes[fileName] = time.time() - start
+			if assignment is None:
+				print "%s\t: infeasible (%.3f s)" % (fileName, solveTimes[fileName])
+				continue
+			print "%s\t: %s (%.3f s)" % (fileName, solution_status(costFunction, details), solveTimes[fileName])
+			if outputDirectory is not None:
+				write_assignment(names, entries, assignment, outputDirectory + fileName)
+			assignments[fileName] = assignment
+			previous = assignment
+	save_max_ranking_cache(maxRankingCache)
+	print "%d variants solved in %.3f s" % (len(solveTimes), time.time() - sweepStart)
+	return assignments, solveTimes
@@ -0,0 +1,152 @@
+# incremental_score.py
+# Stateful version of master_algorithm.calculate_score, for local search: keeps running sums of the metrics of
+# calculate_metrics so that moving or swapping freshmen is scored in constant time
+
+import numpy as np
+
+class IncrementalScorer:
+	def __init__(self, freshmenPrefs, entryPrefs, results):
+		"""
+		Args:
+			freshmenPrefs : array of dimensions (nFreshmen, nEntries) where entry (i,j) is the ranking given by freshman i to entry j
+			entryPrefs    : array of dimensions (nFreshmen, nEntries) where entry (i,j) is the rating given by entry j to freshman i
+			results       : int array of length nFreshmen, entry each freshman is assigned to (copied)
+		"""
+		self.freshmenPrefs = np.asarray(freshmenPrefs)
+		self.entryPrefs = np.asarray(entryPrefs)
+		self.nFreshmen, self.nEntries = self.freshmenPrefs.shape
+		self.results = np.array(results, dtype=int)
+		self.recompute()
+
+	def recompute(self):
+		"""
+		Rebuild all running sums from the current assignment (also clears accumulated rounding errors).
+		"""
+		rows = np.arange(self.nFreshmen)
+		rankings = self.freshmenPrefs[rows, self.results]
+		ratings = self.entryPrefs[rows, self.results]
+		self.totalRanking = int(rankings.sum())
+		self.rankingCounts = np.bincount(rankings, minlength=self.freshmenPrefs.max() + 1)
+		self.maxRanking = int(rankings.max())
+		self.topRanked = int((ratings > 3).sum())
+		self.entryTotals = np.bincount(self.results, weights=ratings, minlength=self.nEntries)
+		self.entryCounts = np.bincount(self.results, minlength=self.nEntries)
+		self.totalRating = float(ratings.sum())
+		averages = self.entryTotals / np.maximum(self.entryCounts, 1)
+		self.sumAverages = float(averages.sum())
+		self.sumSquaredAverages = float((averages ** 2).sum())
+
+	def _average(self, total, count):
+		return total / count if count > 0 else 0.
+
+	def _composite(self, totalRanking, maxRanking, topRanked, totalRating, sumAverages, sumSquaredAverages):
+		if self.nEntries > 1:
+			freshmanHappiness = (self.nEntries - float(totalRanking) / self.nFreshmen) / (self.nEntries - 1) * 100
+			freshmanFairness = float(self.nEntries - max(maxRanking, 0)) / (self.nEntries - 1) * 100
+		else:
+			# With one entry every freshman gets their only (first) choice
+			freshmanHappiness = freshmanFairness = 100.
+		entryHappiness = float(topRanked) / self.nFreshmen
+		globalAverage = totalRating / self.nFreshmen
+		# sum over entries of (average - globalAverage)^2, expanded so that it only needs the two running sums
+		variance = (sumSquaredAverages - 2 * globalAverage * sumAverages + self.nEntries * globalAverage ** 2) / self.nEntries
+		maxVariance = 0.4
+		entryFairness = (1 - min(max(variance, 0.), maxVariance) / maxVariance) * 100
+		return 0.5 * freshmanHappiness + 0.1 * freshmanFairness + 0.2 * entryHappiness + 0.2 * entryFairness
+
+	def score(self):
+		"""
+		Returns:
+			composite score of the current assignment, as calculate_score would compute it
+		"""
+		return self._composite(self.totalRanking, self.maxRanking, self.topRanked, self.totalRating, self.sumAverages, self.sumSquaredAverages)
+
+	def _changes(self, moves):
+		"""
+		Running sums after some freshmen change entries, without modifying the state.
+
+		Args:
+			moves : list of (freshman, new entry)
+
+		Returns:
+			tuple (totalRanking, maxRanking, topRanked, totalRating, sumAverages, sumSquaredAverages, entryChanges, rankingChanges)
+			where entryChanges maps entries to their new (total, count) and rankingChanges maps rankings to count changes
+		"""
+		totalRanking = self.totalRanking
+		topRanked = self.topRanked
+		totalRating = self.totalRating
+		entryChanges = {}
+		rankingChanges = {}
+		for freshman, entry in moves:
+			old = self.results[freshman]
+			if old == entry:
+				continue
+			oldRanking, newRanking = self.freshmenPrefs[freshman, old], self.freshmenPrefs[freshman, entry]
+			oldRating, newRating = self.entryPrefs[freshman, old], self.entryPrefs[freshman, entry]
+			totalRanking += newRanking - oldRanking
+			topRanked += int(newRating > 3) - int(oldRating > 3)
+			totalRating += newRating - oldRating
+			rankingChanges[oldRanking] = rankingChanges.get(oldRanking, 0) - 1
+			rankingChanges[newRanking] = rankingChanges.get(newRanking, 0) + 1
+			total, count = entryChanges.get(old, (self.entryTotals[old], self.entryCounts[old]))
+			entryChanges[old] = (total - oldRating, count - 1)
+			total, count = entryChanges.get(entry, (self.entryTotals[entry], self.entryCounts[entry]))
+			entryChanges[entry] = (total + newRating, count + 1)
+		sumAverages = self.sumAverages
+		sumSquaredAverages = self.sumSquaredAverages
+		for entry, (total, count) in entryChanges.items():
+			oldAverage = self._average(self.entryTotals[entry], self.entryCounts[entry])
+			newAverage = self._average(total, count)
+			sumAverages += newAverage - oldAverage
+			sumSquaredAverages += newAverage ** 2 - oldAverage ** 2
+		maxRanking = self.maxRanking
+		added = [ranking for ranking, change in rankingChanges.items() if change > 0]
+		if len(added) > 0 and max(added) > maxRanking:
+			maxRanking = max(added)
+		else:
+			while maxRanking > 0 and self.rankingCounts[maxRanking] + rankingChanges.get(maxRanking, 0) == 0:
+				maxRanking -= 1
+		return totalRanking, maxRanking, topRanked, totalRating, sumAverages, sumSquaredAverages, entryChanges, rankingChanges
+
+	def moves_score(self, moves):
+		"""
+		Returns:
+			composite score if the freshmen of moves, a list of (freshman, new entry), changed entries (the assignment is not changed)
+		"""
+		return self._composite(*self._changes(moves)[:6])
+
+	def move_score(self, freshman, entry):
+		"""
+		Returns:
+			composite score if freshman was moved to entry (the assignment is not changed)
+		"""
+		return self.moves_score([(freshman, entry)])
+
+	def swap_score(self, freshman, other):
+		"""
+		Returns:
+			composite score if freshman and other exchanged entries (the assignment is not changed)
+		"""
+		return self.moves_score([(freshman, self.results[other]), (other, self.results[freshman])])
+
+	def apply(self, moves):
+		"""
+		Change the assignment and update the running sums.
+
+		Args:
+			moves : list of (freshman, new entry)
+		"""
+		self.totalRanking, self.maxRanking, self.topRanked, self.totalRating, self.sumAverages, self.sumSquaredAverages, entryChanges, rankingChanges = self._changes(moves)
+		for entry, (total, count) in entryChanges.items():
+			self.entryTotals[entry] = total
+			self.entryCounts[entry] = count
+		for ranking, change in rankingChanges.items():
+			self.rankingCounts[ranking] += change
+		for freshman, entry in moves:
+			self.results[freshman] = entry
+
+	def move(self, freshman, entry):
+		self.apply([(freshman, entry)])
+
+	def swap(self, freshman, other):
+		self.apply([(freshman, self.results[other]), (other, self.results[freshman])])
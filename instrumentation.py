@@ -0,0 +1,183 @@
+# instrumentation.py
+# Opt-in timing of the phases of a run (parsing, distribute_entries, greasing, marriage rounds, solves, scoring...),
+# with round counters, growth of the peak memory and pluggable hooks. Disabled by default: phase() then returns a
+# shared object that does nothing, and the hot loops only test ENABLED.
+
+import cProfile
+import json
+import os
+import time
+try:
+	import resource
+except ImportError:
+	# Not available on Windows: no memory figures
+	resource = None
+
+ENABLED = False
+hooks = []
+# Records of the phases that are still running, innermost last, and of the finished top level phases
+stack = []
+finished = []
+
+class Hook:
+	"""
+	Base class of hooks, called with the record of each phase (see phase) when it starts and when it ends.
+	"""
+	def start(self, record):
+		pass
+
+	def end(self, record):
+		pass
+
+class CallbackHook(Hook):
+	def __init__(self, function, phaseNames=None):
+		"""
+		Args:
+			function   : called with the record of each finished phase
+			phaseNames : list of phase names to report (None: all of them)
+		"""
+		self.function = function
+		self.phaseNames = phaseNames
+
+	def end(self, record):
+		if self.phaseNames is None or record["name"] in self.phaseNames:
+			self.function(record)
+
+class ProfileHook(Hook):
+	def __init__(self, phaseNames, directory="."):
+		"""
+		Run cProfile during the phases named in phaseNames, and save the statistics of each one in directory (the
+		file name is added to the record of the phase as "profile"). Profiled phases should not be nested.
+		"""
+		self.phaseNames = phaseNames
+		self.directory = directory
+		self.profiles = []
+
+	def start(self, record):
+		if record["name"] in self.phaseNames:
+			profile = cProfile.Profile()
+			self.profiles.append(profile)
+			profile.enable()
+
+	def end(self, record):
+		if record["name"] in self.phaseNames:
+			profile = self.profiles.pop()
+			profile.disable()
+			record["profile"] = os.path.join(self.directory, "%s_%d_%d.prof" % (record["name"], os.getpid(), int(record["start"] * 1000)))
+			profile.dump_stats(record["profile"])
+
+def max_rss():
+	"""
+	Returns:
+		peak resident memory of the process so far, in kilobytes (None if unknown)
+	"""
+	if resource is None:
+		return None
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+class Phase:
+	def __init__(self, name, info):
+		self.record = {"name": name, "info": info, "events": [], "phases": []}
+
+	def __enter__(self):
+		record = self.record
+		record["start"] = time.time()
+		record["processPeakRSSBefore"] = max_rss()
+		stack.append(record)
+		for hook in hooks:
+			hook.start(record)
+		return self
+
+	def __exit__(self, exceptionType, exception, traceback):
+		record = self.record
+		record["seconds"] = time.time() - record["start"]
+		record["processPeakRSS"] = max_rss()
+		# ru_maxrss is the peak of the whole process (inherited by forked workers): only its growth belongs to the phase
+		if record["processPeakRSS"] is not None:
+			record["peakRSSIncrease"] = record["processPeakRSS"] - record["processPeakRSSBefore"]
+		if exceptionType is not None:
+			record["error"] = repr(exception)
+		for hook in hooks:
+			hook.end(record)
+		stack.pop()
+		if len(stack) > 0:
+			stack[-1]["phases"].append(record)
+		else:
+			finished.append(record)
+		return False
+
+	def set(self, **info):
+		"""
+		Add information to the record of the phase (for instance counts only known at the end).
+		"""
+		self.record["info"].update(info)
+
+class NullPhase:
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exceptionType, exception, traceback):
+		return False
+
+	def set(self, **info):
+		pass
+
+NULL_PHASE = NullPhase()
+
+def phase(name, **info):
+	"""
+	Context manager timing a phase. Phases started inside it are recorded as its sub-phases.
+
+	Args:
+		name : string, name of the phase
+		info : values saved with the phase (variant name, cost function...)
+
+	Returns:
+		object with a set(**info) method. The record of the phase has keys "name", "info", "start", "seconds",
+		"processPeakRSSBefore" and "processPeakRSS" (peak memory of the whole process so far, before and after, kB),
+		"peakRSSIncrease" (how much the phase raised that peak, kB: 0 when it stayed below an earlier peak), "events"
+		and "phases".
+	"""
+	if not ENABLED:
+		return NULL_PHASE
+	return Phase(name, info)
+
+def event(name, **values):
+	"""
+	Record an event (such as one marriage round with its proposals and rejections) in the innermost running phase.
+	"""
+	if ENABLED and len(stack) > 0:
+		values["event"] = name
+		stack[-1]["events"].append(values)
+
+def enable(*newHooks):
+	"""
+	Start recording phases, with the hooks given (instances of Hook), and forget the phases recorded before.
+	"""
+	global ENABLED
+	ENABLED = True
+	hooks[:] = list(newHooks)
+	reset()
+
+def disable():
+	global ENABLED
+	ENABLED = False
+
+def reset():
+	del finished[:]
+
+def save(fileName, phases=None, **header):
+	"""
+	Save phases (and their sub-phases) as JSON.
+
+	Args:
+		fileName : string, name of the JSON file
+		phases   : list of phase records (None: the finished top level phases, which are then forgotten)
+		header   : values saved next to the phases
+	"""
+	report = dict(header)
+	report["phases"] = list(finished) if phases is None else phases
+	with open(fileName, "w") as f:
+		json.dump(report, f, indent=1, sort_keys=True)
+	if phases is None:
+		reset()
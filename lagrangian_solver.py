@@ -0,0 +1,327 @@
+# lagrangian_solver.py
+# Decomposition mode for campus-scale instances (tens of thousands of freshmen, hundreds of entries) that are too
+# large for one model: the capacities of LP.jl (freshmenPerEntryMax, freshmenPerEntryMin, boyLimit and girlLimit) are
+# moved into the objective with Lagrange multipliers, which leaves one argmin per freshman. Blocks of freshmen are
+# priced in parallel by worker processes, the multipliers follow subgradient steps, and the assignment of the best
+# multipliers is repaired into a feasible one. The duality gap to the Lagrangian lower bound is reported.
+# Run from the repository root with: python lagrangian_solver.py [freshmenWeight] [costFunction] [numWorkers] [outputFileName]
+
+import multiprocessing
+import sys
+import time
+import numpy as np
+import feasibility
+import flow_solver
+import instrumentation
+from marriage_engine import group_positions
+
+# Cost functions whose objective is a sum over freshmen (as in relaxation_solver)
+COST_FUNCTIONS = ["simple", "simplequad", "simplerquad"]
+# Number of worker processes pricing the freshmen (None: one per core, 1: no worker processes)
+NUM_WORKERS = None
+# Subgradient steps: Polyak steps scaled by a factor that starts at STEP_SCALE and is halved after STALL_ITERATIONS
+# iterations without a better bound. Stops after MAX_ITERATIONS, once the factor is below MIN_STEP_SCALE, or once the
+# bound is within GAP_TOLERANCE (relative) of the best assignment found
+MAX_ITERATIONS = 500
+STEP_SCALE = 2.
+MIN_STEP_SCALE = 1e-3
+STALL_ITERATIONS = 10
+GAP_TOLERANCE = 1e-4
+# The best multipliers are repaired into an assignment every REPAIR_INTERVAL iterations (starting with the first),
+# which gives the steps their target
+REPAIR_INTERVAL = 50
+# When the greedy repair fails, min_cost_assignment is the fallback up to these many freshmen x entries (it needs
+# several minutes at 3000 x 100 already, see benchmarks/suite.py); above it the repair gives up on those multipliers
+MAX_FALLBACK_SIZE = 300000
+
+# Cost matrix and genders priced by the worker processes, set before the pool is started (workers inherit them)
+workerCosts = None
+workerGenders = None
+
+def priced_costs(start, stop, prices):
+	"""
+	Returns:
+		float array (stop - start, nEntries), costs of freshmen start to stop - 1 plus the price of their gender in each entry
+	"""
+	return workerCosts[start:stop] + prices[workerGenders[start:stop]]
+
+def price_block(block):
+	"""
+	Solve the subproblems of a block of freshmen: each one picks their cheapest entry at the current prices.
+
+	Args:
+		block : tuple (start, stop, prices), freshmen start to stop - 1 and float array (3, nEntries) of prices
+
+	Returns:
+		value : float, total priced cost of the choices
+		load  : int array (nEntries, 3), number of freshmen of each gender choosing each entry
+	"""
+	start, stop, prices = block
+	priced = priced_costs(start, stop, prices)
+	choices = priced.argmin(axis=1)
+	load = np.zeros((prices.shape[1], 3), dtype=int)
+	np.add.at(load, (choices, workerGenders[start:stop]), 1)
+	return float(priced[np.arange(stop - start), choices].sum()), load
+
+def choose_block(block):
+	"""
+	Returns:
+		choices : int array (stop - start,), cheapest entry of each freshman of the block at the prices given
+		regrets : float array (stop - start,), how much more their second cheapest entry costs (np.inf if there is none)
+	"""
+	start, stop, prices = block
+	priced = priced_costs(start, stop, prices)
+	if priced.shape[1] == 1:
+		return np.zeros(stop - start, dtype=int), np.inf * np.ones(stop - start)
+	cheapest = np.argpartition(priced, 1, axis=1)[:, :2]
+	values = priced[np.arange(stop - start)[:, np.newaxis], cheapest]
+	first = values.argmin(axis=1)
+	choices = cheapest[np.arange(stop - start), first]
+	regrets = values.max(axis=1) - values.min(axis=1)
+	return choices, np.where(np.isfinite(regrets), regrets, np.inf)
+
+def gender_prices(overPrice, underPrice, genderPrice):
+	"""
+	Returns:
+		float array (3, nEntries), price of each entry for boys, girls and others
+	"""
+	prices = np.tile(overPrice - underPrice, (3, 1))
+	prices[:2] += genderPrice.T
+	return prices
+
+def place_greedily(freshmen, costs, genders, assignment, load, bounds):
+	"""
+	Place freshmen one at a time, in the order given, in their cheapest entry with a room and a place for their gender.
+	Updates assignment and load in place.
+
+	Returns:
+		boolean, false if some freshman found no place
+	"""
+	maxPerEntry, minPerEntry, maxPerGender = bounds
+	for freshman in freshmen:
+		gender = genders[freshman]
+		values = np.where((load.sum(axis=1) < maxPerEntry) & (load[:, gender] < maxPerGender[:, gender]), costs[freshman], np.inf)
+		entry = values.argmin()
+		if not np.isfinite(values[entry]):
+			return False
+		assignment[freshman] = entry
+		load[entry, gender] += 1
+	return True
+
+def meet_minimums(costs, genders, assignment, load, bounds):
+	"""
+	Fill the entries below freshmenPerEntryMin one freshman at a time, each time with the cheapest move of a freshman
+	out of an entry above its minimum. Updates assignment and load in place.
+
+	Returns:
+		boolean, false if some minimum cannot be met this way
+	"""
+	maxPerEntry, minPerEntry, maxPerGender = bounds
+	nFreshmen = len(assignment)
+	count = load.sum(axis=1)
+	for entry in np.flatnonzero(count < minPerEntry):
+		while count[entry] < minPerEntry[entry]:
+			movable = (count[assignment] > minPerEntry[assignment]) & (load[entry, genders] < maxPerGender[entry, genders])
+			delta = np.where(movable, costs[:, entry] - costs[np.arange(nFreshmen), assignment], np.inf)
+			freshman = delta.argmin()
+			if not np.isfinite(delta[freshman]):
+				return False
+			load[assignment[freshman], genders[freshman]] -= 1
+			count[assignment[freshman]] -= 1
+			assignment[freshman] = entry
+			load[entry, genders[freshman]] += 1
+			count[entry] += 1
+	return True
+
+def repair(choices, regrets, costs, genders, bounds):
+	"""
+	Turn the choices of the freshmen at some prices into an assignment. Freshmen keep their choice while their gender
+	limit and the rooms of the entry allow, those who would lose most by moving (largest regret) first. The others are
+	placed greedily by decreasing regret, and the entries left below their minimum are then filled by the cheapest
+	moves. Each freshman moved costs one pass over the entries (or over the freshmen, to meet a minimum), where
+	min_cost_assignment (what relaxation_solver.repair uses) would not scale to campus-sized instances: it is only
+	the fallback when the greedy steps fail, up to MAX_FALLBACK_SIZE freshmen x entries. The fallback is printed and
+	recorded as a "repairFallback" event.
+
+	Returns:
+		assignment : int array (nFreshmen,), or None if the problem is infeasible or the instance too large for the fallback
+		nRepaired  : int, number of freshmen who could not keep their choice
+	"""
+	maxPerEntry, minPerEntry, maxPerGender = bounds
+	nEntries = costs.shape[1]
+	kept = np.isfinite(costs[np.arange(len(choices)), choices])
+	# Gender limits, then rooms, each filled by decreasing regret
+	order = np.flatnonzero(kept)
+	order = order[np.lexsort((-regrets[order], genders[order], choices[order]))]
+	kept[order] = group_positions(choices[order] * 3 + genders[order]) < maxPerGender[choices[order], genders[order]]
+	order = np.flatnonzero(kept)
+	order = order[np.lexsort((-regrets[order], choices[order]))]
+	kept[order] = group_positions(choices[order]) < maxPerEntry[choices[order]]
+	loose = np.flatnonzero(~kept)
+	loose = loose[np.argsort(-regrets[loose], kind='mergesort')]
+	assignment = choices.copy()
+	load = np.zeros((nEntries, 3), dtype=int)
+	np.add.at(load, (assignment[kept], genders[kept]), 1)
+	if place_greedily(loose, costs, genders, assignment, load, bounds) and meet_minimums(costs, genders, assignment, load, bounds):
+		return assignment, len(loose)
+	fallback = costs.size <= MAX_FALLBACK_SIZE
+	print "!!!! WARNING : greedy repair failed for %d x %d, %s !!!!" % (costs.shape[0], nEntries, "falling back to min_cost_assignment" if fallback else "too large for min_cost_assignment")
+	instrumentation.event("repairFallback", repaired=len(loose), fallback=fallback)
+	if not fallback:
+		return None, len(loose)
+	return flow_solver.min_cost_assignment(costs, genders, maxPerEntry, minPerEntry, maxPerGender), len(loose)
+
+def subgradient(price, mapBlocks, costs, genders, bounds):
+	"""
+	Maximize the Lagrangian dual by projected subgradient steps. With multipliers u (rooms), v (minimums) and w (gender
+	limits), all nonnegative, freshman i of gender g pays c_ij + u_j - v_j + w_jg to enter j, and the dual function is
+		L(u, v, w) = sum over freshmen of their cheapest priced entry - u.maxPerEntry + v.minPerEntry - w.maxPerGender
+	which is a lower bound on the cost of any assignment. Steps are Polyak steps towards the best assignment found.
+
+	Args:
+		price     : function of a (3, nEntries) price array, returning the total priced cost and load of the choices
+		mapBlocks : function of a (3, nEntries) price array, returning the choices and regrets of all freshmen
+		costs     : float array (nFreshmen, nEntries), np.inf where an assignment is forbidden
+		genders   : int array (nFreshmen,), 0, 1 or 2
+		bounds    : tuple (maxPerEntry, minPerEntry, maxPerGender), as returned by flow_solver.entry_bounds
+
+	Returns:
+		bound      : float, best lower bound found
+		prices     : float array (3, nEntries), prices giving that bound
+		best       : int array (nFreshmen,), best assignment found (None if the first repair failed, see repair)
+		iterations : int, number of subgradient steps
+	"""
+	maxPerEntry, minPerEntry, maxPerGender = bounds
+	nEntries = costs.shape[1]
+	genderCaps = np.where(np.isfinite(maxPerGender[:, :2]), maxPerGender[:, :2], 0.)
+	capped = np.isfinite(maxPerGender[:, :2])
+	overPrice, underPrice, genderPrice = np.zeros(nEntries), np.zeros(nEntries), np.zeros((nEntries, 2))
+	bound, bestPrices = -np.inf, gender_prices(overPrice, underPrice, genderPrice)
+	best, bestCost = None, np.inf
+	scale, stalled = STEP_SCALE, 0
+	for iteration in xrange(MAX_ITERATIONS):
+		prices = gender_prices(overPrice, underPrice, genderPrice)
+		value, load = price(prices)
+		count = load.sum(axis=1)
+		dual = value - (overPrice * maxPerEntry).sum() + (underPrice * minPerEntry).sum() - (genderPrice * genderCaps).sum()
+		improved = dual - bound > flow_solver.EPSILON * max(abs(dual), 1.)
+		if dual > bound:
+			bound, bestPrices = dual, prices
+		if improved:
+			stalled = 0
+		else:
+			stalled += 1
+			if stalled >= STALL_ITERATIONS:
+				scale, stalled = scale / 2, 0
+		# Subgradients, without the components the projection on nonnegative multipliers would cancel
+		overStep = count - maxPerEntry
+		underStep = minPerEntry - count
+		genderStep = np.where(capped, load[:, :2] - genderCaps, 0.)
+		overStep = np.where((overPrice > 0) | (overStep > 0), overStep, 0.)
+		underStep = np.where((underPrice > 0) | (underStep > 0), underStep, 0.)
+		genderStep = np.where((genderPrice > 0) | (genderStep > 0), genderStep, 0.)
+		norm = (overStep * overStep).sum() + (underStep * underStep).sum() + (genderStep * genderStep).sum()
+		if norm == 0:
+			# The choices meet every capacity and the multipliers are complementary: they are optimal
+			choices, regrets = mapBlocks(prices)
+			best, bestCost = choices, costs[np.arange(len(choices)), choices].sum()
+			bound = dual
+			break
+		if iteration % REPAIR_INTERVAL == 0:
+			choices, regrets = mapBlocks(bestPrices)
+			assignment, nRepaired = repair(choices, regrets, costs, genders, bounds)
+			if assignment is None and best is None:
+				return bound, bestPrices, None, iteration + 1
+			cost = costs[np.arange(len(assignment)), assignment].sum() if assignment is not None else np.inf
+			if cost < bestCost:
+				best, bestCost = assignment, cost
+		if instrumentation.ENABLED:
+			instrumentation.event("subgradient", bound=float(bound), dual=float(dual), upperBound=float(bestCost), violation=float(np.sqrt(norm)))
+		if bestCost - bound <= GAP_TOLERANCE * abs(bestCost) or scale < MIN_STEP_SCALE:
+			break
+		step = scale * (bestCost - dual) / norm
+		overPrice = np.maximum(overPrice + step * overStep, 0.)
+		underPrice = np.maximum(underPrice + step * underStep, 0.)
+		genderPrice = np.maximum(genderPrice + step * genderStep, 0.)
+	return bound, bestPrices, best, iteration + 1
+
+def solve_lagrangian(freshmenCosts, entryCosts, genders, bounds, freshmenWeight, costFunction, numWorkers=NUM_WORKERS):
+	"""
+	Approximate one LP.jl variant (without max ranking constraint) by Lagrangian decomposition.
+
+	Args:
+		freshmenCosts  : int array (nFreshmen, nEntries), rankings given by freshmen
+		entryCosts     : int array (nFreshmen, nEntries), ratings given by entries
+		genders        : int array (nFreshmen,), 0, 1 or 2
+		bounds         : tuple (maxPerEntry, minPerEntry, maxPerGender), as returned by flow_solver.entry_bounds
+		freshmenWeight : float between 0 and 1, relative importance of freshman and entry preferences
+		costFunction   : string, one of COST_FUNCTIONS
+		numWorkers     : int, number of worker processes (None: one per core, 1: no worker processes)
+
+	Returns:
+		assignment : int array (nFreshmen,) with the entry of each freshman, or None if the problem is infeasible
+		bound      : float, Lagrangian lower bound on the cost of any assignment
+		gap        : float, (cost of assignment - bound) / cost of assignment
+	"""
+	global workerCosts, workerGenders
+	if costFunction not in COST_FUNCTIONS:
+		raise Exception('Cost function {0} is not a sum over freshmen, use one of {1}'.format(costFunction, COST_FUNCTIONS))
+	# Without max ranking constraint every freshman may go anywhere, so the capacity check is exact: an infeasible
+	# instance would otherwise only show as a dual growing without bound
+	if len(feasibility.capacity_problems(bounds, genders)) > 0:
+		return None, np.inf, np.inf
+	costs = flow_solver.cost_matrix(freshmenCosts, entryCosts, freshmenWeight, costFunction)
+	workerCosts, workerGenders = costs, np.asarray(genders)
+	nFreshmen = len(genders)
+	if numWorkers is None:
+		numWorkers = multiprocessing.cpu_count()
+	edges = np.linspace(0, nFreshmen, max(min(numWorkers, nFreshmen), 1) + 1).astype(int)
+	blocks = zip(edges[:-1], edges[1:])
+	pool = multiprocessing.Pool(numWorkers) if numWorkers > 1 else None
+	mapper = pool.map if pool is not None else map
+
+	def price(prices):
+		results = mapper(price_block, [(start, stop, prices) for start, stop in blocks])
+		return sum([value for value, load in results]), sum([load for value, load in results])
+
+	def mapBlocks(prices):
+		results = mapper(choose_block, [(start, stop, prices) for start, stop in blocks])
+		return np.concatenate([choices for choices, regrets in results]), np.concatenate([regrets for choices, regrets in results])
+
+	try:
+		with instrumentation.phase("lagrangian", costFunction=costFunction, freshmenWeight=freshmenWeight, workers=numWorkers) as lagrangianPhase:
+			bound, prices, best, iterations = subgradient(price, mapBlocks, costs, genders, bounds)
+			lagrangianPhase.set(bound=bound, iterations=iterations)
+		if best is None:
+			# The capacities are feasible (checked above): only the size cap of the repair fallback leaves no assignment
+			raise Exception('The repair found no assignment for {0} freshmen x {1} entries, above MAX_FALLBACK_SIZE ({2}) for min_cost_assignment'.format(nFreshmen, costs.shape[1], MAX_FALLBACK_SIZE))
+		with instrumentation.phase("repair") as repairPhase:
+			choices, regrets = mapBlocks(prices)
+			assignment, nRepaired = repair(choices, regrets, costs, genders, bounds)
+			repairPhase.set(repaired=nRepaired)
+	finally:
+		if pool is not None:
+			pool.close()
+			pool.join()
+	if assignment is None or costs[np.arange(nFreshmen), best].sum() < costs[np.arange(nFreshmen), assignment].sum():
+		assignment = best
+	cost = costs[np.arange(nFreshmen), assignment].sum()
+	gap = (cost - bound) / abs(cost) if cost != 0 else 0.
+	return assignment, bound, max(gap, 0.)
+
+if __name__ == "__main__":
+	import master_algorithm
+	import vectorized_metrics
+	freshmenWeight = float(sys.argv[1]) if len(sys.argv) > 1 else 0.7
+	costFunction = sys.argv[2] if len(sys.argv) > 2 else "simple"
+	numWorkers = int(sys.argv[3]) if len(sys.argv) > 3 else NUM_WORKERS
+	outputFileName = sys.argv[4] if len(sys.argv) > 4 else "lagrangian_output.csv"
+	names, entries, freshmenCosts, entryCosts, genders, rooms = flow_solver.read_LP_inputs(master_algorithm.FRESHMEN_PREFERENCES, master_algorithm.ENTRY_PREFERENCES, master_algorithm.ROOM_NUMBERS)
+	start = time.time()
+	assignment, bound, gap = solve_lagrangian(freshmenCosts, entryCosts, genders, flow_solver.entry_bounds(rooms, genders), freshmenWeight, costFunction, numWorkers)
+	if assignment is None:
+		print "infeasible (%.3f s)" % (time.time() - start)
+	else:
+		print "solved in %.3f s, Lagrangian bound %.4f, gap %.4f%%" % (time.time() - start, bound, 100 * gap)
+		print "score", vectorized_metrics.getScores(freshmenCosts, entryCosts, assignment)["score"][0]
+		flow_solver.write_assignment(names, entries, assignment, outputFileName)
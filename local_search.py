@@ -0,0 +1,139 @@
+# local_search.py
+# Simulated annealing over single freshman moves and swaps, maximizing the composite score of master_algorithm.calculate_score
+# directly (the LP objectives only approximate it). Moves are scored with incremental_score.IncrementalScorer.
+
+import incremental_score
+import math
+import time
+import numpy as np
+
+CHECK_TIME_EVERY = 100 # iterations between two looks at the clock
+RECOMPUTE_EVERY = 100000 # iterations between two full recomputations of the running sums
+INITIAL_RANKING_LOSS = 3 # ranking places lost by one freshman in a move accepted with probability 1/e at the start
+
+class Capacities:
+	def __init__(self, genders, results, nEntries, maxPerEntry, minPerEntry, maxPerGender):
+		"""
+		Occupancy of each entry, checked against the bounds of flow_solver.entry_bounds.
+
+		Args:
+			genders      : int array (nFreshmen,), 0 for boys, 1 for girls, 2 for anything else
+			results      : int array (nFreshmen,), entry of each freshman
+			nEntries     : int, number of entries
+			maxPerEntry  : int array (nEntries,)
+			minPerEntry  : int array (nEntries,)
+			maxPerGender : float array (nEntries, 3), caps for boys, girls and others
+		"""
+		self.genders = genders
+		self.maxPerEntry = maxPerEntry
+		self.minPerEntry = minPerEntry
+		self.maxPerGender = maxPerGender
+		self.counts = np.bincount(results, minlength=nEntries)
+		self.genderCounts = np.zeros((nEntries, 3), dtype=int)
+		np.add.at(self.genderCounts, (results, genders), 1)
+
+	def can_move(self, freshman, old, new):
+		gender = self.genders[freshman]
+		return self.counts[new] < self.maxPerEntry[new] and self.counts[old] > self.minPerEntry[old] and self.genderCounts[new, gender] < self.maxPerGender[new, gender]
+
+	def can_swap(self, freshman, other, entry, otherEntry):
+		gender, otherGender = self.genders[freshman], self.genders[other]
+		if gender == otherGender:
+			return True
+		return self.genderCounts[otherEntry, gender] < self.maxPerGender[otherEntry, gender] and self.genderCounts[entry, otherGender] < self.maxPerGender[entry, otherGender]
+
+	def move(self, freshman, old, new):
+		gender = self.genders[freshman]
+		self.counts[old] -= 1
+		self.counts[new] += 1
+		self.genderCounts[old, gender] -= 1
+		self.genderCounts[new, gender] += 1
+
+def random_neighbor(scorer, capacities, rng):
+	"""
+	Draw a random move (half of the time) or swap that keeps the assignment within capacities.
+
+	Returns:
+		list of (freshman, new entry), empty if the draw was not allowed
+	"""
+	freshman = rng.randint(scorer.nFreshmen)
+	entry = scorer.results[freshman]
+	if rng.rand() < 0.5:
+		new = rng.randint(scorer.nEntries)
+		if new == entry or not capacities.can_move(freshman, entry, new):
+			return []
+		return [(freshman, new)]
+	other = rng.randint(scorer.nFreshmen)
+	otherEntry = scorer.results[other]
+	if otherEntry == entry or not capacities.can_swap(freshman, other, entry, otherEntry):
+		return []
+	return [(freshman, otherEntry), (other, entry)]
+
+def initial_temperature(nFreshmen, nEntries):
+	"""
+	Score loss of moving one freshman down INITIAL_RANKING_LOSS places in their ranking: at the start of the annealing
+	such a move is accepted with probability 1/e. (The median loss of random moves is no good: it is dominated by the
+	steps of the max ranking and variance terms, and makes the search wander far away from good starts.)
+	"""
+	return 0.5 * INITIAL_RANKING_LOSS / max(nEntries - 1., 1.) * 100 / nFreshmen
+
+def anneal(freshmenPrefs, entryPrefs, genders, results, bounds, timeLimit, seed=None, initialTemperature=None, finalTemperature=None):
+	"""
+	Improve an assignment by simulated annealing until timeLimit seconds have passed. The temperature decreases
+	geometrically with elapsed time, from initialTemperature to finalTemperature. Moves never take an entry above its
+	capacity or gender cap or below its minimum, so a feasible start gives a feasible result.
+
+	Args:
+		freshmenPrefs      : array (nFreshmen, nEntries), rankings given by freshmen
+		entryPrefs         : array (nFreshmen, nEntries), ratings given by entries
+		genders            : int array (nFreshmen,), 0 for boys, 1 for girls, 2 for anything else
+		results            : int array (nFreshmen,), starting assignment (not modified)
+		bounds             : tuple (maxPerEntry, minPerEntry, maxPerGender), as returned by flow_solver.entry_bounds
+		timeLimit          : float, wall-clock budget in seconds
+		seed               : int, seed of the random moves (None: not reproducible)
+		initialTemperature : float, None for initial_temperature(nFreshmen, nEntries)
+		finalTemperature   : float, None for initialTemperature / 1000
+
+	Returns:
+		best  : int array (nFreshmen,), best assignment found
+		trace : list of (seconds since start, best score so far), one element per improvement of the best score
+	"""
+	start = time.time()
+	rng = np.random.RandomState(seed)
+	genders = np.asarray(genders)
+	scorer = incremental_score.IncrementalScorer(freshmenPrefs, entryPrefs, results)
+	maxPerEntry, minPerEntry, maxPerGender = bounds
+	capacities = Capacities(genders, scorer.results, scorer.nEntries, maxPerEntry, minPerEntry, maxPerGender)
+	if initialTemperature is None:
+		initialTemperature = initial_temperature(scorer.nFreshmen, scorer.nEntries)
+	if finalTemperature is None:
+		finalTemperature = initialTemperature / 1000.
+	cooling = math.log(finalTemperature / initialTemperature)
+	score = scorer.score()
+	bestScore, best = score, scorer.results.copy()
+	trace = [(time.time() - start, bestScore)]
+	temperature = initialTemperature
+	iteration = 0
+	while True:
+		iteration += 1
+		if iteration % CHECK_TIME_EVERY == 0:
+			elapsed = time.time() - start
+			if elapsed >= timeLimit:
+				break
+			temperature = initialTemperature * math.exp(cooling * elapsed / timeLimit)
+		if iteration % RECOMPUTE_EVERY == 0:
+			scorer.recompute()
+			score = scorer.score()
+		moves = random_neighbor(scorer, capacities, rng)
+		if len(moves) == 0:
+			continue
+		newScore = scorer.moves_score(moves)
+		if newScore >= score or rng.rand() < math.exp((newScore - score) / temperature):
+			for freshman, entry in moves:
+				capacities.move(freshman, scorer.results[freshman], entry)
+			scorer.apply(moves)
+			score = newScore
+			if score > bestScore:
+				bestScore, best = score, scorer.results.copy()
+				trace.append((time.time() - start, bestScore))
+	return best, trace
@@ -6,11 +6,191 @@
 import csv
 import copy
 import collections
-from random import shuffle
+import random
+import numpy as np
+import marriage_engine
+import instrumentation
+import preference_loader
 GENDERMAP = {'0':'M', '1':'F'}
 OPPOSITE_GENDER = {'M':'F','F':'M'}
+# maxGenderProportion the marriage variants are run with (master_algorithm, what-if server, benchmarks)
+MAX_GENDER_PROPORTION = 0.55
 
-def run_marriage_algorithm(entryVacancyFileName, gendersProvided, maxGenderProportion, froshPreferenceFileName, entryPreferenceFileName, allowGreasing, outputFileName):
+class Entry:
+	def __init__(self, name, rooms, roomsLeft):
+		"""
+		Args:
+			name      : string, name of the entry
+			rooms     : dictionary with the number of M, F and U rooms of the entry
+			roomsLeft : dictionary shared by all entries with the total number of M and F rooms left in the pool, kept up to date by take
+		"""
+		self.name = name.upper()
+		self.rooms = rooms
+		self.roomsLeft = roomsLeft
+		self.ratings = {}
+		self.taken = set()
+
+	def __str__(self):
+		return '<{0} Entry>'.format(self.name)
+
+	def __repr__(self):
+		return self.__str__()
+
+	def add_rating(self, freshman, rating):
+		self.ratings[freshman.name] = rating
+
+	def can_take(self, freshman):
+		return self.rooms[freshman.gender] > 0 or (self.roomsLeft[freshman.gender] == 0 and self.roomsLeft[OPPOSITE_GENDER[freshman.gender]] == 0 and self.rooms['U'] > 0)
+		# return self.rooms[freshman.gender] + self.rooms['U'] > 0
+
+	def take(self, freshman):
+		self.taken.add(freshman)
+		if self.rooms[freshman.gender] > 0:
+			self.rooms[freshman.gender] -= 1
+			self.roomsLeft[freshman.gender] -= 1
+		else:
+			self.rooms['U'] -= 1
+
+	def add_to_round(self, freshman):
+		self.current_round.add(freshman)
+
+	def process_round(self):
+		# Rating ties go to the lowest lottery number
+		frosh = sorted(self.current_round, key=lambda f: (-self.ratings[f.name], f.lottery))
+		taken, dropped = set(), set()
+		for freshman in frosh:
+			if self.can_take(freshman):
+				self.take(freshman)
+				taken.add(freshman)
+			else:
+				dropped.add(freshman)
+
+		return taken, dropped
+
+class Freshman:
+	def __init__(self, name, gender, rankings):
+		self.name = name
+		self.gender = gender
+		self.rankings = rankings
+		self.savedRankings = copy.deepcopy(self.rankings)
+		self.lottery = 0
+
+	def __str__(self):
+		return '<Freshman: {0}>'.format(self.name)
+
+	def __repr__(self):
+		return self.__str__()
+
+	def favorite_entry(self):
+		if min(self.rankings.values()) == float('inf'):
+			self.rankings = copy.deepcopy(self.savedRankings)
+		Min = float('inf')
+		Entry = None 
+		for key in self.rankings:
+			if self.rankings[key] < Min: 
+				Min = self.rankings[key]
+				Entry = key 
+		return Entry
+
+	def rejected_by(self, entry):
+		self.rankings[entry.name] = float('inf')
+
+def count_gendered_rooms(Entries, roomsLeft):
+	"""
+	Recount the M and F rooms left over all entries, after their rooms have been changed directly.
+
+	Args:
+		Entries   : dictionary of Entry instances
+		roomsLeft : dictionary shared by the entries, updated in place
+	Returns:
+		None
+	"""
+	for gender in OPPOSITE_GENDER:
+		roomsLeft[gender] = sum([entry.rooms[gender] for entry in Entries.values()])
+
+def draw_lottery(Frosh, rng):
+	"""
+	Give each freshman a distinct lottery number, used to break ties between freshmen (lowest first).
+
+	Args:
+		Frosh : dictionary of Freshman instances, updated in place
+		rng   : random.Random instance
+	Returns:
+		None
+	"""
+	names = sorted(Frosh.keys())
+	numbers = range(len(names))
+	rng.shuffle(numbers)
+	for name, number in zip(names, numbers):
+		Frosh[name].lottery = number
+
+def marry_arrays(froshRankings, entryRatings, genders, rooms, lottery, allowGreasing):
+	"""
+	Grease (if allowed) and play the marriage rounds on preference matrices, with marriage_engine.
+
+	Args:
+		froshRankings : int array (nFreshmen, nEntries), ranking given by freshman i to entry j (1 is favorite)
+		entryRatings  : int array (nFreshmen, nEntries), rating given by entry j to freshman i
+		genders       : int array (nFreshmen,), 0 for M and 1 for F
+		rooms         : int array (nEntries, 3), M, F and U rooms of each entry (updated in place)
+		lottery       : int array (nFreshmen,), lottery number of each freshman
+		allowGreasing : boolean, true if greasing is allowed
+	Returns:
+		int array (nFreshmen,), index of the entry of each freshman
+	"""
+	assignment = -np.ones(len(genders), dtype=int)
+	unplaced = np.arange(len(genders))
+	if allowGreasing:
+		with instrumentation.phase("greasing") as greasingPhase:
+			targets = marriage_engine.greasing_targets(froshRankings, entryRatings)
+			greased = marriage_engine.grease(targets, genders, rooms, lottery)
+			greasingPhase.set(candidates=int((targets >= 0).sum()), placed=int(greased.sum()))
+		assignment[greased] = targets[greased]
+		unplaced = np.flatnonzero(~greased)
+	with instrumentation.phase("rounds", vectorized=True, freshmen=len(unplaced)):
+		assignment[unplaced] = marriage_engine.run_rounds(froshRankings[unplaced], entryRatings[unplaced], genders[unplaced], rooms, lottery[unplaced])
+	return assignment
+
+def run_marriage_arrays(freshmenCosts, entryCosts, genders, vacancies, names, maxGenderProportion, allowGreasing, seed=None):
+	"""
+	Run the marriage algorithm on preferences already parsed, without genders provided: same rooms, lottery and
+	rounds as run_marriage_algorithm (vectorized), so the same seed gives the same pairing.
+
+	Args:
+		freshmenCosts       : int array (nFreshmen, nEntries), rankings given by freshmen
+		entryCosts          : int array (nFreshmen, nEntries), ratings given by entries
+		genders             : int array (nFreshmen,), 0 for M and 1 for F
+		vacancies           : int array (nEntries, 3), rows of the vacancy file (only the last column is used, as in add_entries)
+		names               : list of freshman names (the lottery is drawn over the sorted names)
+		maxGenderProportion : float, maximal proportion of freshmen of the same gender
+		allowGreasing       : boolean, true if greasing is allowed
+		seed                : int, seed of the lottery and of the entries losing leftover rooms (None: not reproducible)
+	Returns:
+		int array (nFreshmen,), index of the entry of each freshman
+	"""
+	genders = np.asarray(genders)
+	if (genders > 1).any():
+		raise Exception('Unusable genders: the marriage algorithm only takes 0 and 1')
+	nFreshmen, nEntries = freshmenCosts.shape
+	rng = random.Random(seed)
+	numbers = range(nFreshmen)
+	rng.shuffle(numbers)
+	lottery = np.empty(nFreshmen, dtype=int)
+	lottery[sorted(xrange(nFreshmen), key=lambda i: names[i])] = numbers
+	# distribute_entries: leftover rooms are taken off every entry evenly, then off entries drawn at random
+	totals = [int(u) for u in vacancies[:, 2]]
+	leftover = sum(totals) - nFreshmen
+	queue = range(nEntries)
+	rng.shuffle(queue)
+	for j in xrange(nEntries):
+		totals[j] -= max(leftover / nEntries, 0)
+	for j in queue[:leftover % nEntries]:
+		totals[j] -= 1
+	gendered = [int(round((1 - 4.0/3 * maxGenderProportion) * total)) for total in totals]
+	rooms = np.array([[m, m, total - 2 * m] for (m, total) in zip(gendered, totals)])
+	return marry_arrays(np.asarray(freshmenCosts), np.asarray(entryCosts), genders, rooms, lottery, allowGreasing)
+
+def run_marriage_algorithm(entryVacancyFileName, gendersProvided, maxGenderProportion, froshPreferenceFileName, entryPreferenceFileName, allowGreasing, outputFileName, vectorized=True, seed=None, cacheDirectory=preference_loader.PREFERENCE_CACHE_DIRECTORY):
 	"""
 	Run marriage algorithm on provided situation.
 
@@ -21,144 +201,49 @@ def run_marriage_algorithm(entryVacancyFileName, gendersProvided, maxGenderPropo
 		froshPreferenceFileName : string, name of file with freshmen preferences and genders
 		entryPreferenceFileName : string, name of file with entry preferences
 		allowGreasing           : boolean, true if greasing is allowed
-		outputFileName          : string, name of outputfile
+		outputFileName          : string, name of outputfile (None to only return the pairing)
+		vectorized              : boolean, true to grease and play the rounds with marriage_engine instead of the Entry/Freshman objects
+		seed                    : int, seed of the lottery breaking ties and of the choice of the entries losing leftover rooms (None: not reproducible)
+		cacheDirectory          : string, directory of the parsed input cache (None: always parse the files, see preference_loader.load_preferences)
 	Returns:
-		None
+		list of (freshman name, entry name) pairs
 	"""
 
-	# Define relevant classes
-	class Entry:
-	    def __init__(self, name, rooms):
-	        self.name = name.upper()
-	        self.rooms = rooms
-	        self.ratings = {}
-	        self.taken = set()
-
-	    def __str__(self):
-	        return '<{0} Entry>'.format(self.name)
-
-	    def __repr__(self):
-	        return self.__str__()
-
-	    def add_rating(self, freshman, rating):
-	        self.ratings[freshman.name] = rating
-
-	    def can_take(self, freshman):
-	    	return self.rooms[freshman.gender] > 0 or (sum([entry.rooms[freshman.gender] for entry in Entries.values()]) == 0 and sum([entry.rooms[OPPOSITE_GENDER[freshman.gender]] for entry in Entries.values()]) == 0 and self.rooms['U'] > 0)
-	        # return self.rooms[freshman.gender] + self.rooms['U'] > 0
-
-	    def take(self, freshman):
-	        self.taken.add(freshman)
-	        if self.rooms[freshman.gender] > 0:
-	            self.rooms[freshman.gender] -= 1
-	        else:
-	            self.rooms['U'] -= 1
-
-	    def add_to_round(self, freshman):
-	        self.current_round.add(freshman)
-
-	    def process_round(self):
-	        frosh = sorted(self.current_round, key=lambda f: (-self.ratings[f.name], len(Entries)))
-	        taken, dropped = set(), set()
-	        for freshman in frosh:
-	            if self.can_take(freshman):
-	                self.take(freshman)
-	                taken.add(freshman)
-	            else:
-	                dropped.add(freshman)
-
-	        return taken, dropped
-
-	class Freshman:
-		def __init__(self, name, gender, rankings):
-			self.name = name
-			self.gender = gender
-			self.rankings = rankings
-			self.savedRankings = copy.deepcopy(self.rankings)
-
-		def __str__(self):
-			return '<Freshman: {0}>'.format(self.name)
-
-		def __repr__(self):
-			return self.__str__()
-
-		def favorite_entry(self):
-			if min(self.rankings.values()) == float('inf'):
-				self.rankings = copy.deepcopy(self.savedRankings)
-			Min = 10000
-			Entry = None 
-			for key in self.rankings:
-				if self.rankings[key] < Min: 
-					Min = self.rankings[key]
-					Entry = key 
-			return Entry
-
-		def rejected_by(self, entry):
-			self.rankings[entry.name] = float('inf')
-
-	# Import functions
-	def add_entries(entry_csv, gendersProvided, maxGenderProportion):
+	# Import functions, from the arrays of preference_loader.load_preferences (parsed, validated and cached once)
+	def add_entries(entries, vacancies, gendersProvided, maxGenderProportion):
 		"""
 		For each entry, create an instance of Entry and put it in Entries
 		"""
-		if gendersProvided:
-		    with open(entry_csv) as f:
-		        for line in csv.reader(f):
-		            name = line[0].strip()
-		            m, f, u = map(int, line[1:])
-		            rooms = {
-		                'M': m,
-		                'F': f,
-		                'U': u,
-		            }
-		            entry = Entry(name, rooms)
-		            Entries[name] = entry
-		else:
-			with open(entry_csv) as f:
-				for line in csv.reader(f):
-					name = line[0].strip()
-					m, f, u = map(int, line[1:])
-					m = int(round((1 - 4.0/3 * maxGenderProportion) * u))
-					f = int(round((1 - 4.0/3 * maxGenderProportion) * u))
-					u = u - m - f
-					rooms = {
-						'M': m,
-						'F': f,
-						'U': u,
-					}
-					entry = Entry(name, rooms)
-					Entries[name] = entry
-
-	def frosh_prefs(frosh_prefs):
+		for name, (m, f, u) in zip(entries, vacancies.tolist()):
+			if not gendersProvided:
+				m = int(round((1 - 4.0/3 * maxGenderProportion) * u))
+				f = int(round((1 - 4.0/3 * maxGenderProportion) * u))
+				u = u - m - f
+			rooms = {
+				'M': m,
+				'F': f,
+				'U': u,
+			}
+			entry = Entry(name, rooms, roomsLeft)
+			Entries[entry.name] = entry
+
+	def frosh_prefs(names, freshmenCosts, genders):
 		"""
 		For each freshman, create an instance of Freshman and put it in Frosh
 		"""
-		with open(frosh_prefs) as f:
-			for line in csv.reader(f):
-				name = line[0].strip()
-				gender = GENDERMAP[line[10].strip()]
-				a, b, c, d, e, f, g, h, j = map(int, line[1:10])
-				rankings = dict(zip(['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'J'], [a, b, c, d, e, f, g, h, j]))
-				if set(rankings.values()) != set(range(1, 10)):
-				    raise Exception('Unusable preferences: {0}'.format(name))
-				freshman = Freshman(name, gender, rankings)
-				Frosh[name] = freshman
-
-	def entry_prefs(entry_prefs):
+		for name, rankings, gender in zip(names, freshmenCosts.tolist(), genders.tolist()):
+			if str(gender) not in GENDERMAP:
+				raise Exception('Unusable gender for {0}: the marriage algorithm only takes 0 and 1'.format(name))
+			Frosh[name] = Freshman(name, GENDERMAP[str(gender)], dict(zip(Entries.keys(), rankings)))
+
+	def entry_prefs(names, entryCosts):
 		"""
-		For each frosh, add entry ratings. If improperly formatted, will return infinity
+		For each frosh, add entry ratings (rows of entryCosts follow names, whatever the order of the file)
 		"""
-		with open(entry_prefs) as f:
-			for line in csv.reader(f):
-				name = line[0].strip()
-				freshman = Frosh[name]
-				if len(line[1:]) == 9:
-					a, b, c, d, e, f, g, h, j = map(int, line[1:])
-					for entry_name, rating in zip(['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'J'], [a, b, c, d, e, f, g, h, j]):
-						entry = Entries[entry_name]
-						entry.add_rating(freshman, rating)
-				else: 
-					del Frosh[freshman.name]
+		for name, ratings in zip(names, entryCosts.tolist()):
+			freshman = Frosh[name]
+			for entry, rating in zip(Entries.values(), ratings):
+				entry.add_rating(freshman, rating)
 
 	# If entry gave a 6 and frosh put them in top 3, place automatically
 	def greasing(Entries, Frosh):
@@ -170,14 +255,14 @@ def run_marriage_algorithm(entryVacancyFileName, gendersProvided, maxGenderPropo
 	            if rating == 6 and ranking <= 3:
 	                if freshman in greasing:
 	                    greasy_entry = greasing[freshman]
-	                    if freshman.rankings[greasy_entry.name] < ranking: # frosh likes greasy better
+	                    if freshman.rankings[greasy_entry.name] > ranking: # frosh likes this entry better
 	                        greasing[freshman] = entry
 	                else:
 	                    greasing[freshman] = entry
 	    return greasing
 
 	def grease_placement(greasing, Entries, Frosh):
-	    for freshman, entry in greasing.items():
+	    for freshman, entry in sorted(greasing.items(), key=lambda item: item[0].lottery):
 	        if entry.can_take(freshman):
 	            entry.take(freshman)
 	            del Frosh[freshman.name]
@@ -194,12 +279,16 @@ def run_marriage_algorithm(entryVacancyFileName, gendersProvided, maxGenderPropo
 				else:
 					favorite_entry = freshman.favorite_entry()
 					Entries[favorite_entry].current_round.add(freshman)
+			proposals, rejections = len(Frosh), 0
 			for entry in Entries.values():
 				taken, dropped = entry.process_round()
 				for freshman in taken: 
 					del Frosh[freshman.name]
 				for freshman in dropped: 
 					freshman.rejected_by(entry)
+				rejections += len(dropped)
+			if instrumentation.ENABLED:
+				instrumentation.event("round", proposals=proposals, rejections=rejections)
 	        
 		## CHECK 1: ALL FROSH TAKEN 
 		print "CHECK 1: ", len(Frosh) == 0
@@ -218,6 +307,19 @@ def run_marriage_algorithm(entryVacancyFileName, gendersProvided, maxGenderPropo
 					output.append((frosh.name, entry.name) )
 			return output
 
+	# Same greasing and rounds as greasing, grease_placement and getMarried, played on arrays by marriage_engine.
+	# Both place greased freshmen and break rating ties by lottery, so they give the same pairing.
+	def getMarriedArrays(Entries, Frosh, allowGreasing):
+		entries = Entries.values()
+		frosh = [Frosh[name] for name in sorted(Frosh.keys())]
+		froshRankings = np.array([[freshman.rankings[key] for key in Entries.keys()] for freshman in frosh]).reshape(len(frosh), len(entries))
+		entryRatings = np.array([[entry.ratings[freshman.name] for entry in entries] for freshman in frosh]).reshape(len(frosh), len(entries))
+		genders = np.array([0 if freshman.gender == 'M' else 1 for freshman in frosh])
+		lottery = np.array([freshman.lottery for freshman in frosh])
+		rooms = np.array([[entry.rooms['M'], entry.rooms['F'], entry.rooms['U']] for entry in entries])
+		assignment = marry_arrays(froshRankings, entryRatings, genders, rooms, lottery, allowGreasing)
+		return [(freshman.name, entries[entry].name) for (freshman, entry) in zip(frosh, assignment)]
+
 	def distribute_entries(Entries, Frosh, maxGenderProportion): 
 		to_dist = int(sum([sum(entry.rooms.values()) for entry in Entries.values()]) - len(Frosh))
 		extras = to_dist/len(Entries)
@@ -225,8 +327,8 @@ def run_marriage_algorithm(entryVacancyFileName, gendersProvided, maxGenderPropo
 		for entry in Entries.values(): 
 			for i in range(extras): 
 				entry.rooms['U'] -= 1
-		queue = ['A','B','C','D','E','F','G','H','J']
-		shuffle(queue)
+		queue = Entries.keys()
+		rng.shuffle(queue)
 		j = 0
 		while mod > 0: 
 			Entries[queue[j]].rooms['U'] -=1
@@ -240,6 +342,7 @@ def run_marriage_algorithm(entryVacancyFileName, gendersProvided, maxGenderPropo
 			entry.rooms['U'] = u
 			entry.rooms['M'] = m
 			entry.rooms['F'] = f
+		count_gendered_rooms(Entries, roomsLeft)
 
 	def write_pairing(pairing, fileName): 
 		froshToEntry = {}
@@ -250,18 +353,34 @@ def run_marriage_algorithm(entryVacancyFileName, gendersProvided, maxGenderPropo
 			for freshman in sorted(froshToEntry.keys()):
 				writer.writerow([freshman, froshToEntry[freshman]])
 
-	Entries = {}
+	Entries = collections.OrderedDict()
 	Frosh = {}
-	add_entries(entryVacancyFileName, gendersProvided, maxGenderProportion)
-	frosh_prefs(froshPreferenceFileName)
-	entry_prefs(entryPreferenceFileName)
-	distribute_entries(Entries, Frosh, maxGenderProportion)
-	if allowGreasing:
-		g = greasing(Entries, Frosh)
-		grease_placement(g, Entries, Frosh)
-	results = getMarried(Entries, Frosh)
-	write_pairing(results, outputFileName)
-	return None
+	roomsLeft = {'M': 0, 'F': 0}
+	rng = random.Random(seed)
+	with instrumentation.phase("parse"):
+		names, entries, freshmenCosts, entryCosts, genders, vacancies = preference_loader.load_preferences(froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName, cacheDirectory)
+		names = names.tolist()
+		add_entries(entries.tolist(), vacancies, gendersProvided, maxGenderProportion)
+		count_gendered_rooms(Entries, roomsLeft)
+		frosh_prefs(names, freshmenCosts, genders)
+		entry_prefs(names, entryCosts)
+	draw_lottery(Frosh, rng)
+	with instrumentation.phase("distribute_entries"):
+		distribute_entries(Entries, Frosh, maxGenderProportion)
+	if vectorized:
+		results = getMarriedArrays(Entries, Frosh, allowGreasing)
+	else:
+		if allowGreasing:
+			with instrumentation.phase("greasing") as greasingPhase:
+				g = greasing(Entries, Frosh)
+				grease_placement(g, Entries, Frosh)
+				greasingPhase.set(candidates=len(g), placed=len(g) - len([freshman for freshman in g if freshman.name in Frosh]))
+		with instrumentation.phase("rounds", vectorized=False, freshmen=len(Frosh)):
+			results = getMarried(Entries, Frosh)
+	if outputFileName is not None:
+		with instrumentation.phase("write"):
+			write_pairing(results, outputFileName)
+	return results
 	
 # if __name__ == "__main__":
 # 	Entries = {}
@@ -0,0 +1,201 @@
+# marriage_engine.py
+# Array-backed version of the rounds played in marriage_algorithm.getMarried
+# All proposals of a round are processed at once on integer NumPy matrices
+
+import numpy as np
+import instrumentation
+
+GENDERED_ROOM_TYPES = 2 # columns 0 (M) and 1 (F) of the rooms table, column 2 is unisex
+GREASING_RATING = 6 # freshmen given this rating by an entry they put in their top GREASING_RANKING are greased
+GREASING_RANKING = 3
+
+def tie_breaks(nFreshmen, lottery):
+	"""
+	Args:
+		nFreshmen : int, number of freshmen
+		lottery   : array (nFreshmen,) of lottery numbers (lowest wins ties), or None to break ties by freshman index
+
+	Returns:
+		int array (nFreshmen,), rank of each freshman in the lottery, from 0 to nFreshmen - 1
+	"""
+	if lottery is None:
+		return np.arange(nFreshmen)
+	return np.argsort(np.argsort(lottery, kind='mergesort'), kind='mergesort')
+
+def entry_priorities(entryRatings, lottery=None):
+	"""
+	Precompute the order in which each entry considers freshmen.
+
+	Args:
+		entryRatings : int array of shape (nFreshmen, nEntries), rating given by entry j to freshman i
+		lottery      : array (nFreshmen,) of lottery numbers breaking rating ties, lowest first (None: freshman index)
+
+	Returns:
+		int array of shape (nFreshmen, nEntries) where element (i,j) is the position of freshman i in the list of entry j (0 is considered first). Higher ratings come first, ties are broken by lottery.
+	"""
+	nFreshmen, nEntries = entryRatings.shape
+	keys = -entryRatings.astype(np.int64) * nFreshmen + tie_breaks(nFreshmen, lottery)[:, np.newaxis]
+	order = np.argsort(keys, axis=0, kind='mergesort')
+	priorities = np.empty((nFreshmen, nEntries), dtype=np.int32)
+	priorities[order, np.arange(nEntries)[np.newaxis, :]] = np.arange(nFreshmen, dtype=np.int32)[:, np.newaxis]
+	return priorities
+
+def group_positions(groups):
+	"""
+	Position of each element inside its run of equal values.
+
+	Args:
+		groups : int array, sorted so that equal values are contiguous
+
+	Returns:
+		int array of the same length, 0 for the first element of each run, 1 for the second, etc.
+	"""
+	if len(groups) == 0:
+		return np.zeros(0, dtype=np.int64)
+	index = np.arange(len(groups))
+	starts = np.ones(len(groups), dtype=bool)
+	starts[1:] = groups[1:] != groups[:-1]
+	return index - np.maximum.accumulate(np.where(starts, index, 0))
+
+def play_round(proposers, targets, priorities, genders, rooms):
+	"""
+	Let every entry process the proposals it received in one round. Entries are processed in index order, as the entries of getMarried are.
+
+	Args:
+		proposers  : int array, indices of proposing freshmen
+		targets    : int array, entry each proposer proposes to
+		priorities : int array (nFreshmen, nEntries), as returned by entry_priorities
+		genders    : int array (nFreshmen,), 0 for M and 1 for F
+		rooms      : int array (nEntries, 3), remaining M, F and U rooms of each entry (updated in place)
+
+	Returns:
+		accepted   : boolean array, true for proposers who were taken by their target
+	"""
+	prio = priorities[proposers, targets]
+	gender = genders[proposers]
+	gendersLeft = rooms[:, :GENDERED_ROOM_TYPES].sum(axis=0)
+	# Gendered rooms: the k best proposers of each gender get the k rooms of that gender
+	order = np.lexsort((prio, gender, targets))
+	groups = targets[order] * GENDERED_ROOM_TYPES + gender[order]
+	accepted = np.zeros(len(proposers), dtype=bool)
+	accepted[order] = group_positions(groups) < rooms[targets[order], gender[order]]
+	takes = np.bincount(targets[accepted] * GENDERED_ROOM_TYPES + gender[accepted], minlength=rooms.shape[0] * GENDERED_ROOM_TYPES)
+	rooms[:, :GENDERED_ROOM_TYPES] -= takes.reshape(rooms.shape[0], GENDERED_ROOM_TYPES)
+	if rooms[:, :GENDERED_ROOM_TYPES].sum() > 0:
+		return accepted
+	# Unisex rooms only open once there are no gendered rooms left anywhere. Find the entry (and
+	# the proposer inside it) whose gendered take closed the last gendered room.
+	order = np.lexsort((prio, targets))
+	sortedTargets = targets[order]
+	cumTakes = np.cumsum(accepted[order][:, np.newaxis] & (gender[order][:, np.newaxis] == np.arange(GENDERED_ROOM_TYPES)), axis=0)
+	if gendersLeft.sum() == 0:
+		openFrom = 0
+	else:
+		openFrom = np.flatnonzero((cumTakes == gendersLeft).all(axis=1))[0] + 1
+	start = openFrom
+	while start < len(order):
+		entry = sortedTargets[start]
+		stop = np.searchsorted(sortedTargets, entry, side='right')
+		candidates = order[start:stop][~accepted[order[start:stop]]][:max(rooms[entry, GENDERED_ROOM_TYPES], 0)]
+		accepted[candidates] = True
+		rooms[entry, GENDERED_ROOM_TYPES] -= len(candidates)
+		start = stop
+	return accepted
+
+def greasing_targets(froshRankings, entryRatings):
+	"""
+	Find the greasy entry of each freshman, as greasing does: among the entries that gave them a 6 and that they put
+	in their top 3, their favorite one.
+
+	Args:
+		froshRankings : int array (nFreshmen, nEntries), ranking given by freshman i to entry j (1 is favorite)
+		entryRatings  : int array (nFreshmen, nEntries), rating given by entry j to freshman i
+
+	Returns:
+		int array (nFreshmen,), greasy entry of each freshman (-1 if none)
+	"""
+	froshRankings = np.asarray(froshRankings)
+	greasy = (np.asarray(entryRatings) == GREASING_RATING) & (froshRankings <= GREASING_RANKING)
+	targets = np.where(greasy, froshRankings, np.iinfo(np.int64).max).argmin(axis=1)
+	targets[~greasy.any(axis=1)] = -1
+	return targets
+
+def grease(targets, genders, rooms, lottery=None):
+	"""
+	Place freshmen in their greasy entry when it can take them, as grease_placement does one freshman at a time:
+	taking them in lottery order, a freshman is placed if the entry has a room of their gender left, or if no gendered
+	room is left anywhere and the entry has a unisex room left.
+
+	Args:
+		targets : int array (nFreshmen,), as returned by greasing_targets
+		genders : int array (nFreshmen,), 0 for M and 1 for F
+		rooms   : int array (nEntries, 3), remaining M, F and U rooms of each entry (updated in place)
+		lottery : array (nFreshmen,) of lottery numbers, lowest placed first (None: freshman index)
+
+	Returns:
+		boolean array (nFreshmen,), true for the freshmen placed in their greasy entry
+	"""
+	candidates = np.flatnonzero(targets >= 0)
+	candidates = candidates[np.argsort(tie_breaks(len(targets), lottery)[candidates], kind='mergesort')]
+	entries = targets[candidates]
+	gender = np.asarray(genders)[candidates]
+	gendersLeft = rooms[:, :GENDERED_ROOM_TYPES].sum()
+	# Gendered rooms: the first k candidates of each entry and gender get its k rooms
+	order = np.lexsort((np.arange(len(candidates)), gender, entries))
+	accepted = np.zeros(len(candidates), dtype=bool)
+	accepted[order] = group_positions(entries[order] * GENDERED_ROOM_TYPES + gender[order]) < rooms[entries[order], gender[order]]
+	takes = np.bincount(entries[accepted] * GENDERED_ROOM_TYPES + gender[accepted], minlength=rooms.shape[0] * GENDERED_ROOM_TYPES)
+	rooms[:, :GENDERED_ROOM_TYPES] -= takes.reshape(rooms.shape[0], GENDERED_ROOM_TYPES)
+	if rooms[:, :GENDERED_ROOM_TYPES].sum() == 0:
+		# Unisex rooms open to the candidates after the one who took the last gendered room
+		openFrom = 0 if gendersLeft == 0 else np.flatnonzero(np.cumsum(accepted) == gendersLeft)[0] + 1
+		waiting = np.flatnonzero(~accepted[openFrom:]) + openFrom
+		order = waiting[np.lexsort((waiting, entries[waiting]))]
+		unisex = order[group_positions(entries[order]) < np.maximum(rooms[entries[order], GENDERED_ROOM_TYPES], 0)]
+		accepted[unisex] = True
+		rooms[:, GENDERED_ROOM_TYPES] -= np.bincount(entries[unisex], minlength=rooms.shape[0])
+	placed = np.zeros(len(targets), dtype=bool)
+	placed[candidates[accepted]] = True
+	return placed
+
+def run_rounds(froshRankings, entryRatings, genders, rooms, lottery=None):
+	"""
+	Run the marriage algorithm rounds on preference matrices. Same rules as getMarried: every
+	unplaced freshman proposes to their favorite entry among those that have not rejected them
+	yet (starting over once all entries have), and each entry takes its best rated proposers
+	while it has rooms for them (rating ties go to the lowest lottery number).
+
+	Args:
+		froshRankings : int array (nFreshmen, nEntries), ranking given by freshman i to entry j (1 is favorite)
+		entryRatings  : int array (nFreshmen, nEntries), rating given by entry j to freshman i
+		genders       : int array (nFreshmen,), 0 for M and 1 for F
+		rooms         : int array (nEntries, 3), M, F and U rooms available in each entry
+		lottery       : array (nFreshmen,) of lottery numbers (None: ties are broken by freshman index)
+
+	Returns:
+		int array (nFreshmen,), index of the entry each freshman is placed in
+	"""
+	froshRankings = np.asarray(froshRankings)
+	genders = np.asarray(genders, dtype=np.int64)
+	rooms = np.array(rooms, dtype=np.int64)
+	nFreshmen, nEntries = froshRankings.shape
+	preferenceLists = np.argsort(froshRankings, axis=1, kind='mergesort')
+	priorities = entry_priorities(np.asarray(entryRatings), lottery)
+	pointers = np.zeros(nFreshmen, dtype=np.int64)
+	assignment = -np.ones(nFreshmen, dtype=np.int64)
+	unplaced = np.arange(nFreshmen)
+	roundsWithoutTakes = 0
+	while len(unplaced) > 0:
+		targets = preferenceLists[unplaced, pointers[unplaced]]
+		accepted = play_round(unplaced, targets, priorities, genders, rooms)
+		assignment[unplaced[accepted]] = targets[accepted]
+		rejected = unplaced[~accepted]
+		if instrumentation.ENABLED:
+			instrumentation.event("round", proposals=len(unplaced), rejections=len(rejected))
+		pointers[rejected] = (pointers[rejected] + 1) % nEntries
+		unplaced = rejected
+		# Rooms only change when someone is taken: after a full cycle of rejections nothing can change anymore
+		roundsWithoutTakes = 0 if accepted.any() else roundsWithoutTakes + 1
+		if roundsWithoutTakes > nEntries:
+			raise Exception('No room left for {0} freshmen'.format(len(unplaced)))
+	return assignment
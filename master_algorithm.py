@@ -2,10 +2,18 @@
 # Runs all algorithm versions, computes score for each one, chooses best and outputs results
 
 import calculate_metrics as metrics
+import vectorized_metrics
 import marriage_algorithm as marriage
+import flow_solver
+import feasibility
+import local_search
+import instrumentation
+import preference_loader
+import functools
+import itertools
+import multiprocessing
 import os
-
-ENTRIES = ["A","B","C","D","E","F","G","H","J"]
+import numpy as np
 
 ######################
 # Input to algorithm #
@@ -16,9 +24,21 @@ FRESHMEN_PREFERENCES = "finalfroshprefsGen.csv"
 ENTRY_PREFERENCES = "entryprefs.csv"
 # 3. name of file with vacancy numbers for each entry
 ROOM_NUMBERS = "entryVacancies.csv"
+# 4. solver for the LP variants: "julia" (LP.jl with Gurobi) or "python" (flow_solver: exact, except quad which is approximate, with its gap to a lower bound printed)
+LP_SOLVER = "julia"
+# 5. number of worker processes running and scoring the algorithm variants (None: one per core, 1: no worker processes)
+NUM_WORKERS = None
+# 6. seconds of local search (simulated annealing on calculate_score) started from the best assignment (0: no local search)
+LOCAL_SEARCH_TIME = 0
+# 7. directory where the phase timings of the run and of each variant are saved as JSON (None: no instrumentation, see instrumentation.py)
+PROFILE_DIRECTORY = None
+# 8. number of independently seeded runs of each marriage variant (seeds differ in tie-break lotteries and leftover rooms), all scored with the other variants
+MARRIAGE_SAMPLES = 1
+# 9. seed of the first marriage run, run k uses MARRIAGE_SEED + k (None: unseeded, not reproducible)
+MARRIAGE_SEED = 0
 ######################
 
-def read_input_and_results(resultFileName, froshPreferenceFileName, entryPreferenceFileName):
+def read_input_and_results(resultFileName, froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName=ROOM_NUMBERS):
 	"""
 	Fetch results and inputs and outputs them in nice matrix form.
 
@@ -26,37 +46,56 @@ def read_input_and_results(resultFileName, froshPreferenceFileName, entryPrefere
 		resultFileName          : string, name of file with freshman assignments to entries
 		froshPreferenceFileName : string, name of file with freshmen preferences and genders
 		entryPreferenceFileName : string, name of file with entry preferences
+		entryVacancyFileName    : string, name of file with vacancy numbers (gives the entry names and their order)
 	Returns:
 		freshmenPrefs           : list of lists (m * n matrix where m is the number of freshmen and n the number of entries) with rankings assigned to each entry by freshmen
 		entryPrefs              : list of lists (m * n matrix where m is the number of freshmen and n the number of entries) with ratings assigned to each freshman by entries
 		results                 : list where element i is the assigned entry of freshman i
 	"""
+	names, entries, freshmenCosts, entryCosts, genders, rooms = read_preferences(froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName)
 	resultsFile = open(resultFileName, "r")
-	entryPrefsFile = open(entryPreferenceFileName, "r")
-	freshmenPrefsFile = open(froshPreferenceFileName, "r")
-	results = []
-	entryPrefs = []
-	freshmenPrefs = []
-	for line in freshmenPrefsFile:
-		row = line.split(",")
-		freshmenPrefs.append([])
-		for i in xrange(1,len(row)-1):
-			freshmenPrefs[-1].append(int(row[i]))
-	for line in resultsFile:
-		row = line.split(",")
-		results.append(ENTRIES.index(row[1][0]))
-	for line in entryPrefsFile:
-		row = line.split(",")
-		entryPrefs.append([])
-		for i in xrange(1, len(row)):
-			entryPrefs[-1].append(int(row[i]))
-	return freshmenPrefs, entryPrefs, results
-
-def run_all_LP_solutions():
-	"""
-	Run LP.jl file from the command line. Return None.
-	"""
-	os.system("julia LP.jl")
+	results = pairing_to_results([line.rstrip().split(",") for line in resultsFile if line.strip()], names, entries)
+	resultsFile.close()
+	return freshmenCosts.tolist(), entryCosts.tolist(), results
+
+def read_preferences(froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName):
+	"""
+	Parse the input files once, for all variants (the tasks of variant_tasks get the parsed arrays, not the file names).
+
+	Returns:
+		names         : list of freshman names, in file order
+		entries       : list of entry names, in file order
+		freshmenCosts : int array (nFreshmen, nEntries), rankings given by freshmen
+		entryCosts    : int array (nFreshmen, nEntries), ratings given by entries
+		genders       : int array (nFreshmen,), 0 for boys, 1 for girls, 2 for anything else
+		rooms         : int array (nEntries, 3), M, F and U vacancies of each entry
+	"""
+	names, entries, freshmenCosts, entryCosts, genders, rooms = flow_solver.read_LP_inputs(froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName)
+	return names, entries, np.array(freshmenCosts), np.array(entryCosts), np.array(genders), np.array(rooms)
+
+def pairing_to_results(pairing, names, entries):
+	"""
+	Turn (freshman name, entry name) pairs, in any order, into a list where element i is the entry index of freshman i.
+	Every freshman must be in the pairing: one left out would otherwise count as placed in some entry.
+	"""
+	nameIndex = dict((name, i) for (i, name) in enumerate(names))
+	entryIndex = dict((entry.upper(), j) for (j, entry) in enumerate(entries))
+	results = [-1 for name in names]
+	for name, entry in pairing:
+		results[nameIndex[name]] = entryIndex[entry.strip().upper()]
+	missing = [name for (name, result) in zip(names, results) if result < 0]
+	if len(missing) > 0:
+		raise Exception('Freshmen missing from the pairing: {0}'.format(", ".join(missing)))
+	return results
+
+def run_all_LP_solutions(algorithmFileName="outputFiles.txt"):
+	"""
+	Run all LP variants listed in algorithmFileName, with LP.jl from the command line or as a warm-started flow_solver sweep depending on LP_SOLVER. Return None.
+	"""
+	if LP_SOLVER == "python":
+		flow_solver.sweep_LP_solutions(algorithmFileName, FRESHMEN_PREFERENCES, ENTRY_PREFERENCES, ROOM_NUMBERS)
+	else:
+		os.system("julia LP.jl")
 	return None
 
 def choose_all_algorithms():
@@ -65,18 +104,40 @@ def choose_all_algorithms():
 	"""
 	f = open("outputFiles.txt", "w")
 	weights = range(60,81)
-	cost_functions = ["simple", "quad", "simplequad", "simplerquad", "minimax"]
 	for weight in weights:
-		for cf in cost_functions:
+		for cf in flow_solver.COST_FUNCTIONS:
 			filename = "output_%d_" % weight
 			filename = filename + cf
 			f.write(filename + "_noMaxRank.csv\n")
 			f.write(filename + "_maxRank.csv\n")
-	f.write("output_marriage_noGreasing.csv\n")
-	f.write("output_marriage_greasing.csv\n")
+	for allowGreasing in [False, True]:
+		for sample in xrange(MARRIAGE_SAMPLES):
+			f.write(marriage_file_name(allowGreasing, sample) + "\n")
 	f.close()
 	return "outputFiles.txt"
 
+def marriage_file_name(allowGreasing, sample):
+	"""
+	Args:
+		allowGreasing : boolean, true if greasing is allowed
+		sample        : int, index of the seeded run (0 keeps the historical file names)
+
+	Returns:
+		output file name of the marriage variant, e.g. output_marriage_greasing.csv or output_marriage_greasing_3.csv
+	"""
+	fileName = "output_marriage_" + ("greasing" if allowGreasing else "noGreasing")
+	if sample > 0:
+		fileName += "_%d" % sample
+	return fileName + ".csv"
+
+def parse_marriage_file_name(fileName):
+	"""
+	Returns:
+		(allowGreasing, sample) of a file name built by marriage_file_name
+	"""
+	parameters = fileName[:-len(".csv")].split("_")
+	return parameters[2] == "greasing", int(parameters[3]) if len(parameters) > 3 else 0
+
 def calculate_score(resultFileName, entryPreferenceFileName, froshPreferenceFileName):
 	"""
 	Calculate score of a particular algorithm, out of 100
@@ -89,7 +150,21 @@ def calculate_score(resultFileName, entryPreferenceFileName, froshPreferenceFile
 	Returns:
 		score of algorithm results between 0 and 100
 	"""
-	freshmenPrefs, entryPrefs, results = read_input_and_results(resultFileName, froshPreferenceFileName, entryPreferenceFileName)
+	freshmenPrefs, entryPrefs, results = read_input_and_results(resultFileName, froshPreferenceFileName, entryPreferenceFileName, ROOM_NUMBERS)
+	return score_assignment(freshmenPrefs, entryPrefs, results)
+
+def score_assignment(freshmenPrefs, entryPrefs, results):
+	"""
+	Calculate score of an assignment held in memory, out of 100
+
+	Args:
+		freshmenPrefs : list of lists, rankings given by freshmen (as returned by read_preferences)
+		entryPrefs    : list of lists, ratings given by entries (as returned by read_preferences)
+		results       : list where element i is the assigned entry of freshman i
+
+	Returns:
+		score of the assignment between 0 and 100
+	"""
 	freshmanHappiness = metrics.getFreshmenAverageRankingScore(freshmenPrefs, results)
 	freshmanFairness = metrics.getFreshmenMaxRankingScore(freshmenPrefs, results)
 	entryHappiness = metrics.getPercentageTopRankedFreshmenAllEntries(entryPrefs, results)
@@ -98,43 +173,159 @@ def calculate_score(resultFileName, entryPreferenceFileName, froshPreferenceFile
 	score = 0.5 * freshmanHappiness + 0.1 * freshmanFairness + 0.2 * entryHappiness + 0.2 * entryFairness
 	return score
 
-def assignFreshmenToEntries():
+def variant_tasks(algorithmFileName, numWorkers):
+	"""
+	Split the algorithms listed in algorithmFileName into independent tasks for run_variant_task. LP variants are
+	grouped by cost function and maxRank setting for the Python solver (so each group is one warm-started sweep) and
+	split in numWorkers chunks for Julia (one julia process per chunk).
+
+	Returns:
+		list of tasks, ("python", fileNames), ("julia", fileNames, chunkFileName) or ("marriage", allowGreasing, fileName, seed)
+	"""
+	algorithmFile = open(algorithmFileName, "r")
+	fileNames = [line.rstrip() for line in algorithmFile]
+	algorithmFile.close()
+	tasks = []
+	groups = {}
+	for fileName in fileNames:
+		parameters = flow_solver.parse_output_file_name(fileName)
+		if parameters is None:
+			allowGreasing, sample = parse_marriage_file_name(fileName)
+			tasks.append(("marriage", allowGreasing, fileName, None if MARRIAGE_SEED is None else MARRIAGE_SEED + sample))
+		else:
+			groups.setdefault(parameters[1:], []).append(fileName)
+	lpFileNames = [fileName for key in sorted(groups.keys()) for fileName in groups[key]]
+	if LP_SOLVER == "python":
+		tasks = [("python", groups[key]) for key in sorted(groups.keys())] + tasks
+	else:
+		numChunks = max(1, min(numWorkers or multiprocessing.cpu_count(), len(lpFileNames)))
+		tasks = [("julia", lpFileNames[k::numChunks], "outputFiles_%d.txt" % k) for k in xrange(numChunks)] + tasks
+	return tasks
+
+def run_variant_task(task, preferences):
+	"""
+	Run one task of variant_tasks (in a worker process) and collect its outputs in memory.
+
+	Args:
+		task        : tuple, as returned by variant_tasks
+		preferences : tuple, as returned by read_preferences, with the hash of the input files (preference_loader.input_hash) added
+
+	Returns:
+		list of (resultFileName, results) for the outputs of the task
+	"""
+	names, entries, freshmenCosts, entryCosts, genders, rooms, inputHash = preferences
+	outputs = {}
+	taskName = task[2] if task[0] == "marriage" else "%s_%s" % (task[0], task[1][0])
+	with instrumentation.phase("variant", task=taskName, pid=os.getpid()) as variantPhase:
+		if task[0] == "python":
+			assignments, solveTimes = flow_solver.sweep_variants(task[1], FRESHMEN_PREFERENCES, ENTRY_PREFERENCES, ROOM_NUMBERS, inputs=preferences[:6], inputHash=inputHash)
+			for fileName, assignment in assignments.items():
+				outputs[fileName] = assignment.tolist()
+		elif task[0] == "julia":
+			# LP.jl can only hand its solutions over through files
+			fileNames, chunkFileName = task[1], task[2]
+			chunkFile = open(chunkFileName, "w")
+			chunkFile.write("".join([fileName + "\n" for fileName in fileNames]))
+			chunkFile.close()
+			# Julia start-up, model building and Gurobi are one phase seen from here (LP.jl prints its own @time)
+			with instrumentation.phase("julia", variants=fileNames):
+				os.system("julia LP.jl " + chunkFileName)
+			os.remove(chunkFileName)
+			for fileName in fileNames:
+				if os.path.exists("Outputs/" + fileName):
+					resultsFile = open("Outputs/" + fileName, "r")
+					outputs[fileName] = pairing_to_results([line.rstrip().split(",") for line in resultsFile], names, entries)
+					resultsFile.close()
+					os.remove("Outputs/" + fileName)
+		else:
+			allowGreasing, fileName, seed = task[1], task[2], task[3]
+			# Same pairing as run_marriage_algorithm with this seed, without parsing the files again
+			outputs[fileName] = marriage.run_marriage_arrays(freshmenCosts, entryCosts, genders, rooms, names, marriage.MAX_GENDER_PROPORTION, allowGreasing, seed).tolist()
+	if instrumentation.ENABLED and PROFILE_DIRECTORY is not None:
+		instrumentation.save(os.path.join(PROFILE_DIRECTORY, "variant_%s.json" % taskName.split(".")[0]), [variantPhase.record])
+	return [("Outputs/" + fileName, results) for fileName, results in outputs.items()]
+
+def assignFreshmenToEntries(numWorkers=NUM_WORKERS):
 	"""
 	Master function. Calls all algorithms, picks one with best score, deletes all other outputs.
+
+	Args:
+		numWorkers : int, number of worker processes running the variants (None: one per core, 1: everything runs in this process)
 	"""
+	# Hooks can be set up before by calling instrumentation.enable, worker processes inherit them
+	if PROFILE_DIRECTORY is not None:
+		if not instrumentation.ENABLED:
+			instrumentation.enable()
+		if not os.path.exists(PROFILE_DIRECTORY):
+			os.makedirs(PROFILE_DIRECTORY)
 	# Create file where all algorithms are named
 	algorithmFileName = choose_all_algorithms()
-	# Call Julia
-	run_all_LP_solutions()
-	# Run marriage algorithms
-	marriage.run_marriage_algorithm(ROOM_NUMBERS, False, 0.55, FRESHMEN_PREFERENCES, ENTRY_PREFERENCES, True, "Outputs/output_marriage_greasing.csv")
-	marriage.run_marriage_algorithm(ROOM_NUMBERS, False, 0.55, FRESHMEN_PREFERENCES, ENTRY_PREFERENCES, False, "Outputs/output_marriage_noGreasing.csv")
-	# Find best result
-	algorithmFile = open(algorithmFileName, "r")
-	algorithmScores = {}
-	# For each algorithm, compute score and place in dictionary
-	for line in algorithmFile:
-		resultFileName = line.rstrip()
-		resultFileName = "Outputs/" + resultFileName
-		algorithmScores[resultFileName] = calculate_score(resultFileName, ENTRY_PREFERENCES, FRESHMEN_PREFERENCES)
-	# Find best score
-	maxScore = 0
-	bestAlgorithm = ""
-	for key in algorithmScores.keys():
-		print key, "\t", algorithmScores[key]
-		if algorithmScores[key] > maxScore:
-			maxScore = algorithmScores[key]
-			bestAlgorithm = key
-	# Go through output files, save correct one, delete all others
-	for key in algorithmScores.keys():
-		if key != bestAlgorithm:
-			cmd = "rm " + key
-			os.system(cmd)
+	# Parse preferences once, for every variant
+	with instrumentation.phase("read_preferences"):
+		preferences = read_preferences(FRESHMEN_PREFERENCES, ENTRY_PREFERENCES, ROOM_NUMBERS)
+		inputHash = preference_loader.input_hash(FRESHMEN_PREFERENCES, ENTRY_PREFERENCES, ROOM_NUMBERS)
+	# Check the LP capacities before launching any solver: if they cannot be met, only the marriage variants are run
+	with instrumentation.phase("feasibility") as feasibilityPhase:
+		problems = feasibility.check_capacities(preferences[1], preferences[4], preferences[5])
+		feasibilityPhase.set(problems=len(problems))
+	# Run the LP (Julia or Python solver) and marriage variants, and collect outputs as their tasks complete
+	tasks = variant_tasks(algorithmFileName, numWorkers)
+	if len(problems) > 0:
+		tasks = [task for task in tasks if task[0] == "marriage"]
+	runTask = functools.partial(run_variant_task, preferences=preferences + (inputHash,))
+	algorithmResults = {}
+	# Max ranking bounds are computed here, before the python tasks run in parallel: each maxRank sweep would otherwise
+	# solve the minimax problems again. The plain minimax sweep gives them, so it runs first when some are missing.
+	if LP_SOLVER == "python":
+		with instrumentation.phase("max_ranking_bounds") as boundsPhase:
+			parameters = [flow_solver.parse_output_file_name(fileName) for task in tasks if task[0] == "python" for fileName in task[1]]
+			maxRankWeights = [freshmenWeight for (freshmenWeight, costFunction, maxRanking) in parameters if maxRanking]
+			maxRankingCache = flow_solver.load_max_ranking_cache()
+			if any([flow_solver.max_ranking_key(inputHash, weight) not in maxRankingCache for weight in maxRankWeights]):
+				for task in [task for task in tasks if task[0] == "python" and flow_solver.parse_output_file_name(task[1][0])[1:] == ("minimax", False)]:
+					tasks.remove(task)
+					for key, results in runTask(task):
+						algorithmResults[key] = results
+			boundsPhase.set(computed=flow_solver.fill_max_ranking_cache(preferences[:6], maxRankWeights, inputHash))
+	with instrumentation.phase("variants", tasks=len(tasks), workers=numWorkers):
+		if numWorkers == 1:
+			pool = None
+			completed = itertools.imap(runTask, tasks)
 		else:
-			cmd = "mv " + key + " " + "final_output.csv"
-			os.system(cmd)
+			pool = multiprocessing.Pool(numWorkers)
+			completed = pool.imap_unordered(runTask, tasks)
+		for outputs in completed:
+			for key, results in outputs:
+				algorithmResults[key] = results
+		if pool is not None:
+			pool.close()
+			pool.join()
+	# Score all outputs in one batch and find best score (ties go to the first file name in alphabetical order, whatever the completion order)
+	keys = sorted(algorithmResults.keys())
+	if len(keys) == 0:
+		raise Exception('No variant produced an assignment')
+	names, entries, freshmenCosts, entryCosts, genders, rooms = preferences
+	with instrumentation.phase("scoring", candidates=len(keys)):
+		scores = vectorized_metrics.getScores(freshmenCosts, entryCosts, np.array([algorithmResults[key] for key in keys]))["score"]
+	for key, score in zip(keys, scores):
+		print key, "\t", score
+	maxScore = float(scores.max())
+	bestAlgorithm = keys[scores.argmax()]
+	bestResults = algorithmResults[bestAlgorithm]
+	# Optionally improve the best assignment, within the capacities of LP.jl
+	if LOCAL_SEARCH_TIME > 0:
+		with instrumentation.phase("local_search", timeLimit=LOCAL_SEARCH_TIME) as searchPhase:
+			bestResults, trace = local_search.anneal(freshmenCosts, entryCosts, genders, bestResults, flow_solver.entry_bounds(rooms, genders), LOCAL_SEARCH_TIME)
+			searchPhase.set(trace=trace)
+		print "local search\t", trace[0][1], "->", trace[-1][1], "\t(%d improvements, last one after %.2fs)" % (len(trace) - 1, trace[-1][0])
+		maxScore = trace[-1][1]
+		bestAlgorithm = bestAlgorithm + " + local search"
+	# Only the best assignment is written to disk
+	flow_solver.write_assignment(names, entries, bestResults, "final_output.csv")
 	print maxScore
 	print bestAlgorithm
+	if instrumentation.ENABLED and PROFILE_DIRECTORY is not None:
+		instrumentation.save(os.path.join(PROFILE_DIRECTORY, "master.json"), bestAlgorithm=bestAlgorithm, score=maxScore)
 
 if __name__ == "__main__":
 	assignFreshmenToEntries()
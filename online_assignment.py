@@ -0,0 +1,213 @@
+# online_assignment.py
+# Incremental (online) assignment for late submissions: freshman-proposing deferred acceptance whose state (the
+# proposers each entry tentatively holds, and how far each freshman got in their list) is kept between updates,
+# so a late freshman only costs the chain of proposals and rejections they trigger.
+# Run from the repository root with: python online_assignment.py <late freshman preferences> <late entry preferences> [outputFileName]
+
+import cPickle
+import heapq
+import os
+import sys
+import numpy as np
+import flow_solver
+import preference_loader
+
+STATE_FILE = "onlineAssignment.pickle"
+# Pairing of the online matching, kept apart from final_output.csv (the assignment chosen by master_algorithm)
+OUTPUT_FILE = "online_output.csv"
+
+class OnlineMatching:
+	def __init__(self, entries, bounds):
+		"""
+		Args:
+			entries : list of entry names
+			bounds  : tuple (maxPerEntry, minPerEntry, maxPerGender), as returned by flow_solver.entry_bounds (the minimums are not enforced online)
+		"""
+		self.entries = list(entries)
+		self.maxPerEntry = [int(cap) for cap in bounds[0]]
+		self.maxPerGender = [[float(cap) for cap in caps] for caps in bounds[2]]
+		# held[j][g] is a heap of (rating, -arrival, freshman) of the freshmen of gender g held by entry j, worst on top
+		self.held = [[[] for g in xrange(3)] for entry in self.entries]
+		self.names = []
+		self.nameIndex = {}
+		self.genders = []
+		self.preferenceLists = []
+		self.ratings = []
+		self.pointers = []
+		self.assignment = []
+		# Records waiting for the other half (freshman preferences or entry ratings) of their freshman
+		self.pendingRankings = {}
+		self.pendingRatings = {}
+
+	def add_freshman_preferences(self, name, rankings, gender):
+		"""
+		Record the rankings of a freshman (one per entry, 1 is favorite) and their gender (0, 1 or 2). The freshman is
+		matched as soon as their entry ratings are known as well.
+
+		Returns:
+			number of proposals made (0 while the entry ratings are missing)
+		"""
+		self.pendingRankings[name] = (rankings, gender)
+		return self.match_pending(name)
+
+	def add_entry_preferences(self, name, ratings):
+		"""
+		Record the ratings given by every entry to a freshman. The freshman is matched as soon as their own rankings are known as well.
+
+		Returns:
+			number of proposals made (0 while the freshman rankings are missing)
+		"""
+		self.pendingRatings[name] = ratings
+		return self.match_pending(name)
+
+	def match_pending(self, name):
+		if name not in self.pendingRankings or name not in self.pendingRatings:
+			return 0
+		rankings, gender = self.pendingRankings.pop(name)
+		ratings = self.pendingRatings.pop(name)
+		return self.add_freshman(name, gender, rankings, ratings)
+
+	def add_freshman(self, name, gender, rankings, ratings):
+		"""
+		Add a freshman and resume deferred acceptance from their first proposal. Entries only reconsider the freshmen
+		they hold, so the work is the chain of proposals, evictions and further proposals this freshman sets off.
+
+		Args:
+			name     : string, name of the freshman
+			gender   : int, 0 for boys, 1 for girls, 2 for anything else
+			rankings : list of ints, ranking given by the freshman to each entry (1 is favorite)
+			ratings  : list of ints, rating given by each entry to the freshman
+
+		Returns:
+			number of proposals made
+		"""
+		if name in self.nameIndex:
+			raise Exception('Freshman {0} is already matched'.format(name))
+		if len(rankings) != len(self.entries) or len(ratings) != len(self.entries):
+			raise Exception('Unusable preferences: {0}'.format(name))
+		freshman = len(self.names)
+		self.names.append(name)
+		self.nameIndex[name] = freshman
+		self.genders.append(gender if gender in (0, 1) else 2)
+		self.preferenceLists.append(list(np.argsort(rankings, kind='mergesort')))
+		self.ratings.append(list(ratings))
+		self.pointers.append(0)
+		self.assignment.append(-1)
+		proposals = 0
+		proposer = freshman
+		while proposer is not None:
+			if self.pointers[proposer] >= len(self.entries):
+				# Rejected by every entry: no room left for this freshman
+				break
+			entry = self.preferenceLists[proposer][self.pointers[proposer]]
+			proposals += 1
+			proposer = self.propose(proposer, entry)
+		return proposals
+
+	def propose(self, freshman, entry):
+		"""
+		Let entry consider freshman, holding them if there is room or if they are better rated than a held freshman.
+
+		Returns:
+			the freshman who now has to propose to their next entry (freshman or an evicted freshman), None if nobody
+		"""
+		gender = self.genders[freshman]
+		key = (self.ratings[freshman][entry], -freshman, freshman)
+		heaps = self.held[entry]
+		heap = heaps[gender]
+		if sum([len(h) for h in heaps]) < self.maxPerEntry[entry] and len(heap) < self.maxPerGender[entry][gender]:
+			heapq.heappush(heap, key)
+			self.assignment[freshman] = entry
+			return None
+		if len(heap) >= self.maxPerGender[entry][gender]:
+			# Gender cap reached: only a held freshman of the same gender can make room
+			candidates = [heap] if len(heap) > 0 else []
+		else:
+			candidates = [h for h in heaps if len(h) > 0]
+		if len(candidates) == 0:
+			return self.reject(freshman)
+		worstHeap = min(candidates, key=lambda h: h[0])
+		if worstHeap[0] >= key:
+			return self.reject(freshman)
+		evicted = heapq.heappop(worstHeap)[2]
+		heapq.heappush(heap, key)
+		self.assignment[freshman] = entry
+		return self.reject(evicted)
+
+	def reject(self, freshman):
+		self.assignment[freshman] = -1
+		self.pointers[freshman] += 1
+		return freshman
+
+	def pairing(self):
+		"""
+		Returns:
+			list of (freshman name, entry name) pairs of the matched freshmen, in order of arrival
+		"""
+		return [(name, self.entries[entry]) for (name, entry) in zip(self.names, self.assignment) if entry >= 0]
+
+	def unmatched(self):
+		"""
+		Returns:
+			names of the freshmen rejected by every entry, and of the freshmen with only one of their two records
+		"""
+		return [name for (name, entry) in zip(self.names, self.assignment) if entry < 0] + sorted(set(self.pendingRankings.keys()) | set(self.pendingRatings.keys()))
+
+def read_records(fileName, nValues):
+	"""
+	Read the rows of a late preference file, for streaming. Rows are checked as preference_loader checks the input
+	files: every row must have nValues integers.
+
+	Returns:
+		names  : list of the names of the rows
+		values : int array (nRows, nValues)
+	"""
+	return preference_loader.read_table(fileName, nValues)
+
+def start_matching(froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName):
+	"""
+	Build the matching of the freshmen of the input files, with the capacities of LP.jl.
+
+	Returns:
+		OnlineMatching instance
+	"""
+	names, entries, freshmenCosts, entryCosts, genders, rooms = flow_solver.read_LP_inputs(froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName)
+	matching = OnlineMatching(entries, flow_solver.entry_bounds(rooms, genders))
+	for i in xrange(len(names)):
+		matching.add_freshman(names[i], int(genders[i]), freshmenCosts[i].tolist(), entryCosts[i].tolist())
+	return matching
+
+def add_late_records(matching, froshPreferenceFileName, entryPreferenceFileName):
+	"""
+	Stream the rows of late preference files into the matching.
+
+	Returns:
+		number of proposals made
+	"""
+	nEntries = len(matching.entries)
+	# Both files are read and checked before any record is matched, so a bad row leaves the matching unchanged
+	froshNames, froshTable = read_records(froshPreferenceFileName, nEntries + 1)
+	preference_loader.check_rankings(froshNames, froshTable[:, :nEntries])
+	ratedNames, entryCosts = read_records(entryPreferenceFileName, nEntries)
+	proposals = 0
+	for name, values in zip(froshNames, froshTable.tolist()):
+		proposals += matching.add_freshman_preferences(name, values[:nEntries], values[nEntries])
+	for name, values in zip(ratedNames, entryCosts.tolist()):
+		proposals += matching.add_entry_preferences(name, values)
+	return proposals
+
+if __name__ == "__main__":
+	import master_algorithm
+	if os.path.exists(STATE_FILE):
+		with open(STATE_FILE, "rb") as f:
+			matching = cPickle.load(f)
+	else:
+		matching = start_matching(master_algorithm.FRESHMEN_PREFERENCES, master_algorithm.ENTRY_PREFERENCES, master_algorithm.ROOM_NUMBERS)
+	if len(sys.argv) > 2:
+		print "%d proposals" % add_late_records(matching, sys.argv[1], sys.argv[2])
+	with open(STATE_FILE, "wb") as f:
+		cPickle.dump(matching, f, cPickle.HIGHEST_PROTOCOL)
+	with open(sys.argv[3] if len(sys.argv) > 3 else OUTPUT_FILE, "w") as f:
+		for name, entry in matching.pairing():
+			f.write("%s,%s\n" % (name, entry))
+	print "unmatched:", matching.unmatched()
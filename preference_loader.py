@@ -0,0 +1,176 @@
+# preference_loader.py
+# Single parser for the three input files (freshman preferences and genders, entry preferences, vacancies) into typed
+# NumPy arrays, validated in bulk. Parsed inputs are cached as a directory of .npy files (loaded memory-mapped),
+# keyed by the modification times of the files and the hash of their contents.
+
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+
+# Directory where parsed inputs are cached between runs (None: no cache)
+PREFERENCE_CACHE_DIRECTORY = "preferenceCache"
+ARRAYS = ["names", "entries", "freshmenCosts", "entryCosts", "genders", "rooms"]
+
+def input_hash(*fileNames):
+	"""
+	Hash of the contents of the input files, used to key cached results.
+
+	Returns:
+		string, hexadecimal SHA-1 digest
+	"""
+	digest = hashlib.sha1()
+	for fileName in fileNames:
+		with open(fileName, "rb") as f:
+			digest.update(f.read())
+		digest.update("\0")
+	return digest.hexdigest()
+
+def smallest_int_type(values):
+	"""
+	int8 if all values fit in it (rankings and ratings of up to 127 entries), int16 or int32 otherwise.
+	"""
+	for dtype in [np.int8, np.int16, np.int32]:
+		if len(values) == 0 or (values.min() >= np.iinfo(dtype).min and values.max() <= np.iinfo(dtype).max):
+			return dtype
+	return np.int64
+
+def read_table(fileName, nColumns):
+	"""
+	Parse a csv file with a name in the first column and integers in the others, in one pass of np.fromstring.
+
+	Args:
+		fileName : string, name of csv file
+		nColumns : int, number of integer columns after the name (None: same as the first line)
+
+	Returns:
+		names    : list of first column values (stripped)
+		values   : int64 array (nRows, nColumns)
+	"""
+	with open(fileName) as f:
+		lines = [line for line in f.read().splitlines() if line.strip()]
+	rows = [line.split(",", 1) for line in lines]
+	if any([len(row) < 2 for row in rows]):
+		raise Exception('Missing values in {0}'.format(fileName))
+	names = [row[0].strip() for row in rows]
+	if nColumns is None:
+		nColumns = len(rows[0][1].split(","))
+	widths = np.array([row[1].count(",") + 1 for row in rows])
+	if (widths != nColumns).any():
+		raise Exception('Expected {0} values per row in {1}, rows with a different count: {2}'.format(nColumns, fileName, [names[i] for i in np.flatnonzero(widths != nColumns)]))
+	values = np.fromstring(",".join([row[1] for row in rows]), dtype=np.int64, sep=",")
+	if len(values) != len(rows) * nColumns:
+		raise Exception('Non integer values in {0}'.format(fileName))
+	return names, values.reshape(len(rows), nColumns)
+
+def check_rankings(names, freshmenCosts):
+	"""
+	Raise unless each freshman ranks every entry exactly once (each row is a permutation of 1 to nEntries).
+
+	Args:
+		names         : list of freshman names (rows of freshmenCosts)
+		freshmenCosts : int array (nFreshmen, nEntries), rankings given by freshmen
+	"""
+	unusable = (np.sort(freshmenCosts, axis=1) != np.arange(1, freshmenCosts.shape[1] + 1)).any(axis=1)
+	if unusable.any():
+		raise Exception('Unusable preferences: {0}'.format(", ".join([names[i] for i in np.flatnonzero(unusable)])))
+
+def parse_preferences(froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName):
+	"""
+	Parse and validate the input files, without the cache.
+
+	Returns:
+		tuple of the arrays listed in ARRAYS, as described in load_preferences
+	"""
+	entries, rooms = read_table(entryVacancyFileName, 3)
+	nEntries = len(entries)
+	if (rooms < 0).any():
+		raise Exception('Negative vacancies for entries {0}'.format([entries[j] for j in np.flatnonzero((rooms < 0).any(axis=1))]))
+	names, froshTable = read_table(froshPreferenceFileName, nEntries + 1)
+	freshmenCosts = froshTable[:, :nEntries]
+	check_rankings(names, freshmenCosts)
+	genders = froshTable[:, nEntries]
+	genders[(genders != 0) & (genders != 1)] = 2
+	ratedNames, entryCosts = read_table(entryPreferenceFileName, nEntries)
+	# Entry ratings are matched to freshmen by name, whatever the order of the file
+	nameIndex = dict((name, i) for (i, name) in enumerate(names))
+	if len(nameIndex) != len(names):
+		raise Exception('Duplicate freshman names in {0}'.format(froshPreferenceFileName))
+	missing = set(names) - set(ratedNames)
+	unknown = set(ratedNames) - set(names)
+	if len(missing) > 0 or len(unknown) > 0 or len(ratedNames) != len(names):
+		raise Exception('Entry preferences do not match freshmen: missing {0}, unknown or duplicate {1}'.format(sorted(missing), sorted(unknown) or "duplicates"))
+	order = np.array([nameIndex[name] for name in ratedNames])
+	sortedEntryCosts = np.empty_like(entryCosts)
+	sortedEntryCosts[order] = entryCosts
+	return (np.array(names), np.array(entries), freshmenCosts.astype(smallest_int_type(freshmenCosts)),
+		sortedEntryCosts.astype(smallest_int_type(sortedEntryCosts)), genders.astype(np.int8), rooms)
+
+def file_stamps(fileNames):
+	return [[os.path.abspath(fileName), os.path.getmtime(fileName), os.path.getsize(fileName)] for fileName in fileNames]
+
+def read_cache(bundle):
+	with open(os.path.join(bundle, "stamps.json")) as f:
+		return json.load(f)
+
+def write_cache(bundle, stamps, contentHash, arrays):
+	"""
+	Save parsed inputs in directory bundle. The directory is replaced atomically, since several processes may load the same inputs.
+	"""
+	temporaryBundle = "%s.%d" % (bundle, os.getpid())
+	if os.path.exists(temporaryBundle):
+		shutil.rmtree(temporaryBundle)
+	os.makedirs(temporaryBundle)
+	for name, array in zip(ARRAYS, arrays):
+		np.save(os.path.join(temporaryBundle, name + ".npy"), array)
+	with open(os.path.join(temporaryBundle, "stamps.json"), "w") as f:
+		json.dump({"stamps": stamps, "hash": contentHash}, f, indent=1)
+	if os.path.exists(bundle):
+		shutil.rmtree(bundle, ignore_errors=True)
+	try:
+		os.rename(temporaryBundle, bundle)
+	except OSError:
+		# Another process saved the same inputs first
+		shutil.rmtree(temporaryBundle, ignore_errors=True)
+
+def load_preferences(froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName, cacheDirectory=PREFERENCE_CACHE_DIRECTORY):
+	"""
+	Load the input files, from the cache when they have not changed. The cache is used directly when the modification
+	times and sizes of the files are the ones it was saved with, and after checking the hash of the contents otherwise.
+
+	Args:
+		froshPreferenceFileName : string, name of file with freshmen preferences and genders
+		entryPreferenceFileName : string, name of file with entry preferences
+		entryVacancyFileName    : string, name of file where entry vacancies are listed
+		cacheDirectory          : string, directory of the cache (None: always parse the files)
+
+	Returns:
+		names          : string array (nFreshmen,), freshman names in the order of the preference file (row i of the other arrays)
+		entries        : string array (nEntries,), entry names in the order of the vacancy file
+		freshmenCosts  : int8 array (nFreshmen, nEntries), ranking given by freshman i to entry j (int16 past 127 entries)
+		entryCosts     : int8 array (nFreshmen, nEntries), rating given by entry j to freshman i (wider if ratings need it)
+		genders        : int8 array (nFreshmen,), 0 for boys, 1 for girls, 2 for anything else
+		rooms          : int array (nEntries, 3), M, F and U vacancies of each entry
+	"""
+	fileNames = [froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName]
+	if cacheDirectory is None:
+		return parse_preferences(*fileNames)
+	stamps = file_stamps(fileNames)
+	bundle = os.path.join(cacheDirectory, hashlib.sha1(json.dumps([stamp[0] for stamp in stamps])).hexdigest())
+	contentHash = None
+	if os.path.exists(os.path.join(bundle, "stamps.json")):
+		cached = read_cache(bundle)
+		if cached["stamps"] != stamps:
+			contentHash = input_hash(*fileNames)
+		if cached["stamps"] == stamps or cached["hash"] == contentHash:
+			if contentHash is not None:
+				# Same contents, only touched: keep the cache and remember the new stamps
+				with open(os.path.join(bundle, "stamps.json"), "w") as f:
+					json.dump({"stamps": stamps, "hash": contentHash}, f, indent=1)
+			return tuple([np.load(os.path.join(bundle, name + ".npy"), mmap_mode="r") for name in ARRAYS])
+	arrays = parse_preferences(*fileNames)
+	if contentHash is None:
+		contentHash = input_hash(*fileNames)
+	write_cache(bundle, stamps, contentHash, arrays)
+	return arrays
@@ -0,0 +1,161 @@
+# relaxation_solver.py
+# Fast approximate mode for what-if runs: the LP relaxation of a linear LP.jl variant is solved with scipy's linprog
+# (HiGHS when the installed scipy has it, sparse interior point otherwise), fractional freshmen are repaired into an
+# integer assignment, and the gap to the LP bound is reported.
+# Run from the repository root with: python relaxation_solver.py [freshmenWeight] [costFunction] [outputFileName]
+
+import sys
+import time
+import numpy as np
+import scipy.sparse
+from scipy.optimize import linprog, show_options
+import flow_solver
+import instrumentation
+
+# Cost functions whose objective is linear in the assignment variables (minimax is not a sum)
+COST_FUNCTIONS = ["simple", "simplequad", "simplerquad"]
+# linprog methods by order of preference: "highs" needs scipy >= 1.6
+METHODS = ["highs", "interior-point"]
+METHOD_OPTIONS = {"interior-point": {"sparse": True, "presolve": False}}
+# A freshman is integral when one of their variables is at least 1 - ROUNDING_TOLERANCE
+ROUNDING_TOLERANCE = 1e-6
+
+def linprog_method():
+	"""
+	Returns:
+		first method of METHODS known to the installed scipy (linprog itself only rejects an unknown method after
+		preparing the whole problem)
+	"""
+	for method in METHODS:
+		try:
+			show_options("linprog", method, disp=False)
+			return method
+		except ValueError:
+			pass
+	raise Exception('No linprog method available among {0}'.format(METHODS))
+
+def relaxation_problem(costs, genders, bounds):
+	"""
+	Build the LP relaxation of LP.jl in equality form. Variables are the allowed (finite cost) freshman-entry arcs,
+	then one slack per entry (rooms left empty, at most maxPerEntry - minPerEntry) and one per entry and gender.
+
+	Args:
+		costs   : float array (nFreshmen, nEntries), np.inf where an assignment is forbidden
+		genders : int array (nFreshmen,), 0, 1 or 2
+		bounds  : tuple (maxPerEntry, minPerEntry, maxPerGender), as returned by flow_solver.entry_bounds
+
+	Returns:
+		c, A, b, variableBounds : arguments of linprog (minimize c.x subject to A x = b and the variable bounds)
+		freshmen, entries       : int arrays, freshman and entry of each arc variable
+	"""
+	maxPerEntry, minPerEntry, maxPerGender = bounds
+	nFreshmen, nEntries = costs.shape
+	freshmen, entries = np.nonzero(np.isfinite(costs))
+	nArcs = len(freshmen)
+	nVariables = nArcs + 3 * nEntries
+	arcs = np.arange(nArcs)
+	gendered = genders[freshmen] < 2
+	slacks = nArcs + np.arange(3 * nEntries)
+	# Rows: one per freshman, one per entry, one per entry and gender (boys and girls, others have no cap)
+	rows = np.concatenate([freshmen, nFreshmen + entries, nFreshmen + nEntries + 2 * entries[gendered] + genders[freshmen[gendered]], nFreshmen + np.arange(3 * nEntries)])
+	columns = np.concatenate([arcs, arcs, arcs[gendered], slacks])
+	A = scipy.sparse.csr_matrix((np.ones(len(rows)), (rows, columns)), shape=(nFreshmen + 3 * nEntries, nVariables))
+	b = np.concatenate([np.ones(nFreshmen), maxPerEntry, maxPerGender[:, :2].ravel()]).astype(float)
+	c = np.concatenate([costs[freshmen, entries], np.zeros(3 * nEntries)])
+	# Only the slack of the entry rows has an upper bound: the other rows are plain caps
+	upper = [None] * nArcs + list(maxPerEntry - minPerEntry) + [None] * (2 * nEntries)
+	variableBounds = zip([0] * nVariables, upper)
+	return c, A, b, variableBounds, freshmen, entries
+
+def solve_relaxation(costs, genders, bounds):
+	"""
+	Solve the LP relaxation with the preferred linprog method available.
+
+	Returns:
+		fractional : float array (nFreshmen, nEntries), share of each freshman in each entry (None if infeasible)
+		bound      : float, optimal value of the relaxation, a lower bound on the cost of any assignment
+		method     : string, linprog method used
+	"""
+	c, A, b, variableBounds, freshmen, entries = relaxation_problem(costs, genders, bounds)
+	method = linprog_method()
+	result = linprog(c, A_eq=A, b_eq=b, bounds=variableBounds, method=method, options=METHOD_OPTIONS.get(method, {}))
+	if result.status != 0:
+		return None, np.inf, method
+	fractional = np.zeros(costs.shape)
+	fractional[freshmen, entries] = result.x[:len(freshmen)]
+	return fractional, float(result.fun), method
+
+def repair(fractional, costs, genders, bounds):
+	"""
+	Turn a relaxed solution into an assignment. Integral freshmen keep their entry; the fractional ones are assigned
+	exactly by flow_solver.min_cost_assignment in the rooms left. If that fails, everyone is assigned again.
+
+	Returns:
+		assignment : int array (nFreshmen,), or None if the problem is infeasible
+		nRepaired  : int, number of fractional freshmen
+	"""
+	maxPerEntry, minPerEntry, maxPerGender = bounds
+	nEntries = costs.shape[1]
+	assignment = fractional.argmax(axis=1)
+	fixed = fractional.max(axis=1) >= 1 - ROUNDING_TOLERANCE
+	loose = np.flatnonzero(~fixed)
+	if len(loose) == 0:
+		return assignment, 0
+	load = np.zeros((nEntries, 3), dtype=int)
+	np.add.at(load, (assignment[fixed], genders[fixed]), 1)
+	count = load.sum(axis=1)
+	repaired = flow_solver.min_cost_assignment(costs[loose], genders[loose], np.maximum(maxPerEntry - count, 0), np.maximum(minPerEntry - count, 0), np.maximum(maxPerGender - load, 0), assignment[loose])
+	if repaired is None:
+		return flow_solver.min_cost_assignment(costs, genders, maxPerEntry, minPerEntry, maxPerGender, assignment), len(loose)
+	assignment[loose] = repaired
+	return assignment, len(loose)
+
+def solve_relaxed(freshmenCosts, entryCosts, genders, bounds, freshmenWeight, costFunction):
+	"""
+	Approximate one LP.jl variant (without max ranking constraint) through its LP relaxation.
+
+	Args:
+		freshmenCosts  : int array (nFreshmen, nEntries), rankings given by freshmen
+		entryCosts     : int array (nFreshmen, nEntries), ratings given by entries
+		genders        : int array (nFreshmen,), 0, 1 or 2
+		bounds         : tuple (maxPerEntry, minPerEntry, maxPerGender), as returned by flow_solver.entry_bounds
+		freshmenWeight : float between 0 and 1, relative importance of freshman and entry preferences
+		costFunction   : string, one of COST_FUNCTIONS
+
+	Returns:
+		assignment : int array (nFreshmen,) with the entry of each freshman, or None if the problem is infeasible
+		bound      : float, optimal value of the relaxation
+		gap        : float, (cost of assignment - bound) / cost of assignment (0 when the relaxation was integral)
+	"""
+	if costFunction not in COST_FUNCTIONS:
+		raise Exception('Cost function {0} is not linear, use one of {1}'.format(costFunction, COST_FUNCTIONS))
+	costs = flow_solver.cost_matrix(freshmenCosts, entryCosts, freshmenWeight, costFunction)
+	with instrumentation.phase("relaxation", costFunction=costFunction, freshmenWeight=freshmenWeight) as relaxationPhase:
+		fractional, bound, method = solve_relaxation(costs, genders, bounds)
+		relaxationPhase.set(method=method, bound=bound)
+	if fractional is None:
+		return None, bound, np.inf
+	with instrumentation.phase("repair") as repairPhase:
+		assignment, nRepaired = repair(fractional, costs, genders, bounds)
+		repairPhase.set(repaired=nRepaired)
+	if assignment is None:
+		return None, bound, np.inf
+	cost = costs[np.arange(len(assignment)), assignment].sum()
+	gap = (cost - bound) / abs(cost) if cost != 0 else 0.
+	return assignment, bound, max(gap, 0.)
+
+if __name__ == "__main__":
+	import master_algorithm
+	import vectorized_metrics
+	freshmenWeight = float(sys.argv[1]) if len(sys.argv) > 1 else 0.7
+	costFunction = sys.argv[2] if len(sys.argv) > 2 else "simple"
+	outputFileName = sys.argv[3] if len(sys.argv) > 3 else "relaxed_output.csv"
+	names, entries, freshmenCosts, entryCosts, genders, rooms = flow_solver.read_LP_inputs(master_algorithm.FRESHMEN_PREFERENCES, master_algorithm.ENTRY_PREFERENCES, master_algorithm.ROOM_NUMBERS)
+	start = time.time()
+	assignment, bound, gap = solve_relaxed(freshmenCosts, entryCosts, genders, flow_solver.entry_bounds(rooms, genders), freshmenWeight, costFunction)
+	if assignment is None:
+		print "infeasible (%.3f s)" % (time.time() - start)
+	else:
+		print "solved in %.3f s, LP bound %.4f, gap %.4f%%" % (time.time() - start, bound, 100 * gap)
+		print "score", vectorized_metrics.getScores(freshmenCosts, entryCosts, assignment)["score"][0]
+		flow_solver.write_assignment(names, entries, assignment, outputFileName)
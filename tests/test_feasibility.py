@@ -0,0 +1,41 @@
+# test_feasibility.py
+# The capacity check against the exact solver: without forbidden assignments, capacity_problems finds a problem if
+# and only if min_cost_assignment finds no assignment.
+# Run from the repository root with: python -m unittest discover tests
+
+import unittest
+import numpy as np
+import feasibility
+import flow_solver
+
+class CapacityProblemsTest(unittest.TestCase):
+	def test_verdicts(self):
+		rng = np.random.RandomState(0)
+		verdicts = set()
+		for trial in xrange(200):
+			nFreshmen, nEntries = rng.randint(1, 16), rng.randint(1, 5)
+			genders = rng.randint(0, 3, size=nFreshmen)
+			maxPerEntry = rng.randint(0, 7, size=nEntries)
+			minPerEntry = np.array([rng.randint(0, maximum + 1) for maximum in maxPerEntry])
+			maxPerGender = np.column_stack([rng.randint(0, 6, size=nEntries), rng.randint(0, 6, size=nEntries), np.inf * np.ones(nEntries)])
+			bounds = (maxPerEntry, minPerEntry, maxPerGender)
+			costs = rng.rand(nFreshmen, nEntries)
+			feasible = len(feasibility.capacity_problems(bounds, genders)) == 0
+			self.assertEqual(feasible, flow_solver.min_cost_assignment(costs, genders, *bounds) is not None)
+			verdicts.add(feasible)
+		self.assertEqual(verdicts, set([True, False]))
+
+	def test_entry_bounds(self):
+		# Capacities built by entry_bounds from rooms, as in the pipeline
+		rng = np.random.RandomState(1)
+		for trial in xrange(100):
+			nEntries = rng.randint(1, 5)
+			rooms = rng.randint(0, 4, size=(nEntries, 3))
+			genders = rng.randint(0, 3, size=rng.randint(1, max(rooms.sum(), 1) + 3))
+			bounds = flow_solver.entry_bounds(rooms, genders, rng.choice([None, 0.55]))
+			costs = rng.rand(len(genders), nEntries)
+			problems = feasibility.capacity_problems(bounds, genders)
+			self.assertEqual(len(problems) == 0, flow_solver.min_cost_assignment(costs, genders, *bounds) is not None)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,74 @@
+# test_flow_solver.py
+# flow_solver against brute force on instances small enough to enumerate every assignment.
+# Run from the repository root with: python -m unittest discover tests
+
+import itertools
+import unittest
+import numpy as np
+import flow_solver
+
+def random_instance(rng, nFreshmen, nEntries):
+	"""
+	Returns:
+		costs  : float array (nFreshmen, nEntries), with some forbidden (np.inf) assignments
+		genders: int array (nFreshmen,)
+		bounds : tuple (maxPerEntry, minPerEntry, maxPerGender), not always feasible
+	"""
+	costs = rng.randint(0, 10, size=(nFreshmen, nEntries)).astype(float)
+	costs[rng.rand(nFreshmen, nEntries) < 0.15] = np.inf
+	genders = rng.randint(0, 3, size=nFreshmen)
+	maxPerEntry = rng.randint(1, nFreshmen + 1, size=nEntries)
+	minPerEntry = np.array([rng.randint(0, maximum + 1) for maximum in maxPerEntry]) * (rng.rand(nEntries) < 0.5)
+	maxPerGender = np.column_stack([np.floor(rng.rand(nEntries, 2) * (maxPerEntry[:, np.newaxis] + 1)), np.inf * np.ones(nEntries)])
+	return costs, genders, (maxPerEntry, minPerEntry, maxPerGender)
+
+def brute_force(costs, genders, bounds, objective):
+	"""
+	Returns:
+		smallest value of objective (a function of the costs of the freshmen) over the feasible assignments, None if there is none
+	"""
+	nFreshmen, nEntries = costs.shape
+	best = None
+	for assignment in itertools.product(xrange(nEntries), repeat=nFreshmen):
+		assignment = np.array(assignment)
+		if flow_solver.is_feasible(costs, genders, assignment, *bounds):
+			value = objective(costs[np.arange(nFreshmen), assignment])
+			best = value if best is None else min(best, value)
+	return best
+
+class MinCostAssignmentTest(unittest.TestCase):
+	def check(self, solver, objective, seed):
+		rng = np.random.RandomState(seed)
+		nFeasible = 0
+		for trial in xrange(40):
+			costs, genders, bounds = random_instance(rng, rng.randint(1, 7), rng.randint(1, 4))
+			expected = brute_force(costs, genders, bounds, objective)
+			assignment = solver(costs, genders, *bounds)
+			if expected is None:
+				self.assertIsNone(assignment)
+				continue
+			nFeasible += 1
+			self.assertIsNotNone(assignment)
+			self.assertTrue(flow_solver.is_feasible(costs, genders, assignment, *bounds))
+			self.assertAlmostEqual(objective(costs[np.arange(len(genders)), assignment]), expected)
+		self.assertGreater(nFeasible, 5)
+
+	def test_sum(self):
+		self.check(flow_solver.min_cost_assignment, np.sum, 0)
+
+	def test_minimax(self):
+		self.check(flow_solver.minimax_assignment, np.max, 1)
+
+	def test_warm_start(self):
+		rng = np.random.RandomState(2)
+		for trial in xrange(20):
+			costs, genders, bounds = random_instance(rng, 6, 3)
+			expected = brute_force(costs, genders, bounds, np.sum)
+			if expected is None:
+				continue
+			start = flow_solver.min_cost_assignment(np.where(np.isfinite(costs), rng.rand(*costs.shape), np.inf), genders, *bounds)
+			assignment = flow_solver.min_cost_assignment(costs, genders, bounds[0], bounds[1], bounds[2], start)
+			self.assertAlmostEqual(costs[np.arange(6), assignment].sum(), expected)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,57 @@
+# test_incremental_score.py
+# IncrementalScorer against vectorized_metrics.getScores, through random moves and swaps.
+# Run from the repository root with: python -m unittest discover tests
+
+import unittest
+import numpy as np
+import vectorized_metrics
+from incremental_score import IncrementalScorer
+
+def random_preferences(rng, nFreshmen, nEntries):
+	freshmenPrefs = np.argsort(rng.rand(nFreshmen, nEntries), axis=1) + 1
+	entryPrefs = rng.randint(1, 7, size=(nFreshmen, nEntries))
+	return freshmenPrefs, entryPrefs
+
+class IncrementalScorerTest(unittest.TestCase):
+	def assertScore(self, score, freshmenPrefs, entryPrefs, results):
+		self.assertAlmostEqual(score, vectorized_metrics.getScores(freshmenPrefs, entryPrefs, results)["score"][0], places=9)
+
+	def test_moves_and_swaps(self):
+		rng = np.random.RandomState(0)
+		for nEntries in [1, 2, 9]:
+			nFreshmen = 30
+			freshmenPrefs, entryPrefs = random_preferences(rng, nFreshmen, nEntries)
+			results = rng.randint(0, nEntries, size=nFreshmen)
+			scorer = IncrementalScorer(freshmenPrefs, entryPrefs, results)
+			self.assertScore(scorer.score(), freshmenPrefs, entryPrefs, results)
+			for step in xrange(200):
+				freshman, other, entry = rng.randint(nFreshmen), rng.randint(nFreshmen), rng.randint(nEntries)
+				if rng.rand() < 0.5:
+					expected = results.copy()
+					expected[freshman] = entry
+					self.assertScore(scorer.move_score(freshman, entry), freshmenPrefs, entryPrefs, expected)
+					scorer.move(freshman, entry)
+				else:
+					expected = results.copy()
+					expected[freshman], expected[other] = results[other], results[freshman]
+					self.assertScore(scorer.swap_score(freshman, other), freshmenPrefs, entryPrefs, expected)
+					scorer.swap(freshman, other)
+				results = expected
+				self.assertTrue((scorer.results == results).all())
+				self.assertScore(scorer.score(), freshmenPrefs, entryPrefs, results)
+
+	def test_moves_score(self):
+		rng = np.random.RandomState(1)
+		freshmenPrefs, entryPrefs = random_preferences(rng, 40, 5)
+		results = rng.randint(0, 5, size=40)
+		scorer = IncrementalScorer(freshmenPrefs, entryPrefs, results)
+		for step in xrange(50):
+			freshmen = rng.choice(40, size=3, replace=False)
+			moves = zip(freshmen, rng.randint(0, 5, size=3))
+			expected = results.copy()
+			expected[freshmen] = [entry for freshman, entry in moves]
+			self.assertScore(scorer.moves_score(moves), freshmenPrefs, entryPrefs, expected)
+			self.assertTrue((scorer.results == results).all())
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,48 @@
+# test_marriage_algorithm.py
+# The marriage algorithm gives the same pairing through the Entry/Freshman objects, through marriage_engine and from
+# the parsed arrays, for the same seed, with and without greasing.
+# Run from the repository root with: python -m unittest discover tests
+
+import os
+import shutil
+import tempfile
+import unittest
+import marriage_algorithm as marriage
+from benchmarks import synthetic_instance
+
+class MarriageEnginesTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def run_files(self, allowGreasing, vectorized, seed):
+		"""
+		Returns:
+			dictionary mapping freshman names to (upper-cased) entry names, from run_marriage_algorithm
+		"""
+		fileNames = [os.path.join(self.directory, fileName) for fileName in [synthetic_instance.ROOM_NUMBERS, synthetic_instance.FRESHMEN_PREFERENCES, synthetic_instance.ENTRY_PREFERENCES]]
+		pairing = marriage.run_marriage_algorithm(fileNames[0], False, marriage.MAX_GENDER_PROPORTION, fileNames[1], fileNames[2], allowGreasing, None, vectorized, seed, None)
+		return dict((name, entry.upper()) for (name, entry) in pairing)
+
+	def test_same_pairing(self):
+		for seed in xrange(12):
+			instance = synthetic_instance.generate_instance(10 + 7 * seed, 2 + seed % 4, correlation=0.3 * (seed % 3), seed=seed)
+			synthetic_instance.write_instance(instance, self.directory)
+			names, entries, freshmenCosts, entryCosts, genders, rooms = instance
+			for allowGreasing in [False, True]:
+				objects = self.run_files(allowGreasing, False, seed)
+				self.assertEqual(sorted(objects.keys()), sorted(names))
+				self.assertEqual(self.run_files(allowGreasing, True, seed), objects)
+				assignment = marriage.run_marriage_arrays(freshmenCosts, entryCosts, genders, rooms, list(names), marriage.MAX_GENDER_PROPORTION, allowGreasing, seed)
+				self.assertEqual(dict((name, entries[j].upper()) for (name, j) in zip(names, assignment)), objects)
+
+	def test_seeded_runs_repeat(self):
+		synthetic_instance.write_instance(synthetic_instance.generate_instance(60, 4, correlation=0.9, seed=3), self.directory)
+		for allowGreasing in [False, True]:
+			for vectorized in [False, True]:
+				self.assertEqual(self.run_files(allowGreasing, vectorized, 7), self.run_files(allowGreasing, vectorized, 7))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,55 @@
+# test_master_algorithm.py
+# The master pipeline with the Python solver, on a small synthetic instance, with and without worker processes.
+# Run from the repository root with: python -m unittest discover tests
+
+import os
+import shutil
+import tempfile
+import unittest
+import flow_solver
+import master_algorithm
+from benchmarks import synthetic_instance
+
+class MaxRankingBoundsTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.workingDirectory = os.getcwd()
+		os.chdir(self.directory)
+		synthetic_instance.write_instance(synthetic_instance.generate_instance(24, 3, seed=1))
+		self.settings = (master_algorithm.LP_SOLVER, flow_solver.minimax_assignment)
+		master_algorithm.LP_SOLVER = "python"
+		# Worker processes inherit the counting solver, and report each call through a file
+		def counting_minimax(*args):
+			with open(os.path.join(self.directory, "minimaxSolves.txt"), "a") as f:
+				f.write("%d\n" % os.getpid())
+			return self.settings[1](*args)
+		flow_solver.minimax_assignment = counting_minimax
+
+	def tearDown(self):
+		master_algorithm.LP_SOLVER, flow_solver.minimax_assignment = self.settings
+		os.chdir(self.workingDirectory)
+		shutil.rmtree(self.directory)
+
+	def cold_run(self, numWorkers):
+		"""
+		Returns:
+			number of minimax solves of a run without max ranking cache, and the final assignment
+		"""
+		for fileName in [flow_solver.MAX_RANKING_CACHE_FILE, "minimaxSolves.txt"]:
+			if os.path.exists(fileName):
+				os.remove(fileName)
+		master_algorithm.assignFreshmenToEntries(numWorkers)
+		with open("minimaxSolves.txt") as f:
+			solves = len(f.readlines())
+		with open("final_output.csv") as f:
+			return solves, f.read()
+
+	def test_minimax_solves_do_not_depend_on_workers(self):
+		solves, assignment = self.cold_run(1)
+		# One solve per weight for the minimax variants without and with the max ranking bound
+		self.assertEqual(solves, 2 * len(range(60, 81)))
+		for numWorkers in [2, 4]:
+			self.assertEqual(self.cold_run(numWorkers), (solves, assignment))
+
+if __name__ == "__main__":
+	unittest.main()
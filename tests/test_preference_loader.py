@@ -0,0 +1,82 @@
+# test_preference_loader.py
+# Validation, name matching and cache invalidation of preference_loader.
+# Run from the repository root with: python -m unittest discover tests
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import preference_loader
+
+FRESHMEN_PREFERENCES = "f1,1,2,3,0\nf2,3,1,2,1\nf3,2,3,1,0\n"
+ENTRY_PREFERENCES = "f3,6,5,4\nf1,1,2,3\nf2,4,4,4\n"
+ENTRY_VACANCIES = "A,0,0,1\nB,0,0,1\nC,0,0,2\n"
+
+class PreferenceLoaderTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.fileNames = [os.path.join(self.directory, fileName) for fileName in ["frosh.csv", "entries.csv", "vacancies.csv"]]
+		self.cacheDirectory = os.path.join(self.directory, "cache")
+		self.write(FRESHMEN_PREFERENCES, ENTRY_PREFERENCES, ENTRY_VACANCIES)
+		self.parse = preference_loader.parse_preferences
+		self.parsed = 0
+		def counting_parse(*fileNames):
+			self.parsed += 1
+			return self.parse(*fileNames)
+		preference_loader.parse_preferences = counting_parse
+
+	def tearDown(self):
+		preference_loader.parse_preferences = self.parse
+		shutil.rmtree(self.directory)
+
+	def write(self, *contents):
+		for fileName, content in zip(self.fileNames, contents):
+			with open(fileName, "w") as f:
+				f.write(content)
+
+	def load(self):
+		return preference_loader.load_preferences(*self.fileNames, cacheDirectory=self.cacheDirectory)
+
+	def test_rejects_non_permutation(self):
+		self.write(FRESHMEN_PREFERENCES.replace("f2,3,1,2", "f2,3,1,1"))
+		with self.assertRaisesRegexp(Exception, "Unusable preferences: f2"):
+			self.load()
+		self.write(FRESHMEN_PREFERENCES.replace("f3,2,3,1", "f3,2,3,4"))
+		with self.assertRaisesRegexp(Exception, "Unusable preferences: f3"):
+			self.load()
+
+	def test_matches_names(self):
+		names, entries, freshmenCosts, entryCosts, genders, rooms = self.load()
+		self.assertEqual(names.tolist(), ["f1", "f2", "f3"])
+		self.assertEqual(entries.tolist(), ["A", "B", "C"])
+		# Entry ratings follow the freshmen of the preference file, whatever the order of the entry file
+		self.assertEqual(entryCosts.tolist(), [[1, 2, 3], [4, 4, 4], [6, 5, 4]])
+		self.assertEqual(genders.tolist(), [0, 1, 0])
+		for entryPreferences in [ENTRY_PREFERENCES.replace("f2,", "f4,"), ENTRY_PREFERENCES.replace("f2,4,4,4\n", ""), ENTRY_PREFERENCES + "f1,1,1,1\n"]:
+			self.write(FRESHMEN_PREFERENCES, entryPreferences)
+			with self.assertRaisesRegexp(Exception, "Entry preferences do not match freshmen"):
+				self.load()
+
+	def test_cache(self):
+		arrays = self.load()
+		self.assertEqual(self.parsed, 1)
+		# Same stamps: cache hit
+		self.assertEqual([array.tolist() for array in self.load()], [array.tolist() for array in arrays])
+		self.assertEqual(self.parsed, 1)
+		# Touched without changing the contents: same hash, cache hit
+		stamp = os.path.getmtime(self.fileNames[1]) + 10
+		os.utime(self.fileNames[1], (stamp, stamp))
+		self.load()
+		self.assertEqual(self.parsed, 1)
+		# Contents changed, same size: new stamps and a different hash, parsed again
+		self.write(FRESHMEN_PREFERENCES, ENTRY_PREFERENCES.replace("f2,4,4,4", "f2,5,5,5"))
+		os.utime(self.fileNames[1], (stamp + 10, stamp + 10))
+		names, entries, freshmenCosts, entryCosts, genders, rooms = self.load()
+		self.assertEqual(self.parsed, 2)
+		self.assertEqual(entryCosts[1].tolist(), [5, 5, 5])
+		self.load()
+		self.assertEqual(self.parsed, 2)
+
+if __name__ == "__main__":
+	unittest.main()
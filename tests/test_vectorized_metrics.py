@@ -0,0 +1,56 @@
+# test_vectorized_metrics.py
+# vectorized_metrics against the loops of calculate_metrics, on random assignments.
+# Run from the repository root with: python -m unittest discover tests
+
+import unittest
+import numpy as np
+import calculate_metrics
+import master_algorithm
+import vectorized_metrics
+
+METRICS = ["getFreshmenAverageRankingScore", "getPercentageFreshmenInTopThree", "getFreshmenMaxRankingScore",
+	"getEntryAverageRanking", "getEntryAverageRankingScore", "getEntryAverageRankingPerEntry",
+	"getEntryAverageRankingVariance", "getEntryAverageRankingVarianceScore",
+	"getPercentageTopRankedFreshmenPerEntry", "getPercentageTopRankedFreshmenAllEntries"]
+
+def random_instance(rng, nFreshmen, nEntries, nCandidates):
+	freshmenPrefs = np.argsort(rng.rand(nFreshmen, nEntries), axis=1) + 1
+	entryPrefs = rng.randint(1, 7, size=(nFreshmen, nEntries))
+	# Some candidates leave the last entry empty
+	candidates = rng.randint(0, nEntries, size=(nCandidates, nFreshmen))
+	candidates[::2] %= max(nEntries - 1, 1)
+	return freshmenPrefs, entryPrefs, candidates
+
+class VectorizedMetricsTest(unittest.TestCase):
+	def test_metrics(self):
+		rng = np.random.RandomState(0)
+		for nEntries in [1, 2, 9, 30]:
+			freshmenPrefs, entryPrefs, candidates = random_instance(rng, 50, nEntries, 4)
+			for results in candidates:
+				for metric in METRICS:
+					prefs = freshmenPrefs if metric.startswith("getFreshmen") or metric == "getPercentageFreshmenInTopThree" else entryPrefs
+					expected = getattr(calculate_metrics, metric)(prefs.tolist(), results.tolist())
+					value = getattr(vectorized_metrics, metric)(prefs, results)
+					self.assertTrue(np.allclose(value, expected, rtol=1e-12, atol=1e-12), "%s: %r != %r" % (metric, value, expected))
+
+	def test_scores(self):
+		rng = np.random.RandomState(1)
+		for nEntries in [1, 3, 9]:
+			freshmenPrefs, entryPrefs, candidates = random_instance(rng, 40, nEntries, 6)
+			scores = vectorized_metrics.getScores(freshmenPrefs, entryPrefs, candidates)["score"]
+			self.assertEqual(len(scores), len(candidates))
+			for score, results in zip(scores, candidates):
+				self.assertAlmostEqual(score, master_algorithm.score_assignment(freshmenPrefs.tolist(), entryPrefs.tolist(), results.tolist()), places=10)
+			# One assignment on its own
+			self.assertAlmostEqual(vectorized_metrics.getScores(freshmenPrefs, entryPrefs, candidates[0])["score"][0], scores[0], places=12)
+
+	def test_no_candidates(self):
+		freshmenPrefs, entryPrefs, candidates = random_instance(np.random.RandomState(2), 10, 3, 1)
+		scores = vectorized_metrics.getScores(freshmenPrefs, entryPrefs, np.zeros((0, 10), dtype=int))
+		self.assertEqual(sorted(scores.keys()), ["entryFairness", "entryHappiness", "freshmanFairness", "freshmanHappiness", "score"])
+		for values in scores.values():
+			self.assertEqual(values.shape, (0,))
+		self.assertEqual(len(vectorized_metrics.getScores(freshmenPrefs, entryPrefs, [])["score"]), 0)
+
+if __name__ == "__main__":
+	unittest.main()
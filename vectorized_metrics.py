@@ -0,0 +1,214 @@
+# vectorized_metrics.py
+# NumPy versions of the functions of calculate_metrics, for any number of entries
+# Each function takes preference matrices and an integer assignment vector instead of lists
+# Results match calculate_metrics up to floating point rounding (per-entry averages are sums/counts here, not running averages)
+
+import numpy as np
+
+def getAssignedPreferences(prefs, results):
+	"""
+	Pick the preference of each freshman for their assigned entry.
+
+	Args:
+		prefs: array of dimensions (nFreshmen, nEntries), rankings given by freshmen or ratings given by entries
+		results: int array of length nFreshmen, such that entry i is the entry that freshman i was assigned to (0:A, 1:B, etc.)
+
+	Returns:
+		array of length nFreshmen, element i is prefs[i, results[i]]
+	"""
+	prefs = np.asarray(prefs)
+	results = np.asarray(results)
+	return prefs[np.arange(len(results)), results]
+
+def getFreshmenAverageRankingScore(freshmenPrefs, results):
+	"""
+	Calculate freshmen average ranking score.
+
+	Args:
+		freshmenPrefs: array of dimensions (nFreshmen, nEntries) where entry (i,j) is the ranking given by freshman i to entry j
+		results: int array of length nFreshmen, such that entry i is the entry that freshman i was assigned to (0:A, 1:B, etc.)
+
+	Returns:
+		(nEntries - average ranking given by freshmen to assigned entry)/(nEntries - 1) * 100
+	"""
+	nEntries = np.shape(freshmenPrefs)[1]
+	# With one entry every freshman gets their only (first) choice
+	if nEntries == 1:
+		return 100.
+	average_ranking = float(getAssignedPreferences(freshmenPrefs, results).sum())/len(results)
+	return (nEntries-average_ranking)/(nEntries-1) * 100
+
+def getPercentageFreshmenInTopThree(freshmenPrefs, results):
+	"""
+	Calculate percentage of freshmen placed in one of their top three entries.
+
+	Args:
+		freshmenPrefs: array of dimensions (nFreshmen, nEntries) where entry (i,j) is the ranking given by freshman i to entry j
+		results: int array of length nFreshmen, such that entry i is the entry that freshman i was assigned to (0:A, 1:B, etc.)
+
+	Returns:
+		percentage of freshmen assigned to one of their top three entries
+	"""
+	return float((getAssignedPreferences(freshmenPrefs, results) < 4).sum())/len(results) * 100
+
+def getFreshmenMaxRankingScore(freshmenPrefs, results):
+	"""
+	Calculate freshman maximum ranking score.
+
+	Args:
+		freshmenPrefs: array of dimensions (nFreshmen, nEntries) where entry (i,j) is the ranking given by freshman i to entry j
+		results: int array of length nFreshmen, such that entry i is the entry that freshman i was assigned to (0:A, 1:B, etc.)
+
+	Returns:
+		(nEntries - maximum ranking given by a freshman to their assigned entry)/(nEntries - 1) * 100
+	"""
+	nEntries = np.shape(freshmenPrefs)[1]
+	# With one entry every freshman gets their only (first) choice
+	if nEntries == 1:
+		return 100.
+	max_ranking = max(getAssignedPreferences(freshmenPrefs, results).max(), 0)
+	return float(nEntries-max_ranking)/(nEntries-1) * 100
+
+def getEntryAverageRanking(entryPrefs, results):
+	"""
+	Calculate entry average ranking.
+
+	Args:
+		entryPrefs: array of dimensions (nFreshmen, nEntries) where entry (i,j) is the rating given by entry j to freshman i
+		results: int array of length nFreshmen, such that entry i is the entry that freshman i was assigned to (0:A, 1:B, etc.)
+
+	Returns:
+		average rating given by entries to their assigned freshmen
+	"""
+	return float(getAssignedPreferences(entryPrefs, results).sum())/len(results)
+
+def getEntryAverageRankingScore(entryPrefs, results):
+	"""
+	Turns entry average rating into a number between 0 and 100
+
+	Args:
+		entryPrefs: array of dimensions (nFreshmen, nEntries) where entry (i,j) is the rating given by entry j to freshman i
+		results: int array of length nFreshmen, such that entry i is the entry that freshman i was assigned to (0:A, 1:B, etc.)
+
+	Returns:
+		average rating given by entries to their assigned freshmen/6 * 100
+	"""
+	return getEntryAverageRanking(entryPrefs, results)/6 * 100
+
+def getEntryAverageRankingPerEntry(entryPrefs, results):
+	"""
+	Calculate entry average rating, for each entry
+
+	Args:
+		entryPrefs: array of dimensions (nFreshmen, nEntries) where entry (i,j) is the rating given by entry j to freshman i
+		results: int array of length nFreshmen, such that entry i is the entry that freshman i was assigned to (0:A, 1:B, etc.)
+
+	Returns:
+		array of length nEntries with element i being the average rating given by entry i to their assigned freshmen (0 for empty entries)
+	"""
+	nEntries = np.shape(entryPrefs)[1]
+	totals = np.bincount(results, weights=getAssignedPreferences(entryPrefs, results), minlength=nEntries)
+	counts = np.bincount(results, minlength=nEntries)
+	return totals / np.maximum(counts, 1)
+
+def getEntryAverageRankingVariance(entryPrefs, results):
+	"""
+	Calculate variance between average ratings between entries.
+
+	Args:
+		entryPrefs: array of dimensions (nFreshmen, nEntries) where entry (i,j) is the rating given by entry j to freshman i
+		results: int array of length nFreshmen, such that entry i is the entry that freshman i was assigned to (0:A, 1:B, etc.)
+
+	Returns:
+		variance of average ratings given by each entry to their assigned freshmen, with each entry having equal weight (i.e. not weighted by population)
+	"""
+	average_rankings = getEntryAverageRankingPerEntry(entryPrefs, results)
+	global_average = getEntryAverageRanking(entryPrefs, results)
+	return float(((average_rankings - global_average) ** 2).mean())
+
+def getEntryAverageRankingVarianceScore(entryPrefs, results):
+	"""
+	Turn variance of average ratings given by each entry into a score out of 100.
+
+	Args:
+		entryPrefs: array of dimensions (nFreshmen, nEntries) where entry (i,j) is the rating given by entry j to freshman i
+		results: int array of length nFreshmen, such that entry i is the entry that freshman i was assigned to (0:A, 1:B, etc.)
+
+	Returns:
+		(1 - min(variance, 0.4)/0.4) * 100
+	"""
+	maxVariance = 0.4
+	variance = min(getEntryAverageRankingVariance(entryPrefs, results), maxVariance)
+	return (1 - variance/maxVariance) * 100
+
+def getPercentageTopRankedFreshmenPerEntry(entryPrefs, results):
+	"""
+	Get percentage of freshmen in each entry that got a 4, 5 or 6
+
+	Args:
+		entryPrefs: array of dimensions (nFreshmen, nEntries) where entry (i,j) is the rating given by entry j to freshman i
+		results: int array of length nFreshmen, such that entry i is the entry that freshman i was assigned to (0:A, 1:B, etc.)
+
+	Returns:
+		array of length nEntries where element i is the percentage of freshmen in entry i that got a 4, 5 or 6
+	"""
+	nEntries = np.shape(entryPrefs)[1]
+	topranked = np.bincount(results, weights=getAssignedPreferences(entryPrefs, results) > 3, minlength=nEntries)
+	counts = np.bincount(results, minlength=nEntries)
+	return topranked / np.maximum(counts, 1) * 100
+
+def getPercentageTopRankedFreshmenAllEntries(entryPrefs, results):
+	"""
+	Get percentage of freshmen overall that got a 4, 5 or 6 from their assigned entry
+
+	Args:
+		entryPrefs: array of dimensions (nFreshmen, nEntries) where entry (i,j) is the rating given by entry j to freshman i
+		results: int array of length nFreshmen, such that entry i is the entry that freshman i was assigned to (0:A, 1:B, etc.)
+
+	Returns:
+		percentage of freshmen overall that got a 4, 5 or 6 from their assigned entry (as a fraction, like calculate_metrics)
+	"""
+	return float((getAssignedPreferences(entryPrefs, results) > 3).sum())/len(results)
+
+def getScores(freshmenPrefs, entryPrefs, candidates):
+	"""
+	Score many candidate assignments at once, with the same composite score as master_algorithm.calculate_score.
+
+	Args:
+		freshmenPrefs: array of dimensions (nFreshmen, nEntries) where entry (i,j) is the ranking given by freshman i to entry j
+		entryPrefs: array of dimensions (nFreshmen, nEntries) where entry (i,j) is the rating given by entry j to freshman i
+		candidates: int array of dimensions (nCandidates, nFreshmen), row k is an assignment (entry of each freshman)
+
+	Returns:
+		dictionary of arrays of length nCandidates: "freshmanHappiness", "freshmanFairness", "entryHappiness",
+		"entryFairness" (the four metrics of calculate_score) and "score" (0.5/0.1/0.2/0.2 combination of them), empty when there are no candidates
+	"""
+	freshmenPrefs = np.asarray(freshmenPrefs)
+	entryPrefs = np.asarray(entryPrefs)
+	if len(candidates) == 0:
+		return dict((key, np.zeros(0)) for key in ["freshmanHappiness", "freshmanFairness", "entryHappiness", "entryFairness", "score"])
+	candidates = np.atleast_2d(candidates)
+	nCandidates, nFreshmen = candidates.shape
+	nEntries = freshmenPrefs.shape[1]
+	rows = np.arange(nFreshmen)[np.newaxis, :]
+	rankings = freshmenPrefs[rows, candidates]
+	ratings = entryPrefs[rows, candidates]
+	scores = {}
+	if nEntries > 1:
+		scores["freshmanHappiness"] = (nEntries - rankings.mean(axis=1))/(nEntries - 1) * 100
+		scores["freshmanFairness"] = (nEntries - np.maximum(rankings.max(axis=1), 0))/(nEntries - 1.) * 100
+	else:
+		# With one entry every freshman gets their only (first) choice
+		scores["freshmanHappiness"] = 100. * np.ones(nCandidates)
+		scores["freshmanFairness"] = 100. * np.ones(nCandidates)
+	scores["entryHappiness"] = (ratings > 3).mean(axis=1)
+	# Per entry averages of all candidates with one bincount, offsetting candidate k by k * nEntries
+	offsets = (candidates + nEntries * np.arange(nCandidates)[:, np.newaxis]).ravel()
+	totals = np.bincount(offsets, weights=ratings.ravel(), minlength=nCandidates * nEntries).reshape(nCandidates, nEntries)
+	counts = np.bincount(offsets, minlength=nCandidates * nEntries).reshape(nCandidates, nEntries)
+	averages = totals / np.maximum(counts, 1)
+	variances = ((averages - ratings.mean(axis=1)[:, np.newaxis]) ** 2).mean(axis=1)
+	maxVariance = 0.4
+	scores["entryFairness"] = (1 - np.minimum(variances, maxVariance)/maxVariance) * 100
+	scores["score"] = 0.5 * scores["freshmanHappiness"] + 0.1 * scores["freshmanFairness"] + 0.2 * scores["entryHappiness"] + 0.2 * scores["entryFairness"]
+	return scores
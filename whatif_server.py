@@ -0,0 +1,258 @@
+# whatif_server.py
+# Local what-if server: the preferences and vacancies are loaded once, and JSON queries ("what if entry F gets 4 more
+# rooms", "what if maxGenderProportion is 0.6", another weight, cost function or greasing setting) are answered by a
+# pool of worker processes that keep the parsed matrices and their last solutions warm. Identical queries running at
+# the same time are computed once, and recent answers are kept in an LRU cache.
+# Run from the repository root with: python whatif_server.py [port]
+# Query with e.g.: curl -d '{"algorithm": "lp", "extraRooms": {"F": 4}}' http://localhost:8765/
+
+import BaseHTTPServer
+import SocketServer
+import collections
+import json
+import multiprocessing
+import sys
+import threading
+import time
+import numpy as np
+import feasibility
+import flow_solver
+import marriage_algorithm as marriage
+import preference_loader
+import relaxation_solver
+import vectorized_metrics
+
+PORT = 8765
+# Number of worker processes (None: one per core) and of answers kept in the cache
+NUM_WORKERS = None
+CACHE_SIZE = 256
+# Default values of the query fields. maxGenderProportion None means: as LP.jl for the LP variants, as the master
+# (marriage.MAX_GENDER_PROPORTION) for the marriage algorithm
+DEFAULT_QUERY = {"algorithm": "lp", "freshmenWeight": 0.7, "costFunction": "simple", "maxRanking": False, "greasing": False, "seed": 0, "maxGenderProportion": None, "rooms": {}, "extraRooms": {}}
+ALGORITHMS = ["lp", "relaxation", "marriage"]
+
+# State of each process: parsed inputs, hash of the input files, last solution of each LP variant and max ranking bounds
+instance = None
+inputHash = None
+lastSolutions = {}
+maxRankingCache = {}
+
+def load_instance(froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName):
+	"""
+	Parse the input files into the state of this process (worker initializer).
+	"""
+	global instance, inputHash
+	instance = flow_solver.read_LP_inputs(froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName)
+	inputHash = preference_loader.input_hash(froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName)
+
+def normalize_query(query):
+	"""
+	Check a query against the loaded instance and fill in the default values, so that identical questions have identical queries.
+
+	Args:
+		query : dictionary with any fields of DEFAULT_QUERY. "rooms" maps entry names to their new vacancies (a number
+		        of rooms, or M, F and U rooms except for the marriage algorithm, which only uses totals), "extraRooms"
+		        maps entry names to a number of rooms to add (or remove)
+
+	Returns:
+		dictionary with all fields of DEFAULT_QUERY
+	"""
+	if not isinstance(query, dict):
+		raise Exception('Unusable query: {0}'.format(query))
+	unknown = set(query.keys()) - set(DEFAULT_QUERY.keys())
+	if len(unknown) > 0:
+		raise Exception('Unknown query fields: {0}'.format(", ".join(sorted(unknown))))
+	normalized = dict(DEFAULT_QUERY)
+	normalized.update(query)
+	if normalized["algorithm"] not in ALGORITHMS:
+		raise Exception('Unknown algorithm {0}, use one of {1}'.format(normalized["algorithm"], ALGORITHMS))
+	costFunctions = relaxation_solver.COST_FUNCTIONS if normalized["algorithm"] == "relaxation" else flow_solver.COST_FUNCTIONS
+	if normalized["algorithm"] != "marriage" and normalized["costFunction"] not in costFunctions:
+		raise Exception('Unknown cost function {0}, use one of {1}'.format(normalized["costFunction"], costFunctions))
+	entryIndex = dict((entry.upper(), j) for (j, entry) in enumerate(instance[1]))
+	for field in ["rooms", "extraRooms"]:
+		rooms = {}
+		for entry, value in normalized[field].items():
+			if entry.upper() not in entryIndex:
+				raise Exception('Unknown entry {0}'.format(entry))
+			if field == "rooms" and isinstance(value, list):
+				# The marriage algorithm splits the total rooms of each entry by maxGenderProportion itself
+				if normalized["algorithm"] == "marriage":
+					raise Exception('The marriage algorithm only takes a number of rooms for entry {0}, not M, F and U rooms'.format(entry))
+				if len(value) != 3:
+					raise Exception('Unusable rooms for entry {0}: {1}'.format(entry, value))
+				value = [int(v) for v in value]
+			else:
+				value = int(value)
+			rooms[instance[1][entryIndex[entry.upper()]]] = value
+		normalized[field] = rooms
+	normalized["freshmenWeight"] = float(normalized["freshmenWeight"])
+	normalized["maxRanking"] = bool(normalized["maxRanking"])
+	normalized["greasing"] = bool(normalized["greasing"])
+	if normalized["maxGenderProportion"] is not None:
+		normalized["maxGenderProportion"] = float(normalized["maxGenderProportion"])
+	return normalized
+
+def query_rooms(query):
+	"""
+	Returns:
+		int array (nEntries, 3), M, F and U vacancies of each entry after the overrides of a (normalized) query.
+		A number of rooms replaces the vacancies of the entry by as many unisex rooms, extra rooms are unisex.
+	"""
+	entries, vacancies = instance[1], instance[5]
+	rooms = np.array(vacancies, dtype=int)
+	for j, entry in enumerate(entries):
+		if entry in query["rooms"]:
+			value = query["rooms"][entry]
+			rooms[j] = value if isinstance(value, list) else [0, 0, value]
+		rooms[j, 2] += query["extraRooms"].get(entry, 0)
+	return rooms
+
+def answer_query(query):
+	"""
+	Answer a normalized query with the state of this process (run in the workers).
+
+	Returns:
+		dictionary with "feasible", and either "problems" (capacity problems, see feasibility.describe) or the
+		"scores" of the assignment (see vectorized_metrics.getScores), "entrySizes", "assignment" (entry of each
+		freshman, in the order of the preference file) and "gap" (relaxation and quad only). "seconds" is the time it took.
+	"""
+	start = time.time()
+	names, entries, freshmenCosts, entryCosts, genders, vacancies = instance
+	rooms = query_rooms(query)
+	response = {}
+	if query["algorithm"] == "marriage":
+		proportion = query["maxGenderProportion"] if query["maxGenderProportion"] is not None else marriage.MAX_GENDER_PROPORTION
+		assignment = marriage.run_marriage_arrays(freshmenCosts, entryCosts, genders, rooms, names, proportion, query["greasing"], query["seed"])
+	else:
+		bounds = flow_solver.entry_bounds(rooms, genders, query["maxGenderProportion"])
+		problems = feasibility.capacity_problems(bounds, genders)
+		if len(problems) > 0:
+			return {"feasible": False, "problems": [feasibility.describe(problem, entries) for problem in problems], "seconds": time.time() - start}
+		if query["algorithm"] == "relaxation":
+			assignment, bound, gap = relaxation_solver.solve_relaxed(freshmenCosts, entryCosts, genders, bounds, query["freshmenWeight"], query["costFunction"])
+			response["gap"] = gap
+		else:
+			# Warm start from the last solution of the same variant; max ranking bounds depend on the capacities as well
+			variant = (query["costFunction"], query["maxRanking"])
+			capacityHash = "%s:%s:%r" % (inputHash, ",".join(map(str, rooms.ravel())), query["maxGenderProportion"])
+			details = {}
+			assignment = flow_solver.solve(freshmenCosts, entryCosts, genders, bounds, query["freshmenWeight"], query["costFunction"], query["maxRanking"], lastSolutions.get(variant), maxRankingCache, capacityHash, details)
+			response.update(details)
+			if assignment is not None:
+				lastSolutions[variant] = assignment
+	if assignment is None:
+		return {"feasible": False, "problems": ["no assignment meets the capacities within the preferences allowed"], "seconds": time.time() - start}
+	scores = vectorized_metrics.getScores(freshmenCosts, entryCosts, assignment)
+	response["feasible"] = True
+	response["scores"] = dict((key, float(value[0])) for (key, value) in scores.items())
+	response["entrySizes"] = dict(zip(entries, np.bincount(assignment, minlength=len(entries)).tolist()))
+	response["assignment"] = [entries[j] for j in assignment]
+	response["seconds"] = time.time() - start
+	return response
+
+class WhatIfService:
+	def __init__(self, froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName, numWorkers=NUM_WORKERS, cacheSize=CACHE_SIZE):
+		"""
+		Load the instance in this process (to check queries) and in a pool of worker processes (to answer them).
+		"""
+		fileNames = (froshPreferenceFileName, entryPreferenceFileName, entryVacancyFileName)
+		load_instance(*fileNames)
+		self.pool = multiprocessing.Pool(numWorkers, load_instance, fileNames)
+		self.cacheSize = cacheSize
+		self.cache = collections.OrderedDict()
+		# Queries being computed, waited for by identical queries arriving meanwhile
+		self.pending = {}
+		self.lock = threading.Lock()
+		self.stats = {"queries": 0, "cacheHits": 0, "coalesced": 0, "computed": 0}
+
+	def answer(self, query):
+		"""
+		Answer a query (see normalize_query) from the cache, by waiting for an identical query being computed, or in the pool.
+
+		Returns:
+			dictionary, as returned by answer_query, with "query" (the normalized query) and "cached"
+		"""
+		query = normalize_query(query)
+		key = json.dumps(query, sort_keys=True)
+		with self.lock:
+			self.stats["queries"] += 1
+			if key in self.cache:
+				self.stats["cacheHits"] += 1
+				response = self.cache.pop(key)
+				self.cache[key] = response
+				return dict(response, query=query, cached=True)
+			if key in self.pending:
+				self.stats["coalesced"] += 1
+				pending = self.pending[key]
+				result = None
+			else:
+				self.stats["computed"] += 1
+				pending = {"done": threading.Event(), "response": None, "error": None}
+				self.pending[key] = pending
+				result = self.pool.apply_async(answer_query, (query,))
+		if result is None:
+			# Only the thread that submitted the query waits for the pool (a pool result only wakes one waiting thread)
+			pending["done"].wait()
+		else:
+			try:
+				pending["response"] = result.get()
+			except Exception as e:
+				pending["error"] = str(e)
+			with self.lock:
+				if pending["error"] is None:
+					self.cache[key] = pending["response"]
+					while len(self.cache) > self.cacheSize:
+						self.cache.popitem(last=False)
+				del self.pending[key]
+			pending["done"].set()
+		if pending["error"] is not None:
+			raise Exception(pending["error"])
+		return dict(pending["response"], query=query, cached=False)
+
+	def summary(self):
+		names, entries, freshmenCosts, entryCosts, genders, vacancies = instance
+		with self.lock:
+			return {"freshmen": len(names), "entries": list(entries), "vacancies": vacancies.tolist(), "cached": len(self.cache), "stats": dict(self.stats)}
+
+	def close(self):
+		self.pool.close()
+		self.pool.join()
+
+class WhatIfHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+	def do_GET(self):
+		self.send_json(200, self.server.service.summary())
+
+	def do_POST(self):
+		try:
+			query = json.loads(self.rfile.read(int(self.headers.getheader("Content-Length", 0))))
+			self.send_json(200, self.server.service.answer(query))
+		except Exception as e:
+			self.send_json(400, {"error": str(e)})
+
+	def send_json(self, status, body):
+		content = json.dumps(body)
+		self.send_response(status)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(content)))
+		self.end_headers()
+		self.wfile.write(content)
+
+class WhatIfServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+	# One thread per connection, so slow queries do not hold up the others
+	daemon_threads = True
+
+	def __init__(self, address, service):
+		BaseHTTPServer.HTTPServer.__init__(self, address, WhatIfHandler)
+		self.service = service
+
+if __name__ == "__main__":
+	import master_algorithm
+	port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+	service = WhatIfService(master_algorithm.FRESHMEN_PREFERENCES, master_algorithm.ENTRY_PREFERENCES, master_algorithm.ROOM_NUMBERS)
+	server = WhatIfServer(("localhost", port), service)
+	print "what-if server on http://localhost:%d" % port
+	try:
+		server.serve_forever()
+	finally:
+		service.close()